@@ -0,0 +1,306 @@
+import errno
+import fcntl
+import json
+import os
+import posixpath
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from manifest import hash_bytes, hash_file, prune_empty_dirs
+
+ASSET_MODES = ("copy", "hardlink", "reflink")
+ASSET_COMPARES = ("stat", "hash")
+
+# Only subresources that pages load are fingerprinted; anything else, from
+# documents to robots.txt and favicon.ico, is reached by a well-known URL.
+VERSIONED_SUFFIXES = {
+    ".css",
+    ".js",
+    ".mjs",
+    ".png",
+    ".jpg",
+    ".jpeg",
+    ".gif",
+    ".webp",
+    ".avif",
+    ".svg",
+    ".woff",
+    ".woff2",
+    ".ttf",
+    ".otf",
+    ".eot",
+}
+FINGERPRINT_LENGTH = 8
+
+# From linux/fs.h: _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+_FALLBACK_ERRNOS = {
+    errno.EXDEV,
+    errno.ENOSYS,
+    errno.EINVAL,
+    errno.EOPNOTSUPP,
+    errno.ENOTTY,
+    errno.EPERM,
+    errno.EBADF,
+}
+
+
+class SyncStats:
+    def __init__(self):
+        self.copied_files = 0
+        self.copied_bytes = 0
+        self.skipped_files = 0
+        self.skipped_bytes = 0
+        self.pruned_files = 0
+        self.copied_paths = []
+
+    def __repr__(self):
+        return (
+            f"SyncStats(copied={self.copied_files} files/{self.copied_bytes} bytes, "
+            f"skipped={self.skipped_files} files/{self.skipped_bytes} bytes, "
+            f"pruned={self.pruned_files} files)"
+        )
+
+
+class AssetMap:
+    # Maps the path of each static file below the site root to its
+    # fingerprinted name, e.g. "index.css" -> "index.3f9a1c0d.css". The name
+    # depends only on the content, so an unchanged file keeps it.
+
+    def __init__(self, urls=None):
+        self.urls = dict(urls or {})
+        self.hash = hash_bytes(json.dumps(self.urls, sort_keys=True).encode())
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                return cls(json.load(f))
+        except (OSError, ValueError):
+            return None
+
+    def save(self, path):
+        previous = AssetMap.load(path)
+        if previous is not None and previous.hash == self.hash:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.urls, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+
+
+_asset_map = None
+
+
+def set_asset_map(assets):
+    global _asset_map
+    _asset_map = assets
+
+
+def current_asset_map():
+    return _asset_map
+
+
+def _is_versioned(name):
+    return os.path.splitext(name)[1].lower() in VERSIONED_SUFFIXES
+
+
+def fingerprint_name(name, digest):
+    stem, suffix = os.path.splitext(name)
+    return f"{stem}.{digest[:FINGERPRINT_LENGTH]}{suffix}"
+
+
+def build_asset_map(src, index=None):
+    urls = {}
+    src = os.fspath(src)
+    stack = [(src, "")]
+    while stack:
+        src_dir, prefix = stack.pop()
+        with os.scandir(src_dir) as entries:
+            for entry in entries:
+                key = prefix + entry.name
+                if entry.is_dir():
+                    stack.append((entry.path, key + "/"))
+                    continue
+                if not _is_versioned(entry.name):
+                    continue
+                if index is None:
+                    digest = hash_file(entry.path)
+                else:
+                    digest = index.hash(entry.path, entry.stat())
+                urls[key] = prefix + fingerprint_name(entry.name, digest)
+    return AssetMap(urls)
+
+
+def _copy_range(src, dst):
+    # Kernel-side copy: the data never passes through user space, and on
+    # filesystems that support it copy_file_range shares the extents.
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        remaining = os.fstat(fsrc.fileno()).st_size
+        copy = getattr(os, "copy_file_range", None) or os.sendfile
+        while remaining > 0:
+            if copy is os.sendfile:
+                sent = os.sendfile(fdst.fileno(), fsrc.fileno(), None, remaining)
+            else:
+                sent = copy(fsrc.fileno(), fdst.fileno(), remaining)
+            if sent == 0:
+                break
+            remaining -= sent
+
+
+def _reflink(src, dst):
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+
+
+def copy_asset(src, dst, mode="copy"):
+    # Always write a new file and rename it over dst: with hardlinks dst may
+    # share an inode with src, and writing through it would modify the source.
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    tmp_path = f"{dst}.tmp"
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+
+    try:
+        if mode == "hardlink":
+            try:
+                os.link(src, tmp_path)
+                os.replace(tmp_path, dst)
+                return
+            except OSError as e:
+                if e.errno not in _FALLBACK_ERRNOS:
+                    raise
+
+        if mode == "reflink":
+            try:
+                _reflink(src, tmp_path)
+            except OSError as e:
+                if e.errno not in _FALLBACK_ERRNOS:
+                    raise
+                _copy_with_fallback(src, tmp_path)
+        else:
+            _copy_with_fallback(src, tmp_path)
+
+        shutil.copystat(src, tmp_path)
+        os.replace(tmp_path, dst)
+    except BaseException:
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _copy_with_fallback(src, dst):
+    try:
+        _copy_range(src, dst)
+    except OSError as e:
+        if e.errno not in _FALLBACK_ERRNOS:
+            raise
+        shutil.copyfile(src, dst)
+
+
+def asset_signature(src, compare="stat", stat=None, index=None):
+    if compare == "hash":
+        return hash_file(src) if index is None else index.hash(src, stat)
+    stat = stat or os.stat(src)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _is_unchanged(src_stat, dst, compare, signature, manifest):
+    try:
+        dst_stat = os.stat(dst)
+    except FileNotFoundError:
+        return False
+
+    if compare == "stat":
+        # copystat carries the mtime over (and hardlinks share it), so equal
+        # size and mtime mean the destination already holds this version.
+        return (
+            dst_stat.st_size == src_stat.st_size
+            and dst_stat.st_mtime_ns == src_stat.st_mtime_ns
+        )
+    return manifest is not None and manifest.file_is_current(dst, signature)
+
+
+def sync_assets(
+    src,
+    dst,
+    manifest=None,
+    mode="copy",
+    compare="stat",
+    jobs=8,
+    prune=False,
+    index=None,
+    names=None,
+):
+    # names maps "/"-separated paths below src to the paths of the extra
+    # copies they get below dst, for fingerprinted assets. The originals are
+    # kept, since stylesheets and scripts still refer to them by name.
+    stats = SyncStats()
+    pending = []
+    seen = set()
+
+    stack = [(os.fspath(src), os.fspath(dst), "")]
+    while stack:
+        src_dir, dst_dir, prefix = stack.pop()
+        os.makedirs(dst_dir, exist_ok=True)
+        with os.scandir(src_dir) as entries:
+            for entry in sorted(entries, key=lambda e: e.name):
+                dst_path = os.path.join(dst_dir, entry.name)
+                if entry.is_dir():
+                    stack.append((entry.path, dst_path, prefix + entry.name + "/"))
+                    continue
+                dst_paths = [dst_path]
+                if names:
+                    name = names.get(prefix + entry.name)
+                    if name is not None:
+                        name = posixpath.basename(name)
+                        dst_paths.append(os.path.join(dst_dir, name))
+
+                src_stat = entry.stat()
+                signature = asset_signature(entry.path, compare, src_stat, index)
+                for dst_path in dst_paths:
+                    seen.add(dst_path)
+                    if _is_unchanged(src_stat, dst_path, compare, signature, manifest):
+                        stats.skipped_files += 1
+                        stats.skipped_bytes += src_stat.st_size
+                        if manifest is not None:
+                            manifest.record_file(dst_path, entry.path, signature)
+                        continue
+                    task = (entry.path, dst_path, signature, src_stat.st_size)
+                    pending.append(task)
+
+    def copy(task):
+        copy_asset(task[0], task[1], mode)
+
+    if jobs > 1 and len(pending) > 1:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            list(executor.map(copy, pending))
+    else:
+        for task in pending:
+            copy(task)
+
+    for src_path, dst_path, signature, size in pending:
+        stats.copied_files += 1
+        stats.copied_bytes += size
+        stats.copied_paths.append(dst_path)
+        if manifest is not None:
+            manifest.record_file(dst_path, src_path, signature)
+
+    if prune:
+        stats.pruned_files = _prune(os.fspath(dst), seen)
+    return stats
+
+
+def _prune(dst, keep):
+    pruned = 0
+    for root, dirs, files in os.walk(dst, topdown=False):
+        for file in files:
+            path = os.path.join(root, file)
+            if path not in keep:
+                os.remove(path)
+                pruned += 1
+        if root != dst:
+            prune_empty_dirs(root, dst)
+    return pruned
@@ -0,0 +1,350 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from block_utils import block_to_block_type, markdown_to_blocks, markdown_to_html_node
+from main import build_site
+from htmlnode import LeafNode, ParentNode
+from text_utils import text_to_textnodes
+from textnode import TextNode, TextType
+
+DEFAULT_MIX = {
+    "paragraph": 5,
+    "heading": 2,
+    "list": 2,
+    "ordered_list": 1,
+    "quote": 1,
+    "code": 1,
+}
+
+WORDS = (
+    "static site generator markdown block inline node parser render page "
+    "template build cache output content python fast slow tree list item"
+).split()
+
+TEMPLATE = """<!doctype html>
+<html>
+  <head>
+    <title>{{ Title }}</title>
+    <link href="/index.css" rel="stylesheet" />
+  </head>
+  <body>
+    <article>{{ Content }}</article>
+  </body>
+</html>
+"""
+
+
+def _sentence(rng, words=12, pages=1):
+    # Links go to one of the first `pages` generated pages and images to
+    # the ones generate_corpus writes, so every link resolves.
+    parts = []
+    for _ in range(words):
+        word = rng.choice(WORDS)
+        roll = rng.random()
+        if roll < 0.05:
+            word = f"**{word}**"
+        elif roll < 0.10:
+            word = f"_{word}_"
+        elif roll < 0.13:
+            word = f"`{word}`"
+        elif roll < 0.15:
+            target = rng.randrange(pages)
+            word = f"[{word}](/section{target % 10}/page{target})"
+        elif roll < 0.16:
+            word = f"![{word}](/images/{rng.choice(WORDS)}.png)"
+        parts.append(word)
+    return " ".join(parts)
+
+
+def _block(rng, kind, pages=1):
+    match kind:
+        case "paragraph":
+            lines = rng.randint(1, 4)
+            return "\n".join(_sentence(rng, pages=pages) for _ in range(lines))
+        case "heading":
+            return f"{'#' * rng.randint(2, 6)} {_sentence(rng, 4, pages)}"
+        case "list":
+            items = rng.randint(2, 8)
+            return "\n".join(f"- {_sentence(rng, 6, pages)}" for _ in range(items))
+        case "ordered_list":
+            items = rng.randint(2, 8)
+            return "\n".join(
+                f"{i}. {_sentence(rng, 6, pages)}" for i in range(1, items + 1)
+            )
+        case "quote":
+            lines = rng.randint(1, 4)
+            return "\n".join(f"> {_sentence(rng, 8, pages)}" for _ in range(lines))
+        case "code":
+            body = "\n".join(" ".join(rng.choices(WORDS, k=6)) for _ in range(4))
+            return f"```\n{body}\n```"
+    raise ValueError(f"Unknown block kind: {kind}")
+
+
+def generate_page_markdown(rng, index, blocks=20, mix=None):
+    mix = mix or DEFAULT_MIX
+    kinds = sorted(mix)
+    weights = [mix[kind] for kind in kinds]
+    parts = [f"# Page {index}"]
+    for kind in rng.choices(kinds, weights=weights, k=blocks):
+        parts.append(_block(rng, kind, index + 1))
+    return "\n\n".join(parts) + "\n"
+
+
+def generate_huge_list(rng, items):
+    return "# Huge list\n\n" + "\n".join(f"- {_sentence(rng, 6)}" for _ in range(items))
+
+
+def generate_long_paragraph(rng, words):
+    return "# Long paragraph\n\n" + _sentence(rng, words)
+
+
+def generate_corpus(
+    root_dir, pages=100, seed=0, blocks=20, mix=None, huge_list=0, long_paragraph=0
+):
+    # The same arguments always produce byte-identical trees, so results from
+    # different runs and machines measure the code, not the input.
+    rng = random.Random(seed)
+    content_dir = os.path.join(root_dir, "content")
+    static_dir = os.path.join(root_dir, "static")
+    os.makedirs(static_dir, exist_ok=True)
+
+    with open(os.path.join(root_dir, "template.html"), "w", encoding="utf-8") as f:
+        f.write(TEMPLATE)
+    with open(os.path.join(static_dir, "index.css"), "w", encoding="utf-8") as f:
+        f.write("body { margin: 0; }\n")
+    images_dir = os.path.join(static_dir, "images")
+    os.makedirs(images_dir, exist_ok=True)
+    for word in WORDS:
+        path = os.path.join(images_dir, f"{word}.png")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"PNG {word}\n")
+
+    for i in range(pages):
+        section = os.path.join(content_dir, f"section{i % 10}")
+        os.makedirs(section, exist_ok=True)
+        with open(os.path.join(section, f"page{i}.md"), "w", encoding="utf-8") as f:
+            f.write(generate_page_markdown(rng, i, blocks, mix))
+
+    pathological = os.path.join(content_dir, "pathological")
+    if huge_list:
+        os.makedirs(pathological, exist_ok=True)
+        with open(os.path.join(pathological, "huge-list.md"), "w") as f:
+            f.write(generate_huge_list(rng, huge_list))
+    if long_paragraph:
+        os.makedirs(pathological, exist_ok=True)
+        with open(os.path.join(pathological, "long-paragraph.md"), "w") as f:
+            f.write(generate_long_paragraph(rng, long_paragraph))
+
+
+def _measure(func, repeat, number=1):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.fmean(timings),
+        "repeat": repeat,
+        "number": number,
+    }
+
+
+def _micro_benchmarks(seed):
+    rng = random.Random(seed)
+    page = generate_page_markdown(rng, 0, blocks=200)
+    blocks = markdown_to_blocks(page)
+    paragraphs = [b for b in blocks if not b.startswith(("#", "```", ">", "-"))]
+    tree = markdown_to_html_node(page)
+    huge_list = generate_huge_list(rng, 5000)
+    long_paragraph = generate_long_paragraph(rng, 20000)
+
+    return {
+        "construct_nodes": lambda: _construct_nodes(1000),
+        "markdown_to_blocks": lambda: markdown_to_blocks(page),
+        "block_to_block_type": lambda: [block_to_block_type(b) for b in blocks],
+        "text_to_textnodes": lambda: [text_to_textnodes(p) for p in paragraphs],
+        "to_html": tree.to_html,
+        "markdown_to_html_node": lambda: markdown_to_html_node(page),
+        "huge_list": lambda: markdown_to_html_node(huge_list).to_html(),
+        "long_paragraph": lambda: markdown_to_html_node(long_paragraph).to_html(),
+    }
+
+
+def _construct_nodes(count):
+    leaves = []
+    for i in range(count):
+        text_node = TextNode("word", TextType.TEXT)
+        leaves.append(LeafNode("b", text_node.text))
+    return ParentNode("p", leaves)
+
+
+NODE_FACTORIES = {
+    "TextNode": lambda: TextNode("word", TextType.TEXT),
+    "LeafNode": lambda: LeafNode("b", "word"),
+    "ParentNode": lambda: ParentNode("p", None),
+}
+
+
+def measure_node_memory(count=10000):
+    # Bytes allocated per instance, including any per-instance __dict__.
+    sizes = {}
+    for name, factory in NODE_FACTORIES.items():
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        nodes = [factory() for _ in range(count)]
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        list_overhead = sys.getsizeof(nodes)
+        sizes[name] = round((after - before - list_overhead) / count, 1)
+        del nodes
+    return sizes
+
+
+def run_benchmarks(pages=200, seed=0, repeat=5, only=None, jobs=1):
+    results = {}
+    for name, func in _micro_benchmarks(seed).items():
+        if only and name not in only:
+            continue
+        results[name] = _measure(func, repeat, number=5)
+
+    builds = ("build", "build_pipeline", "build_search", "build_incremental")
+    if not only or any(name in only for name in builds):
+        with tempfile.TemporaryDirectory() as root:
+            generate_corpus(root, pages=pages, seed=seed)
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                if not only or "build" in only:
+                    results["build"] = _measure(
+                        lambda: build_site(root, jobs=jobs), repeat
+                    )
+                if not only or "build_pipeline" in only:
+                    results["build_pipeline"] = _measure(
+                        lambda: build_site(root, pipeline=16), repeat
+                    )
+                if not only or "build_search" in only:
+                    results["build_search"] = _measure(
+                        lambda: build_site(root, jobs=jobs, search=True), repeat
+                    )
+                if not only or "build_incremental" in only:
+                    build_site(root, jobs=jobs)
+                    results["build_incremental"] = _measure(
+                        lambda: build_site(root, incremental=True, jobs=jobs), repeat
+                    )
+
+    return {
+        "memory": measure_node_memory() if not only else {},
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pages": pages,
+            "seed": seed,
+            "jobs": jobs,
+        },
+        "results": results,
+    }
+
+
+def compare_results(baseline, current, threshold=0.10):
+    rows = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            rows.append((name, None, result["median"], None, False))
+            continue
+        change = result["median"] / base["median"] - 1 if base["median"] else 0.0
+        regressed = change > threshold
+        rows.append((name, base["median"], result["median"], change, regressed))
+    return rows
+
+
+def format_comparison(rows):
+    lines = [f"{'benchmark':<24}{'baseline':>12}{'current':>12}{'change':>10}"]
+    for name, base, current, change, regressed in rows:
+        base_text = f"{base * 1000:.3f}ms" if base is not None else "-"
+        change_text = f"{change:+.1%}" if change is not None else "new"
+        flag = "  REGRESSION" if regressed else ""
+        lines.append(
+            f"{name:<24}{base_text:>12}{current * 1000:>10.3f}ms{change_text:>10}{flag}"
+        )
+    return "\n".join(lines)
+
+
+def _load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the site generator.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run the benchmarks")
+    run.add_argument("--pages", type=int, default=200)
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--repeat", type=int, default=5)
+    run.add_argument("--jobs", type=int, default=1)
+    run.add_argument("--only", nargs="*", help="benchmark names to run")
+    run.add_argument("--output", help="write JSON results to this file")
+    run.add_argument("--baseline", help="compare against a saved result file")
+    run.add_argument("--threshold", type=float, default=0.10)
+
+    compare = commands.add_parser("compare", help="compare two result files")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=0.10)
+
+    corpus = commands.add_parser("corpus", help="write a synthetic site")
+    corpus.add_argument("root")
+    corpus.add_argument("--pages", type=int, default=200)
+    corpus.add_argument("--seed", type=int, default=0)
+    corpus.add_argument("--blocks", type=int, default=20)
+    corpus.add_argument("--huge-list", type=int, default=0)
+    corpus.add_argument("--long-paragraph", type=int, default=0)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "corpus":
+        generate_corpus(
+            args.root,
+            pages=args.pages,
+            seed=args.seed,
+            blocks=args.blocks,
+            huge_list=args.huge_list,
+            long_paragraph=args.long_paragraph,
+        )
+        return 0
+
+    if args.command == "compare":
+        baseline, current = _load(args.baseline), _load(args.current)
+    else:
+        current = run_benchmarks(
+            args.pages, args.seed, args.repeat, args.only, args.jobs
+        )
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(current, f, indent=2)
+        else:
+            json.dump(current, sys.stdout, indent=2)
+            print()
+        if not args.baseline:
+            return 0
+        baseline = _load(args.baseline)
+
+    rows = compare_results(baseline, current, args.threshold)
+    print(format_comparison(rows), file=sys.stderr)
+    return 1 if any(row[4] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+import hashlib
+import os
+import sqlite3
+from collections import OrderedDict
+
+# Bump when block rendering changes so persisted entries are not reused.
+CACHE_VERSION = "4"
+
+
+class BlockCache:
+    # Content-addressed cache of rendered block HTML: a bounded in-memory LRU
+    # in front of an optional SQLite file that survives across builds.
+
+    def __init__(self, max_entries=4096, path=None, read_only=False, salt=""):
+        self.max_entries = max_entries
+        self.path = None if path is None else os.fspath(path)
+        self.salt = f"{CACHE_VERSION}:{salt}:"
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.db = None
+        self.read_only = read_only
+        if self.path is not None:
+            self._open(self.path)
+
+    def _open(self, path):
+        if self.read_only:
+            if not os.path.exists(path):
+                return
+            self.db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            return
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS blocks (key TEXT PRIMARY KEY, html TEXT)"
+        )
+
+    def key(self, block):
+        return hashlib.sha1((self.salt + block).encode("utf-8")).hexdigest()
+
+    def get(self, block):
+        key = self.key(block)
+        html = self.memory.get(key)
+        if html is not None:
+            self.memory.move_to_end(key)
+            self.hits += 1
+            return html
+
+        if self.db is not None:
+            row = self.db.execute(
+                "SELECT html FROM blocks WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                self.hits += 1
+                self.disk_hits += 1
+                self._remember(key, row[0])
+                return row[0]
+
+        self.misses += 1
+        return None
+
+    def put(self, block, html):
+        key = self.key(block)
+        self._remember(key, html)
+        if self.db is not None and not self.read_only:
+            self.db.execute(
+                "INSERT OR REPLACE INTO blocks (key, html) VALUES (?, ?)", (key, html)
+            )
+
+    def _remember(self, key, html):
+        self.memory[key] = html
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def clear(self):
+        # Forgets the in-memory tier only; the persistent tier is keyed by
+        # content and never goes stale.
+        self.memory.clear()
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "entries": len(self.memory),
+        }
+
+    def close(self):
+        if self.db is not None:
+            if not self.read_only:
+                self.db.commit()
+            self.db.close()
+            self.db = None
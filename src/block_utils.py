@@ -1,3 +1,5 @@
+import io
+import mmap
 import re
 from enum import Enum, auto
 from htmlnode import *
@@ -13,75 +15,207 @@ class BlockType(Enum):
     ORDERED_LIST = auto()
 
 
-def block_to_block_type(block):
-    lines = block.split("\n")
+_HEADING_RE = re.compile(r"(#{1,6}) ")
 
+
+def classify_block(block):
+    # Inspects the block once and returns what the renderer needs alongside
+    # the type: the heading level, or the lines / item texts of quotes and
+    # lists, so nothing is matched a second time.
     if block.startswith("```") and block.endswith("```"):
-        return BlockType.CODE
+        return BlockType.CODE, None
 
-    if re.match(r"#{1,6} ", lines[0]):
-        return BlockType.HEADING
+    match = _HEADING_RE.match(block)
+    if match:
+        return BlockType.HEADING, len(match.group(1))
+
+    lines = block.split("\n")
 
     if all(line.startswith(">") for line in lines):
-        return BlockType.QUOTE
+        return BlockType.QUOTE, lines
 
-    if all(re.match(r"- ", line) for line in lines):
-        return BlockType.UNORDERED_LIST
+    if all(line.startswith("- ") for line in lines):
+        return BlockType.UNORDERED_LIST, [line[2:] for line in lines]
 
+    items = []
     for i, line in enumerate(lines, 1):
-        if not re.match(rf"{i}\. ", line):
+        prefix = f"{i}. "
+        if not line.startswith(prefix):
             break
+        items.append(line[len(prefix) :])
     else:
-        return BlockType.ORDERED_LIST
+        return BlockType.ORDERED_LIST, items
 
-    return BlockType.PARAGRAPH
+    return BlockType.PARAGRAPH, None
 
 
-def markdown_to_html_node(markdown):
-    blocks = markdown_to_blocks(markdown)
-    block_nodes = []
+def block_to_block_type(block):
+    return classify_block(block)[0]
 
-    for block in blocks:
-        block_type = block_to_block_type(block)
-        tag = block_type_to_tag(block_type, block)
 
-        match block_type:
-            case BlockType.CODE:
-                code_content = block.strip("`").strip()
-                text_node = TextNode(code_content, TextType.CODE)
-                child_node = text_node_to_html_node(text_node)
-                block_node = ParentNode(tag, [child_node])
+_block_cache = None
 
-            case BlockType.HEADING:
-                heading_text = re.sub(r"^#{1,6} ", "", block)
-                children = text_to_children(heading_text)
-                block_node = ParentNode(tag, children)
 
-            case BlockType.QUOTE:
-                quote_lines = [line.lstrip("> ").rstrip() for line in block.split("\n")]
-                quote_text = " ".join(quote_lines)
-                children = text_to_children(quote_text)
-                block_node = ParentNode(tag, children)
+def set_block_cache(cache):
+    global _block_cache
+    _block_cache = cache
 
-            case BlockType.UNORDERED_LIST | BlockType.ORDERED_LIST:
-                list_items = block.split("\n")
-                list_nodes = []
-                for item in list_items:
-                    item_text = re.sub(r"^(-|\d+\.) ", "", item)
-                    children = text_to_children(item_text)
-                    list_nodes.append(ParentNode("li", children))
-                block_node = ParentNode(tag, list_nodes)
 
-            case BlockType.PARAGRAPH:
-                children = text_to_children(block)
-                block_node = ParentNode(tag, children)
+def current_block_cache():
+    return _block_cache
 
-            case _:
-                raise ValueError(f"Unknown block type: {block_type}")
 
-        block_nodes.append(block_node)
+_minify = False
+
+
+def set_minify(enabled):
+    global _minify
+    _minify = bool(enabled)
+
+
+def minify_enabled():
+    return _minify
+
+
+def markdown_to_html_node(markdown, context=None):
+    # Always the real node tree: cached and minified HTML only exist as
+    # text, and are written through markdown_to_html_stream.
+    blocks = markdown_to_blocks(markdown)
+    return ParentNode("div", [block_to_html_node(block, context) for block in blocks])
+
+
+def markdown_to_html_stream(source, write, context=None):
+    # Renders one block at a time into write(), so memory is bounded by the
+    # largest block rather than the whole document. Returns the bytes saved
+    # by minification.
+    write("<div>")
+    empty = True
+    saved = 0
+    stats = MinifyStats() if _minify else None
+    for block in iter_markdown_blocks(source):
+        if _block_cache is None:
+            block_to_html_node(block, context).serialize(write, stats)
+        else:
+            html, block_saved = _render_block(block, context)
+            write(html)
+            saved += block_saved
+        empty = False
+
+    if empty:
+        raise ValueError("Children must be provided")
+    write("</div>")
+    return saved if stats is None else saved + stats.saved
+
+
+def _render_block(block, context):
+    # Identical blocks render identically, so their HTML is looked up by
+    # content before classifying and parsing the block again. Minified
+    # entries, and those with rewritten URLs, live under their own key.
+    # An entry holds the number of link targets in the block, then each
+    # target and the block's text, NUL-separated, so a hit still reports
+    # the block's links and text; minified entries then carry their saving
+    # as a "<saved>:" prefix.
+    cache = _block_cache
+    if cache is None:
+        return _render_uncached(block, context)
+    key = f"minify\0{block}" if _minify else block
+    rewrite = None if context is None else context.rewrite_url
+    if rewrite is not None:
+        key = f"{rewrite.key}\0{key}"
+
+    entry = cache.get(key)
+    if entry is not None:
+        return _decode_entry(entry, context)
+
+    # The block is recorded on its own, for the entry, then into the page.
+    recorded = RenderContext(rewrite, [], [])
+    html, saved = _render_uncached(block, recorded)
+    if context is not None:
+        if context.links is not None:
+            context.links.extend(recorded.links)
+        if context.texts is not None:
+            context.texts.extend(recorded.texts)
+
+    links = recorded.links
+    text = " ".join(recorded.texts).replace("\0", " ")
+    entry = "".join(f"{link}\0" for link in links) + f"{text}\0"
+    if _minify:
+        entry += f"{saved}:"
+    cache.put(key, f"{len(links)}\0{entry}{html}")
+    return html, saved
+
+
+def _render_uncached(block, context):
+    if _minify:
+        stats = MinifyStats()
+        chunks = []
+        block_to_html_node(block, context).serialize(chunks.append, stats)
+        return "".join(chunks), stats.saved
+    return block_to_html_node(block, context).to_html(), 0
+
+
+def _decode_entry(entry, context):
+    count, entry = entry.split("\0", 1)
+    if count != "0":
+        *links, entry = entry.split("\0", int(count))
+        if context is not None and context.links is not None:
+            context.links.extend(links)
+    text, entry = entry.split("\0", 1)
+    if context is not None and context.texts is not None and text:
+        context.texts.append(text)
+    if not _minify:
+        return entry, 0
+    saved, html = entry.split(":", 1)
+    return html, int(saved)
+
+
+def block_to_html_node(block, context=None):
+    block_type, info = classify_block(block)
+    return _BLOCK_RENDERERS[block_type](block, info, context)
+
+
+def _code_to_html_node(block, info, context):
+    code_content = block.strip("`").strip()
+    text_node = TextNode(code_content, TextType.CODE)
+    if context is not None and context.texts is not None:
+        context.texts.append(code_content)
+    return ParentNode("pre", [text_node_to_html_node(text_node)])
+
+
+def _heading_to_html_node(block, level, context):
+    children = text_to_children(block[level + 1 :], context)
+    return ParentNode(f"h{level}", children)
+
+
+def _quote_to_html_node(block, lines, context):
+    quote_text = " ".join(line.lstrip("> ").rstrip() for line in lines)
+    return ParentNode("blockquote", text_to_children(quote_text, context))
+
+
+def _list_items_to_html_nodes(items, context):
+    return [ParentNode("li", text_to_children(item, context)) for item in items]
+
 
-    return ParentNode("div", block_nodes)
+def _unordered_list_to_html_node(block, items, context):
+    return ParentNode("ul", _list_items_to_html_nodes(items, context))
+
+
+def _ordered_list_to_html_node(block, items, context):
+    return ParentNode("ol", _list_items_to_html_nodes(items, context))
+
+
+def _paragraph_to_html_node(block, info, context):
+    return ParentNode("p", text_to_children(block, context))
+
+
+_BLOCK_RENDERERS = {
+    BlockType.CODE: _code_to_html_node,
+    BlockType.HEADING: _heading_to_html_node,
+    BlockType.QUOTE: _quote_to_html_node,
+    BlockType.UNORDERED_LIST: _unordered_list_to_html_node,
+    BlockType.ORDERED_LIST: _ordered_list_to_html_node,
+    BlockType.PARAGRAPH: _paragraph_to_html_node,
+}
 
 
 def markdown_to_blocks(markdown):
@@ -90,25 +224,46 @@ def markdown_to_blocks(markdown):
     return clean_blocks
 
 
+def iter_markdown_blocks(source):
+    # Lazy equivalent of markdown_to_blocks: a line holding only whitespace
+    # is exactly what the "\n\s*\n" separator matches.
+    block = []
+    for line in _iter_lines(source):
+        if line.strip():
+            block.append(line)
+        elif block:
+            yield "".join(block).strip()
+            block = []
+
+    if block:
+        yield "".join(block).strip()
+
+
+def _iter_lines(source):
+    if isinstance(source, str):
+        return io.StringIO(source)
+    if isinstance(source, mmap.mmap):
+        return (
+            line.decode("utf-8").replace("\r\n", "\n")
+            for line in iter(source.readline, b"")
+        )
+    return source
+
+
+_BLOCK_TAGS = {
+    BlockType.PARAGRAPH: "p",
+    BlockType.CODE: "pre",
+    BlockType.QUOTE: "blockquote",
+    BlockType.UNORDERED_LIST: "ul",
+    BlockType.ORDERED_LIST: "ol",
+}
+
+
 def block_type_to_tag(block_type, block):
-    match block_type:
-        case BlockType.PARAGRAPH:
-            return "p"
-        case BlockType.HEADING:
-            level = 1
-            match = re.match(r"(#{1,6}) ", block)
-            if match:
-                level = len(match.group(1))
-
-            return f"h{level}"
-        case BlockType.CODE:
-            return "pre"
-        case BlockType.QUOTE:
-            return "blockquote"
-        case BlockType.UNORDERED_LIST:
-            return "ul"
-        case BlockType.ORDERED_LIST:
-            return "ol"
+    if block_type == BlockType.HEADING:
+        match = _HEADING_RE.match(block)
+        return f"h{len(match.group(1)) if match else 1}"
+    return _BLOCK_TAGS.get(block_type)
 
 
 if __name__ == "__main__":
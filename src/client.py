@@ -0,0 +1,75 @@
+import argparse
+import json
+import os
+import socket
+import sys
+
+# Deliberately imports nothing from the generator itself: the point of the
+# client is to skip loading it on every invocation.
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def default_socket_path(root_dir=ROOT_DIR):
+    return os.path.join(root_dir, ".cache", "build.sock")
+
+
+def send_request(socket_path, command, timeout=None, **params):
+    request = dict(params, command=command)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(os.fspath(socket_path))
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as f:
+            line = f.readline()
+    if not line:
+        raise ConnectionError("daemon closed the connection without replying")
+    return json.loads(line)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Send a request to a running build daemon (main.py --daemon)."
+    )
+    parser.add_argument(
+        "command",
+        nargs="?",
+        default="build",
+        choices=("build", "status", "invalidate", "shutdown"),
+    )
+    parser.add_argument("basepath", nargs="?", default=None)
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="rebuild everything instead of only what changed",
+    )
+    parser.add_argument("--socket", default=default_socket_path(), metavar="PATH")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    params = {}
+    if args.basepath is not None:
+        params["basepath"] = args.basepath
+    if args.command == "build":
+        params["incremental"] = not args.full
+
+    try:
+        response = send_request(args.socket, args.command, **params)
+    except (FileNotFoundError, ConnectionRefusedError):
+        print(f"No build daemon listening on {args.socket}", file=sys.stderr)
+        return 2
+
+    sys.stdout.write(response.get("log", ""))
+    for key, value in response.items():
+        if key not in ("ok", "log", "error"):
+            print(f"{key}: {value}")
+    if not response.get("ok"):
+        print(f"Error: {response.get('error')}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+import gzip
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from manifest import OutputState, hash_bytes, prune_empty_dirs, read_state
+from staging import replace_if_changed
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_EXTENSIONS = {
+    ".html",
+    ".css",
+    ".js",
+    ".mjs",
+    ".json",
+    ".svg",
+    ".xml",
+    ".txt",
+    ".map",
+    ".wasm",
+}
+
+
+def _gzip(data):
+    # mtime=0 keeps the output byte-identical for identical input.
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _brotli(data):
+    return brotli.compress(data, quality=11)
+
+
+def _zstd(data):
+    return zstandard.ZstdCompressor(level=19).compress(data)
+
+
+FORMATS = {
+    "gzip": (".gz", _gzip),
+    "br": (".br", _brotli),
+    "zstd": (".zst", _zstd),
+}
+SUFFIXES = tuple(suffix for suffix, _ in FORMATS.values())
+
+
+def available_formats():
+    formats = ["gzip"]
+    if brotli is not None:
+        formats.append("br")
+    if zstandard is not None:
+        formats.append("zstd")
+    return formats
+
+
+class CompressStats:
+    def __init__(self):
+        self.compressed_files = 0
+        self.skipped_files = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def __repr__(self):
+        return (
+            f"CompressStats(compressed={self.compressed_files}, "
+            f"skipped={self.skipped_files}, "
+            f"bytes_in={self.bytes_in}, bytes_out={self.bytes_out})"
+        )
+
+
+class Compressor(OutputState):
+    # Compresses outputs on a thread pool while the build keeps rendering;
+    # zlib and friends release the GIL, so this overlaps with page work.
+    # The state file holds, for each output, the content hash it was last
+    # compressed at and the suffixes of the siblings that came out smaller,
+    # so outputs with none are not compressed again either.
+
+    VERSION = 2
+
+    def __init__(
+        self,
+        state_path,
+        output_dir,
+        formats=None,
+        threshold=1024,
+        jobs=4,
+        deploy=None,
+    ):
+        super().__init__(state_path, output_dir)
+        self.deploy = deploy
+        wanted = formats or available_formats()
+        self.formats = [name for name in wanted if name in available_formats()]
+        self.threshold = threshold
+        self.executor = ThreadPoolExecutor(max_workers=max(1, jobs))
+        self.futures = []
+        self.stats = CompressStats()
+        self.state = {}
+        self.submitted = set()
+        self.load()
+
+    def _load_state(self, data):
+        # Entries made with other settings may lack wanted siblings or keep
+        # unwanted ones, so they are all compressed again.
+        settings = data.get("formats"), data.get("threshold")
+        if settings == (self.formats, self.threshold):
+            self.state = data.get("files", {})
+
+    def _state(self):
+        return {
+            "files": self.state,
+            "formats": self.formats,
+            "threshold": self.threshold,
+        }
+
+    def wants(self, path):
+        return os.path.splitext(path)[1].lower() in COMPRESSIBLE_EXTENSIONS
+
+    def submit(self, path):
+        path = os.fspath(path)
+        if self.wants(path):
+            self.submitted.add(self.output_key(path))
+            self.futures.append(self.executor.submit(self._compress, path))
+
+    def submit_missing(self, keys):
+        # Outputs the build skipped as unchanged only need work if they were
+        # never compressed, e.g. on the first build with compression on.
+        for key in keys:
+            if key not in self.submitted and key not in self.state:
+                self.submit(os.path.join(self.output_dir, *key.split("/")))
+
+    def _compress(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        key = self.output_key(path)
+        digest = hash_bytes(data)
+        # Outputs below the threshold are recorded with no siblings, and
+        # count as neither compressed (True) nor skipped (False).
+        small = len(data) < self.threshold
+        entry = self.state.get(key)
+        if (
+            entry is not None
+            and entry["hash"] == digest
+            and all(os.path.exists(path + suffix) for suffix in entry["siblings"])
+        ):
+            if self.deploy is not None:
+                for suffix in entry["siblings"]:
+                    self.deploy.keep(path + suffix)
+            return key, entry, None if small else False, 0, 0
+
+        siblings = []
+        written = 0
+        if not small:
+            for name in self.formats:
+                suffix, compress = FORMATS[name]
+                packed = compress(data)
+                if len(packed) >= len(data):
+                    continue
+                sibling = path + suffix
+                tmp_path = f"{sibling}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(packed)
+                replace_if_changed(tmp_path, sibling)
+                siblings.append(suffix)
+                written += len(packed)
+                if self.deploy is not None:
+                    self.deploy.record(sibling, hash_bytes(packed), len(packed))
+        self._remove_siblings(path, keep=siblings)
+        entry = {"hash": digest, "siblings": siblings}
+        return key, entry, None if small else True, len(data), written
+
+    def _remove_siblings(self, path, keep=()):
+        for suffix in SUFFIXES:
+            if suffix not in keep and os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    def discard(self, path):
+        path = os.fspath(path)
+        self._remove_siblings(path)
+        if self.state.pop(self.output_key(path), None) is not None:
+            self.dirty = True
+        prune_empty_dirs(os.path.dirname(path), self.output_dir)
+
+    def collect(self):
+        # Waits for outstanding work in submission order, so the first error
+        # raised is deterministic, and returns the stats of that work. The
+        # pool stays up for a build session that compresses again later.
+        try:
+            for future in self.futures:
+                key, entry, compressed, bytes_in, bytes_out = future.result()
+                if self.state.get(key) != entry:
+                    self.state[key] = entry
+                    self.dirty = True
+                if compressed:
+                    self.stats.compressed_files += 1
+                    self.stats.bytes_in += bytes_in
+                    self.stats.bytes_out += bytes_out
+                elif compressed is not None:
+                    self.stats.skipped_files += 1
+        finally:
+            self.futures = []
+        stats, self.stats = self.stats, CompressStats()
+        return stats
+
+    def close(self):
+        self.executor.shutdown()
+
+    def finish(self):
+        # Collects outstanding work, then persists the state of every output.
+        try:
+            stats = self.collect()
+        finally:
+            self.close()
+        self.save()
+        return stats
+
+
+def discard_siblings(state_path, output_dir):
+    # A build without compression rewrites outputs but not their siblings,
+    # so it removes every sibling an earlier compressed build left behind,
+    # along with that build's state.
+    data = read_state(state_path, Compressor.VERSION)
+    if data is not None:
+        for key in data.get("files", {}):
+            path = os.path.join(output_dir, *key.split("/"))
+            for suffix in SUFFIXES:
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+    if os.path.exists(state_path):
+        os.remove(state_path)
@@ -0,0 +1,98 @@
+import contextlib
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import threading
+
+
+class BuildRequestHandler(socketserver.StreamRequestHandler):
+    # One JSON request per connection, answered with one JSON line.
+
+    def handle(self):
+        line = self.rfile.readline()
+        # A connection closed without a request, like the probe of a second
+        # daemon checking for a live one, gets no answer.
+        if not line.strip():
+            return
+        try:
+            request = json.loads(line)
+        except ValueError:
+            response = {"ok": False, "error": "request is not valid JSON"}
+        else:
+            response = self.server.dispatch(request)
+        self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+class BuildDaemon(socketserver.UnixStreamServer):
+    # Requests are handled one at a time on the serving thread, so builds
+    # never overlap and share the process-wide caches safely.
+
+    def __init__(self, socket_path, handlers, idle_timeout=None):
+        self.socket_path = os.fspath(socket_path)
+        self.handlers = handlers
+        self.timeout = idle_timeout
+        self.stopping = False
+        os.makedirs(os.path.dirname(os.path.abspath(self.socket_path)), exist_ok=True)
+        _remove_stale_socket(self.socket_path)
+        super().__init__(self.socket_path, BuildRequestHandler)
+
+    def dispatch(self, request):
+        command = request.get("command")
+        handler = self.handlers.get(command)
+        if handler is None:
+            return {"ok": False, "error": f"unknown command {command!r}"}
+
+        log = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(log):
+                result = handler(request) or {}
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            return {"ok": False, "error": error, "log": log.getvalue()}
+        return dict(result, ok=True, log=log.getvalue())
+
+    def handle_timeout(self):
+        self.stopping = True
+
+    def stop(self):
+        self.stopping = True
+
+    def serve(self):
+        previous = None
+        if threading.current_thread() is threading.main_thread():
+            previous = signal.signal(signal.SIGTERM, _raise_interrupt)
+        try:
+            while not self.stopping:
+                self.handle_request()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if previous is not None:
+                signal.signal(signal.SIGTERM, previous)
+            self.server_close()
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+def _raise_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def _remove_stale_socket(path):
+    # A socket file left by a daemon that died is removed; one that still
+    # accepts connections belongs to a live daemon and is left alone.
+    if not os.path.exists(path):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except OSError:
+            os.remove(path)
+            return
+    raise RuntimeError(f"A build daemon is already listening on {path}")
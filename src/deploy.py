@@ -0,0 +1,137 @@
+import json
+import mimetypes
+import os
+
+from manifest import OutputState, hash_file
+
+
+class DeployManifest(OutputState):
+    # Describes every file in the output with its hash, size and content
+    # type, plus what was added, changed or removed since the previous
+    # build, so deploy tooling can upload and purge only those paths.
+    # Entries are recorded as outputs are written; unchanged outputs carry
+    # their previous entry forward, so the output tree is never rescanned.
+
+    def __init__(self, path, output_dir):
+        super().__init__(path, output_dir)
+        self.previous = {}
+        self.previous_had_changes = True
+        self.files = {}
+        self.changes = {"added": [], "changed": [], "removed": []}
+
+    def _load_state(self, data):
+        self.previous = data.get("files", {})
+        self.previous_had_changes = any(
+            data.get(name) for name in ("added", "changed", "removed")
+        )
+
+    def _state(self):
+        return {"files": self.files, **self.changes}
+
+    def record(self, path, digest, size):
+        key = self.output_key(path)
+        content_type, encoding = mimetypes.guess_type(key)
+        entry = {
+            "hash": digest,
+            "size": size,
+            "type": content_type or "application/octet-stream",
+        }
+        if encoding is not None:
+            entry["encoding"] = encoding
+        self.files[key] = entry
+
+    def keep(self, path):
+        self._keep_key(self.output_key(path))
+
+    def _keep_key(self, key):
+        # The output was left as it was, so its previous entry still holds;
+        # only an output the previous manifest does not know is hashed.
+        entry = self.previous.get(key)
+        if entry is not None:
+            self.files[key] = entry
+            return
+        path = self._path(key)
+        self.record(path, hash_file(path), os.path.getsize(path))
+
+    def forget(self, key, sibling_suffixes=()):
+        # For an output removed during a build session that keeps its
+        # entries in memory, instead of carrying the others forward again.
+        for suffix in ("",) + tuple(sibling_suffixes):
+            self.files.pop(key + suffix, None)
+
+    def _path(self, key):
+        return os.path.join(self.output_dir, *key.split("/"))
+
+    def carry_forward(self, keys, sibling_suffixes=()):
+        # keys are every output of this build; those not recorded were
+        # skipped as unchanged, and so were their compressed siblings.
+        for key in keys:
+            if key in self.files:
+                continue
+            known = key in self.previous
+            self._keep_key(key)
+            for suffix in sibling_suffixes:
+                sibling = key + suffix
+                if sibling in self.files:
+                    continue
+                if sibling in self.previous:
+                    self.files[sibling] = self.previous[sibling]
+                elif not known and os.path.exists(self._path(sibling)):
+                    self._keep_key(sibling)
+
+    def diff(self):
+        previous, current = self.previous, self.files
+        self.changes = {
+            "added": sorted(current.keys() - previous.keys()),
+            "changed": sorted(
+                key
+                for key in current.keys() & previous.keys()
+                if current[key]["hash"] != previous[key]["hash"]
+            ),
+            "removed": sorted(previous.keys() - current.keys()),
+        }
+        return self.changes
+
+    def save(self):
+        # Rewritten when something changed, or to clear the changes the
+        # previous manifest still lists.
+        changes = self.diff()
+        self.dirty = any(changes.values()) or self.previous_had_changes
+        super().save()
+        # A session that saves again compares with what it saved last.
+        self.previous = dict(self.files)
+        self.previous_had_changes = any(changes.values())
+        return changes
+
+    def clear_changes(self):
+        # Rewrites the saved manifest of a build that changed nothing with
+        # empty change lists. write_state() sorts the keys, so the files sit
+        # between "changed" and "removed" and are copied over as text:
+        # decoding and encoding them again would take longer than the rest
+        # of such a build. A manifest of any other shape is loaded and saved.
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                text = f.read()
+        except OSError:
+            text = ""
+        start = text.find(',"files":{')
+        end = text.rfind(',"removed":[')
+        try:
+            tail = json.loads("{" + text[end + 1 :]) if 0 < start < end else {}
+        except ValueError:
+            tail = {}
+        if (
+            text.startswith('{"added":')
+            and tail.keys() == {"removed", "version"}
+            and tail["version"] == self.VERSION
+        ):
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write('{"added":[],"changed":[]')
+                f.write(text[start:end])
+                f.write(f',"removed":[],"version":{self.VERSION}}}')
+            os.replace(tmp_path, self.path)
+            return
+        if self.load():
+            self.files = self.previous
+            self.save()
@@ -0,0 +1,202 @@
+import hashlib
+import os
+
+from manifest import hash_file, read_state, write_state
+
+
+class FileIndex:
+    # Remembers the content hash of every source file next to its stat
+    # signature. While size, mtime and inode are unchanged the stored hash
+    # is trusted, so an unchanged tree is checked without reading any file.
+
+    VERSION = 1
+
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        self.hashed = 0
+
+    def load(self):
+        if self.path is None:
+            return False
+        data = read_state(self.path, self.VERSION)
+        if data is None:
+            return False
+        self.entries = data.get("files", {})
+        return True
+
+    def save(self):
+        if self.path is None or not self.dirty:
+            return
+        write_state(self.path, {"version": self.VERSION, "files": self.entries})
+        self.dirty = False
+
+    def hash(self, path, stat=None):
+        path = os.fspath(path)
+        stat = stat or os.stat(path)
+        signature = [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+        entry = self.entries.get(path)
+        if entry is not None and entry[:3] == signature:
+            return entry[3]
+
+        digest = hash_file(path)
+        self.entries[path] = signature + [digest]
+        self.dirty = True
+        self.hashed += 1
+        return digest
+
+    def forget(self, path):
+        if self.entries.pop(os.fspath(path), None) is not None:
+            self.dirty = True
+
+
+def scan_tree(root):
+    # Walks like os.walk(root) with sorted directories, yielding each
+    # directory with its sorted file entries. The DirEntry objects carry the
+    # type from readdir and cache their stat, so each file is stat'ed once.
+    stack = [os.fspath(root)]
+    while stack:
+        directory = stack.pop()
+        files = []
+        dirs = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    dirs.append(entry.path)
+                else:
+                    files.append(entry)
+        files.sort(key=lambda entry: entry.name)
+        yield directory, files
+        stack.extend(sorted(dirs, reverse=True))
+
+
+def input_digest(paths, settings=()):
+    # A digest of the settings and of the stat signature of every file at or
+    # below paths, which changes whenever one is added, removed or written.
+    # Directories are read in the order the filesystem lists them, which
+    # only changes when they do: unlike scan_tree() nothing is sorted, as
+    # this walk is most of what a no-op build does besides the stat calls.
+    digest = hashlib.sha256(repr(settings).encode("utf-8"))
+    for path in paths:
+        path = os.fspath(path)
+        if not os.path.isdir(path):
+            digest.update(repr((path, _stat_signature(path))).encode("utf-8"))
+            continue
+        stack = [path]
+        while stack:
+            directory = stack.pop()
+            signatures = [directory]
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        stack.append(entry.path)
+                        continue
+                    stat = entry.stat()
+                    signatures.append(
+                        f"{entry.name}\0{stat.st_size}\0"
+                        f"{stat.st_mtime_ns}\0{stat.st_ino}"
+                    )
+            digest.update("\n".join(signatures).encode("utf-8", "surrogateescape"))
+    return digest.hexdigest()
+
+
+def _signature(stat):
+    return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+
+def _stat_signature(path):
+    try:
+        return _signature(os.stat(path))
+    except FileNotFoundError:
+        return None
+
+
+class BuildStamp:
+    # What the last build found and left behind: the digest of its inputs,
+    # the stat signatures of the state files beside the stamp and the mtimes
+    # of the directories holding its outputs, which change when an output
+    # is removed or replaced. While all of them match, an incremental build
+    # has nothing to do and need not even load the state files. The report
+    # keeps what such a build still prints.
+
+    VERSION = 1
+
+    def __init__(self, path):
+        self.path = os.fspath(path)
+        self.inputs = None
+        self.state = {}
+        self.outputs = {}
+        self.report = {}
+
+    def load(self):
+        data = read_state(self.path, self.VERSION)
+        if data is None:
+            return False
+        self.inputs = data.get("inputs")
+        self.state = data.get("state", {})
+        self.outputs = data.get("outputs", {})
+        self.report = data.get("report", {})
+        return True
+
+    def matches(self, inputs, output_dir):
+        if self.inputs is None or inputs != self.inputs:
+            return False
+        if self.state_files() != self.state:
+            return False
+        return self._output_dirs(output_dir, self.outputs) == self.outputs
+
+    def record(self, inputs, output_dir, keys, report):
+        # keys are those of every output, "/"-separated below output_dir.
+        self.inputs = inputs
+        self.outputs = self._output_dirs(
+            output_dir, {key.rpartition("/")[0] for key in keys} | {""}
+        )
+        self.report = report
+        self.save()
+
+    def save(self):
+        self.state = self.state_files()
+        write_state(
+            self.path,
+            {
+                "version": self.VERSION,
+                "inputs": self.inputs,
+                "state": self.state,
+                "outputs": self.outputs,
+                "report": self.report,
+            },
+        )
+
+    def clear(self):
+        # A build that goes on to change anything drops the stamp first, so
+        # one that fails part way is never taken for finished.
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.inputs = None
+
+    def state_files(self):
+        directory, name = os.path.split(self.path)
+        state = {}
+        try:
+            entries = os.scandir(directory or ".")
+        except FileNotFoundError:
+            return state
+        with entries:
+            for entry in entries:
+                if entry.name.endswith(".json") and entry.name != name:
+                    state[entry.name] = _signature(entry.stat())
+        return state
+
+    def _output_dirs(self, output_dir, dirs):
+        return {
+            key: _mtime(os.path.join(output_dir, *key.split("/")))
+            for key in sorted(dirs)
+        }
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
@@ -1,7 +1,31 @@
+import re
+
 from textnode import TextType
 
+# Whitespace inside these elements is rendered as written.
+WHITESPACE_SENSITIVE_TAGS = frozenset(("pre", "code", "textarea", "script", "style"))
+
+# Only HTML's own whitespace collapses; U+00A0 and other Unicode spaces
+# render differently and are left alone. Every character removed is ASCII,
+# so the characters saved are the bytes saved.
+_WHITESPACE_RE = re.compile(r"[ \t\n\r\f]+")
+
+
+class MinifyStats:
+    __slots__ = ("saved",)
+
+    def __init__(self):
+        self.saved = 0
+
+    def collapse(self, text):
+        collapsed = _WHITESPACE_RE.sub(" ", text)
+        self.saved += len(text) - len(collapsed)
+        return collapsed
+
 
 class HTMLNode:
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag=None, value=None, children=None, props=None):
         self.tag = tag
         self.value = value
@@ -11,6 +35,17 @@ class HTMLNode:
     def to_html(self):
         raise NotImplementedError
 
+    def to_html_chunks(self):
+        chunks = []
+        self.serialize(chunks.append)
+        return chunks
+
+    def write_html(self, fp):
+        self.serialize(fp.write)
+
+    def serialize(self, write, minify=None):
+        write(self.to_html())
+
     def props_to_html(self):
         if self.props is not None:
             return " " + (
@@ -24,8 +59,15 @@ class HTMLNode:
 
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, value, props=None):
-        super().__init__(tag=tag, value=value, props=props)
+        # Assigned directly rather than via super().__init__: one leaf is
+        # built per inline fragment, so the extra call adds up.
+        self.tag = tag
+        self.value = value
+        self.children = None
+        self.props = props
 
     def to_html(self):
         if self.value is None:
@@ -39,26 +81,53 @@ class LeafNode(HTMLNode):
         else:
             return f"<{self.tag}>{self.value}</{self.tag}>"
 
+    def serialize(self, write, minify=None):
+        if minify is None or not self.value or self.tag in WHITESPACE_SENSITIVE_TAGS:
+            write(self.to_html())
+            return
+
+        value = minify.collapse(self.value)
+        if self.tag is None:
+            write(value)
+        elif self.props:
+            write(f"<{self.tag}{self.props_to_html()}>{value}</{self.tag}>")
+        else:
+            write(f"<{self.tag}>{value}</{self.tag}>")
+
 
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, children, props=None):
-        super().__init__(tag=tag, children=children, props=props)
+        self.tag = tag
+        self.value = None
+        self.children = children
+        self.props = props
 
     def to_html(self):
+        return "".join(self.to_html_chunks())
+
+    def serialize(self, write, minify=None):
+        # Every node in the tree writes into the same sink, so the output is
+        # produced in one linear pass instead of re-copying child strings.
+        # With a MinifyStats, text collapses its whitespace on the way out.
         if self.tag is None:
             raise ValueError
 
         if not self.children:
             raise ValueError("Children must be provided")
 
-        html_string = ""
-        for child in self.children:
-            html_string = html_string + child.to_html()
-
         if self.props:
-            return f"<{self.tag}{self.props_to_html()}>{html_string}</{self.tag}>"
+            write(f"<{self.tag}{self.props_to_html()}>")
         else:
-            return f"<{self.tag}>{html_string}</{self.tag}>"
+            write(f"<{self.tag}>")
+
+        if self.tag in WHITESPACE_SENSITIVE_TAGS:
+            minify = None
+        for child in self.children:
+            child.serialize(write, minify)
+
+        write(f"</{self.tag}>")
 
 
 def text_node_to_html_node(text_node):
@@ -0,0 +1,157 @@
+import os
+import posixpath
+import re
+from urllib.parse import unquote
+
+from manifest import OutputState
+
+_SCHEME_RE = re.compile(r"[A-Za-z][A-Za-z0-9+.-]*:")
+
+
+def resolve_link(page_key, url):
+    # Returns the "/"-separated path below the site root that url points to
+    # from the page at page_key, or None for external and same-page links.
+    if url.startswith(("#", "//")) or _SCHEME_RE.match(url):
+        return None
+    path = unquote(url.split("#", 1)[0].split("?", 1)[0])
+    if not path:
+        return None
+    if path.startswith("/"):
+        path = path[1:]
+    else:
+        path = posixpath.join(posixpath.dirname(page_key), path)
+    path = posixpath.normpath(path) if path else ""
+    return "" if path == "." else path
+
+
+def page_url(key):
+    # The root-relative URL of the output at key: a directory's index page
+    # is linked by the directory.
+    if key == "index.html" or key.endswith("/index.html"):
+        key = key[: -len("index.html")]
+    return f"/{key}"
+
+
+def link_candidates(path):
+    # A link resolves to a file, a page without its .html suffix, or a
+    # directory's index page.
+    if not path:
+        return ("index.html",)
+    return (path, f"{path}.html", f"{path}/index.html")
+
+
+def _link_paths(output_key):
+    # The inverse of link_candidates: every path that reaches output_key.
+    paths = [output_key]
+    if output_key.endswith(".html"):
+        paths.append(output_key[:-5])
+    if posixpath.basename(output_key) == "index.html":
+        paths.append(posixpath.dirname(output_key))
+    return paths
+
+
+class LinkGraph(OutputState):
+    # Remembers the link and image targets of every page, as the inline
+    # parser found them, so links are validated against the set of outputs
+    # without reading any page back. Pages that were not rendered keep their
+    # targets and their last result; only rendered pages and pages linking
+    # to an output that appeared or disappeared are checked again. check()
+    # also keeps the links each checked page broke or fixed in changes.
+    # Which pages link to a path is indexed the first time an output
+    # appears or disappears, or ahead of that by index_targets(), and kept
+    # up to date from then on.
+
+    def __init__(self, path, output_dir):
+        super().__init__(path, output_dir)
+        self.links = {}
+        self.broken = {}
+        self.pending = set()
+        self.changes = {}
+        self._linking = None
+
+    def _load_state(self, data):
+        self.links = data.get("links", {})
+        self.broken = data.get("broken", {})
+        self._linking = None
+
+    def _state(self):
+        return {"links": self.links, "broken": self.broken}
+
+    def record(self, dest_path, links):
+        key = self.output_key(dest_path)
+        self.pending.add(key)
+        if self.links.get(key) != links:
+            self._unindex(key)
+            self.links[key] = links
+            self._index(key)
+            self.dirty = True
+
+    def check(self, outputs, changed=None):
+        # outputs is the set of every output key; changed holds those added
+        # or removed since the last check, or None to check every page.
+        for key in [key for key in self.links if key not in outputs]:
+            self._unindex(key)
+            del self.links[key]
+            self.broken.pop(key, None)
+            self.dirty = True
+
+        if changed is None:
+            affected = set(self.links)
+        else:
+            affected = self.pending & self.links.keys()
+            if changed:
+                affected |= self._pages_linking_to(changed)
+        self.pending = set()
+        self.changes = {}
+
+        for key in affected:
+            broken = [
+                url
+                for url in self.links[key]
+                if not self._exists(resolve_link(key, url), outputs)
+            ]
+            previous = self.broken.get(key, [])
+            if previous != broken:
+                added = [url for url in broken if url not in previous]
+                fixed = [url for url in previous if url not in broken]
+                if added or fixed:
+                    self.changes[key] = (added, fixed)
+                if broken:
+                    self.broken[key] = broken
+                else:
+                    del self.broken[key]
+                self.dirty = True
+        return self.broken
+
+    def _exists(self, path, outputs):
+        if path is None:
+            return True
+        return any(candidate in outputs for candidate in link_candidates(path))
+
+    def index_targets(self):
+        if self._linking is None:
+            self._linking = {}
+            for key in self.links:
+                self._index(key)
+
+    def _pages_linking_to(self, changed):
+        self.index_targets()
+        pages = set()
+        for key in changed:
+            for path in _link_paths(key):
+                pages.update(self._linking.get(path, ()))
+        return pages
+
+    def _index(self, key):
+        if self._linking is not None:
+            for url in self.links[key]:
+                path = resolve_link(key, url)
+                if path is not None:
+                    self._linking.setdefault(path, set()).add(key)
+
+    def _unindex(self, key):
+        if self._linking is not None and key in self.links:
+            for url in self.links[key]:
+                pages = self._linking.get(resolve_link(key, url))
+                if pages is not None:
+                    pages.discard(key)
@@ -0,0 +1,119 @@
+import re
+
+from htmlnode import LeafNode, ParentNode
+from links import page_url
+
+DEFAULT_PAGE_SIZE = 10
+
+_SLUG_RE = re.compile(r"[^\w]+")
+
+
+def slugify(text):
+    return _SLUG_RE.sub("-", text.lower()).strip("-") or "tag"
+
+
+def section_title(section):
+    return section.rsplit("/", 1)[-1].replace("-", " ").capitalize()
+
+
+def sort_entries(entries):
+    # Newest first, undated pages last, each group by title.
+    entries = sorted(entries, key=lambda item: item[1]["title"] or "")
+    return sorted(entries, key=lambda item: item[1]["date"] or "", reverse=True)
+
+
+def listing_pages(section, entries, page_size=DEFAULT_PAGE_SIZE, rewrite=None):
+    # Yields the pages generated for the pages below section, as
+    # (output key, title, content node, link targets): the listing itself,
+    # a page per tag, both split into pages of page_size entries, an index
+    # of the tags and an archive by year. entries maps the output key of
+    # each published page to its metadata; nothing is read from disk.
+    # Pages are built one at a time, so the node trees of a large site's
+    # listings are never all alive at once.
+    prefix = f"{section}/"
+    items = sort_entries(
+        (key, entry) for key, entry in entries.items() if key.startswith(prefix)
+    )
+    if not items:
+        return
+
+    name = section_title(section)
+    yield from _paginate(prefix, name, items, page_size, rewrite)
+
+    tags = {}
+    for item in items:
+        for tag in item[1]["tags"]:
+            tags.setdefault(slugify(tag), (tag, []))[1].append(item)
+    if tags:
+        links = []
+        tag_items = [
+            ParentNode(
+                "li",
+                [
+                    _link(tag, f"/{prefix}tags/{slug}/", links, rewrite),
+                    LeafNode(None, f" ({len(tagged)})"),
+                ],
+            )
+            for slug, (tag, tagged) in sorted(tags.items())
+        ]
+        title = f"{name}: tags"
+        heading = LeafNode("h1", title)
+        content = ParentNode("div", [heading, ParentNode("ul", tag_items)])
+        yield f"{prefix}tags/index.html", title, content, links
+        for slug, (tag, tagged) in sorted(tags.items()):
+            base = f"{prefix}tags/{slug}/"
+            yield from _paginate(base, f"{name}: {tag}", tagged, page_size, rewrite)
+
+    years = {}
+    for item in items:
+        if item[1]["date"]:
+            years.setdefault(item[1]["date"][:4], []).append(item)
+    if years:
+        links = []
+        title = f"{name}: archive"
+        children = [LeafNode("h1", title)]
+        for year, dated in years.items():
+            children.append(LeafNode("h2", year))
+            children.append(_list(dated, links, rewrite))
+        content = ParentNode("div", children)
+        yield f"{prefix}archive/index.html", title, content, links
+
+
+def _paginate(base, title, items, page_size, rewrite):
+    # The first page lives at base, later ones at base/page/<n>/.
+    chunks = [items[i : i + page_size] for i in range(0, len(items), page_size)]
+    urls = [f"/{base}"] + [f"/{base}page/{n}/" for n in range(2, len(chunks) + 1)]
+    for n, chunk in enumerate(chunks):
+        links = []
+        children = [LeafNode("h1", title), _list(chunk, links, rewrite)]
+        nav = []
+        if n > 0:
+            nav.append(_link("Newer", urls[n - 1], links, rewrite))
+        if n + 1 < len(chunks):
+            if nav:
+                nav.append(LeafNode(None, " "))
+            nav.append(_link("Older", urls[n + 1], links, rewrite))
+        if nav:
+            children.append(ParentNode("nav", nav))
+        page_title = title if n == 0 else f"{title}, page {n + 1}"
+        key = f"{urls[n][1:]}index.html"
+        yield key, page_title, ParentNode("div", children), links
+
+
+def _list(items, links, rewrite):
+    list_items = []
+    for key, entry in items:
+        children = [_link(entry["title"], page_url(key), links, rewrite)]
+        date = entry["date"]
+        if date:
+            children.append(LeafNode(None, " "))
+            children.append(LeafNode("time", date, {"datetime": date}))
+        list_items.append(ParentNode("li", children))
+    return ParentNode("ul", list_items)
+
+
+def _link(text, url, links, rewrite):
+    # Records the target as written, like the inline parser does for the
+    # links in content, and rewrites it as pages' content URLs are.
+    links.append(url)
+    return LeafNode("a", text, {"href": url if rewrite is None else rewrite(url)})
@@ -1,90 +1,1561 @@
 from pathlib import Path
-import re
+import argparse
+import contextlib
+import hashlib
+import io
+import itertools
 import os
 import shutil
 import sys
-from block_utils import markdown_to_html_node
+import time
+from concurrent.futures import ProcessPoolExecutor
+from assets import (
+    ASSET_COMPARES,
+    ASSET_MODES,
+    AssetMap,
+    asset_signature,
+    build_asset_map,
+    copy_asset,
+    current_asset_map,
+    set_asset_map,
+    sync_assets,
+)
+from block_cache import BlockCache
+from block_utils import (
+    current_block_cache,
+    markdown_to_html_stream,
+    minify_enabled,
+    set_block_cache,
+    set_minify,
+)
+from client import default_socket_path
+from compress import SUFFIXES, Compressor, available_formats, discard_siblings
+from daemon import BuildDaemon
+from deploy import DeployManifest
+from file_index import BuildStamp, FileIndex, input_digest, scan_tree
+from links import LinkGraph
+from listings import DEFAULT_PAGE_SIZE, listing_pages
+from manifest import BuildManifest, hash_bytes, hash_file
+from metadata import MetadataIndex, heading_title, page_meta, read_front_matter
+from pipeline import run_pipeline
+from profiler import Profiler
+from search import SearchIndex, indexing_enabled, page_terms, set_indexing
+from staging import exchange_dirs, link_tree, prune_unlisted, replace_if_changed
+from template import clear_template_cache, load_template
+from text_utils import (
+    INLINE_PARSERS,
+    RenderContext,
+    current_inline_parser,
+    set_inline_parser,
+)
+from watch import create_watcher, iter_changes, start_server
 
+ROOT_DIR = Path(__file__).parent.parent
 
-def main():
-    basepath = sys.argv[1] if len(sys.argv) > 1 else "/"
-    public_dir = Path(__file__).parent.parent / "docs"
-    static_dir = Path(__file__).parent.parent / "static"
 
-    content_dir = Path(__file__).parent.parent / "content"
-    template_path = Path(__file__).parent.parent / "template.html"
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build the static site.")
+    parser.add_argument("basepath", nargs="?", default="/")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only rebuild outputs whose sources changed since the last build",
+    )
+    parser.add_argument(
+        "--staged",
+        action="store_true",
+        help="build incrementally into a staging copy and swap it in at the end",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="render pages in N worker processes (0 = one per CPU)",
+    )
+    parser.add_argument(
+        "--pipeline",
+        nargs="?",
+        type=int,
+        const=16,
+        default=0,
+        metavar="N",
+        help="overlap reading, rendering and writing pages, with up to N "
+        "pages in flight (with --jobs 1)",
+    )
+    parser.add_argument(
+        "--io-jobs",
+        type=int,
+        default=4,
+        metavar="N",
+        help="read and write pages on N threads with --pipeline",
+    )
+    parser.add_argument(
+        "--inline-parser",
+        choices=sorted(INLINE_PARSERS),
+        default="scan",
+        help="inline markdown tokenizer to use",
+    )
+    parser.add_argument(
+        "--asset-mode",
+        choices=ASSET_MODES,
+        default="copy",
+        help="how static files are placed in the output directory",
+    )
+    parser.add_argument(
+        "--asset-compare",
+        choices=ASSET_COMPARES,
+        default="stat",
+        help="skip static files whose size and mtime, or hash, are unchanged",
+    )
+    parser.add_argument(
+        "--asset-jobs",
+        type=int,
+        default=8,
+        metavar="N",
+        help="copy static files on N threads",
+    )
+    parser.add_argument(
+        "--block-cache",
+        type=int,
+        default=4096,
+        metavar="N",
+        help="keep up to N rendered blocks in memory (0 disables)",
+    )
+    parser.add_argument(
+        "--persistent-block-cache",
+        action="store_true",
+        help="also keep rendered blocks in .cache/ across builds",
+    )
+    parser.add_argument(
+        "--fingerprint",
+        action="store_true",
+        help="give static files content-hashed names and rewrite links to them",
+    )
+    parser.add_argument(
+        "--strict-links",
+        action="store_true",
+        help="fail the build when a page links to an output that does not exist",
+    )
+    parser.add_argument(
+        "--verbose-links",
+        action="store_true",
+        help="list every broken link, not only those that broke or were fixed",
+    )
+    parser.add_argument(
+        "--search",
+        action="store_true",
+        help="write a client-side search index, sharded by term prefix, to search/",
+    )
+    parser.add_argument(
+        "--listing",
+        action="append",
+        default=[],
+        dest="listings",
+        metavar="SECTION",
+        help="generate paginated listing, tag and archive pages for the pages "
+        "in content/SECTION/ (repeatable)",
+    )
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=DEFAULT_PAGE_SIZE,
+        metavar="N",
+        help="entries per generated listing page",
+    )
+    parser.add_argument(
+        "--drafts",
+        action="store_true",
+        help="also build pages marked draft in their front matter",
+    )
+    parser.add_argument(
+        "--minify",
+        action="store_true",
+        help="collapse insignificant whitespace in the generated pages",
+    )
+    parser.add_argument(
+        "--compress",
+        action="store_true",
+        help="write precompressed siblings of compressible outputs",
+    )
+    parser.add_argument(
+        "--compress-formats",
+        type=lambda value: value.split(","),
+        default=available_formats(),
+        metavar="LIST",
+        help="comma-separated formats among gzip, br and zstd (if installed)",
+    )
+    parser.add_argument(
+        "--compress-threshold",
+        type=int,
+        default=1024,
+        metavar="BYTES",
+        help="leave outputs smaller than BYTES uncompressed",
+    )
+    parser.add_argument(
+        "--compress-jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        metavar="N",
+        help="compress on N threads",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="stay resident and build on requests from src/client.py",
+    )
+    parser.add_argument(
+        "--socket",
+        default=None,
+        metavar="PATH",
+        help="Unix socket for --daemon (default: .cache/build.sock)",
+    )
+    parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=None,
+        metavar="SECONDS",
+        help="exit the daemon after SECONDS without requests",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=str(ROOT_DIR / ".cache" / "profile-trace.json"),
+        metavar="TRACE",
+        help="time each build stage and write a Chrome trace (forces --jobs 1)",
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=10,
+        metavar="N",
+        help="number of slowest pages listed in the profile summary",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="rebuild changed files continuously and serve the site",
+    )
+    parser.add_argument("--port", type=int, default=8888, help="dev server port")
+    parser.add_argument(
+        "--poll",
+        action="store_true",
+        help="watch by polling file stats instead of using inotify",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=int,
+        default=50,
+        metavar="MS",
+        help="wait for MS milliseconds of quiet before rebuilding",
+    )
+    return parser.parse_args(argv)
 
-    if public_dir.exists() and public_dir.is_dir():
-        shutil.rmtree(public_dir)
+
+def main(argv=None):
+    args = parse_args(argv)
+    set_inline_parser(args.inline_parser)
+    set_minify(args.minify)
+    options = {
+        "jobs": args.jobs or os.cpu_count() or 1,
+        "pipeline": args.pipeline,
+        "io_jobs": args.io_jobs,
+        "asset_mode": args.asset_mode,
+        "asset_compare": args.asset_compare,
+        "asset_jobs": args.asset_jobs,
+        "fingerprint": args.fingerprint,
+        "block_cache_size": args.block_cache,
+        "persistent_block_cache": args.persistent_block_cache,
+        "compress": args.compress,
+        "compress_formats": args.compress_formats,
+        "compress_threshold": args.compress_threshold,
+        "compress_jobs": args.compress_jobs,
+        "staged": args.staged,
+        "strict_links": args.strict_links,
+        "verbose_links": args.verbose_links,
+        "search": args.search,
+        "listings": args.listings,
+        "page_size": args.page_size,
+        "drafts": args.drafts,
+    }
+
+    if args.daemon:
+        serve_daemon(
+            ROOT_DIR, args.basepath, args.socket, args.idle_timeout, **options
+        )
+        return
+
+    if args.watch:
+        watch_site(
+            ROOT_DIR,
+            args.basepath,
+            args.port,
+            args.poll,
+            args.debounce / 1000,
+            **options,
+        )
+        return
+
+    if not args.profile:
+        build_site(ROOT_DIR, args.basepath, args.incremental, **options)
+        return
+
+    # The profiler keeps a single stage stack, so everything runs serially.
+    options.update(jobs=1, pipeline=0, asset_jobs=1)
+    profiler = Profiler()
+    profiler.instrument(sys.modules[__name__])
+    try:
+        with profiler.stage("build", trace=True):
+            build_site(ROOT_DIR, args.basepath, args.incremental, **options)
+    finally:
+        profiler.restore()
+
+    print(profiler.summary(args.profile_top))
+    profiler.write_trace(args.profile)
+    print(f"Wrote trace to {args.profile}")
+
+
+def build_site(
+    root_dir,
+    basepath="/",
+    incremental=False,
+    jobs=1,
+    pipeline=0,
+    io_jobs=4,
+    asset_mode="copy",
+    asset_compare="stat",
+    asset_jobs=8,
+    fingerprint=False,
+    block_cache_size=0,
+    persistent_block_cache=False,
+    compress=False,
+    compress_formats=None,
+    compress_threshold=1024,
+    compress_jobs=4,
+    file_index=None,
+    staged=False,
+    strict_links=False,
+    verbose_links=False,
+    search=False,
+    listings=(),
+    page_size=DEFAULT_PAGE_SIZE,
+    drafts=False,
+    resident=None,
+):
+    root_dir = Path(root_dir)
+    public_dir = root_dir / "docs"
+    static_dir = root_dir / "static"
+
+    content_dir = root_dir / "content"
+    template_path = root_dir / "template.html"
+    manifest_path = root_dir / ".cache" / "build-manifest.json"
+
+    # An incremental build that finds its inputs, its state and its outputs
+    # as the last build left them has nothing to do, and stops before any
+    # state file is read.
+    stamp = BuildStamp(root_dir / ".cache" / "build-stamp.json")
+    inputs = input_digest(
+        (content_dir, static_dir, template_path),
+        (
+            basepath,
+            fingerprint,
+            asset_mode,
+            asset_compare,
+            compress,
+            compress_formats,
+            compress_threshold,
+            search,
+            list(listings),
+            page_size,
+            drafts,
+            minify_enabled(),
+        ),
+    )
+    if incremental and not verbose_links and stamp.load():
+        report = stamp.report
+        if stamp.matches(inputs, public_dir) and not (
+            strict_links and report["broken"]
+        ):
+            previous = stamp.state
+            _finish_unchanged(root_dir, public_dir, stamp)
+            if resident is not None:
+                resident.deploy_cleared(previous, stamp.state)
+            return
+
+    # Full builds (and incremental ones when asked) write into a staging
+    # tree seeded with hardlinks to the current output, which is swapped in
+    # at the end, so docs/ is never empty or half-written. A failed build
+    # leaves docs/ untouched; its staging tree is cleared by the next build.
+    staged = staged or not incremental
+    output_dir = public_dir
+    if staged:
+        output_dir = root_dir / ".cache" / "docs-staging"
+
+    # The daemon keeps the session of its last build, with the state it
+    # loaded, while the state files are as that build left them.
+    settings = (
+        os.fspath(output_dir),
+        basepath,
+        search,
+        drafts,
+        compress,
+        compress_formats,
+        compress_threshold,
+        compress_jobs,
+    )
+    build = None
+    if resident is not None:
+        build = resident.take(settings, stamp.state_files())
+    stamp.clear()
+
+    if staged:
+        if output_dir.exists():
+            shutil.rmtree(output_dir)
+        if public_dir.is_dir():
+            link_tree(public_dir, output_dir)
+        else:
+            os.makedirs(output_dir)
+
+    # Long-running callers pass their own index; otherwise it is read from
+    # and written back to .cache/ around the build.
+    if file_index is None:
+        file_index = _load_file_index(root_dir)
+
+    # Fingerprints are known before anything is rendered, so the template
+    # and every page link the assets by their final names.
+    assets = None
+    if fingerprint:
+        assets = build_asset_map(static_dir, file_index)
+        assets.save(root_dir / ".cache" / "asset-map.json")
+
+    # Full builds render every page again, but still read the manifest: its
+    # keys let them remove outputs that went away, and its file entries let
+    # hash-compared static files be skipped.
+    if build is None:
+        manifest = BuildManifest(manifest_path, output_dir)
+        manifest.load()
+    else:
+        manifest = build.manifest
+    if not incremental:
+        manifest.invalidate_pages()
+    template = load_template(template_path, basepath, minify_enabled(), assets)
+
+    # Only builds that index keep the index's record of the pages current,
+    # so without one every page is rendered again to be indexed.
+    search_index = None
+    search_path = root_dir / ".cache" / "search-index.json"
+    if search and incremental and build is not None:
+        search_index = build.search_index
+    elif search:
+        search_index = SearchIndex(search_path, output_dir, basepath)
+        if incremental and not search_index.load():
+            manifest.invalidate_pages()
+    elif search_path.exists():
+        os.remove(search_path)
+
+    if build is None:
+        build = _BuildSession(
+            root_dir,
+            output_dir,
+            manifest,
+            file_index,
+            assets,
+            search_index,
+            drafts,
+            compress,
+            compress_formats,
+            compress_threshold,
+            compress_jobs,
+        )
+        # Links are checked against every output; an incremental build
+        # only rechecks pages it rendered or that link to outputs it added
+        # or removed. Full builds recheck every page, but still load the
+        # graph so only the links that broke or were fixed since the last
+        # build are reported.
+        if incremental:
+            build.load_previous()
+        else:
+            build.link_graph.load()
+    else:
+        build.file_index = file_index
+        build.search_index = search_index
+        if not incremental:
+            build.previous_outputs = None
+    build.assets = assets
+    manifest.begin(template.hash, basepath)
+
+    # A caller such as watch mode may keep one cache alive across builds.
+    cache = current_block_cache()
+    owns_cache = cache is None and (block_cache_size or persistent_block_cache)
+    if owns_cache:
+        cache_path = root_dir / ".cache" / "blocks.sqlite3"
+        cache = BlockCache(
+            block_cache_size, cache_path if persistent_block_cache else None
+        )
+        set_block_cache(cache)
 
     # shutil.copytree(static_dir, public_dir)
-    copy_file_tree(static_dir, public_dir)
-    generate_pages_recursive(content_dir, template_path, public_dir, basepath)
+    stats = copy_file_tree(
+        static_dir,
+        output_dir,
+        manifest,
+        asset_mode,
+        asset_compare,
+        asset_jobs,
+        index=file_index,
+        names=assets and assets.urls,
+    )
+    print(
+        f"Static files: copied {stats.copied_files} ({stats.copied_bytes} bytes), "
+        f"skipped {stats.skipped_files} ({stats.skipped_bytes} bytes)"
+    )
+    for path in stats.copied_paths:
+        build.on_written(path, hash_file(path), os.path.getsize(path))
 
+    try:
+        with build.rendering():
+            build.generate_pages(
+                content_dir,
+                template_path,
+                output_dir,
+                basepath,
+                jobs,
+                pipeline,
+                io_jobs,
+            )
+    finally:
+        if owns_cache:
+            set_block_cache(None)
+            cache.close()
 
-def copy_file_tree(src, dst):
-    os.makedirs(dst, exist_ok=True)
+    if cache is not None:
+        stats = cache.stats()
+        print(
+            f"Block cache: {stats['hits']} hits ({stats['disk_hits']} from disk), "
+            f"{stats['misses']} misses"
+        )
 
-    for item in os.listdir(src):
-        src_path = os.path.join(src, item)
-        dst_path = os.path.join(dst, item)
+    build.metadata.prune()
 
-        if os.path.isdir(src_path):
-            copy_file_tree(src_path, dst_path)
+    def on_listing(path, digest, size, links):
+        build.link_graph.record(path, links)
+        build.on_written(path, digest, size)
+
+    generate_listings(
+        build.metadata,
+        listings,
+        content_dir,
+        output_dir,
+        template,
+        manifest,
+        page_size,
+        on_listing,
+    )
+
+    # Whatever a full build did not produce was only inherited through the
+    # hardlinked seed.
+    build.finish(
+        remove_stale=True,
+        prune=not incremental,
+        strict_links=strict_links,
+        verbose_links=verbose_links,
+    )
+    build.carry_forward()
+    build.save_deploy()
+
+    if staged:
+        if public_dir.is_dir():
+            exchange_dirs(output_dir, public_dir)
+            shutil.rmtree(output_dir)
         else:
-            shutil.copy2(src_path, dst_path)
+            os.rename(output_dir, public_dir)
+    manifest.save()
+    build.save()
+    outputs = itertools.chain(manifest.pages, manifest.files)
+    stamp.record(inputs, public_dir, outputs, build.report)
+    if resident is None:
+        build.close()
+    else:
+        resident.keep(build, settings, stamp.state)
 
 
-def extract_title(markdown):
-    title = markdown.split("\n", 1)[0]
-    match = re.match(r"^#[^#]", title.strip())
-    if match:
-        return title.strip(" #\t\n")
+class _ResidentState:
+    # The session of the daemon's last build, with the manifest and the
+    # rest of the state it holds in memory. It is used again while the
+    # settings that shape it are the same and the state files are as that
+    # build left them, so a build from the command line in between is seen.
+
+    def __init__(self):
+        self.session = None
+        self.settings = None
+        self.state = None
+
+    def take(self, settings, state):
+        # Hands the session to one build. A build that fails never gives it
+        # back, so state it left half updated is not used again.
+        session, self.session = self.session, None
+        if session is not None and (settings, state) != (self.settings, self.state):
+            session.close()
+            return None
+        return session
+
+    def keep(self, session, settings, state):
+        self.session = session
+        self.settings = settings
+        self.state = state
+
+    def deploy_cleared(self, previous, state):
+        # A build that found nothing to do cleared the deploy manifest's
+        # changes, which moved the state files on from previous to state.
+        if self.session is not None and self.state == previous:
+            self.session.deploy.previous_had_changes = False
+            self.state = state
+
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
+
+def _finish_unchanged(root_dir, output_dir, stamp):
+    report = stamp.report
+    print("Nothing changed since the last build")
+    print(
+        f"Link check: {report['broken']} broken links in "
+        f"{report['broken_pages']} pages"
+    )
+    # The deploy manifest lists what the last build changed until a build
+    # clears the list, which is the only state such a build writes.
+    if report["deploy_changes"]:
+        deploy = DeployManifest(
+            root_dir / ".cache" / "deploy-manifest.json", output_dir
+        )
+        deploy.clear_changes()
+        report["deploy_changes"] = False
+        stamp.save()
+    print("Deploy manifest: 0 added, 0 changed, 0 removed")
+
+
+def _load_file_index(root_dir):
+    file_index = FileIndex(os.fspath(root_dir / ".cache" / "file-index.json"))
+    file_index.load()
+    return file_index
+
+
+class _BuildSession:
+    # What build_site and rebuild_changed share about one build into
+    # output_dir: the state kept in .cache/ next to the build manifest, the
+    # handling of every output written or removed, and the stages that
+    # follow rendering, from the search index to the deploy manifest.
+
+    def __init__(
+        self,
+        root_dir,
+        output_dir,
+        manifest,
+        file_index,
+        assets=None,
+        search_index=None,
+        drafts=False,
+        compress=False,
+        compress_formats=None,
+        compress_threshold=1024,
+        compress_jobs=4,
+    ):
+        cache_dir = Path(root_dir) / ".cache"
+        self.output_dir = output_dir
+        self.manifest = manifest
+        self.file_index = file_index
+        self.assets = assets
+        self.search_index = search_index
+        self.previous_outputs = None
+        # What finish() found, kept in the build stamp for builds that stop
+        # early because nothing changed.
+        self.report = {}
+        self.link_graph = LinkGraph(cache_dir / "link-graph.json", output_dir)
+
+        # Front matter is cached by source hash, which holds whatever the
+        # kind of build, so even full builds only read the headers of
+        # changed pages.
+        self.metadata = MetadataIndex(cache_dir / "metadata.json", output_dir, drafts)
+        self.metadata.load()
+
+        self.deploy = DeployManifest(cache_dir / "deploy-manifest.json", output_dir)
+        self.deploy.load()
+
+        self.compressor = None
+        compress_path = cache_dir / "compress-state.json"
+        if compress:
+            self.compressor = Compressor(
+                compress_path,
+                output_dir,
+                compress_formats,
+                compress_threshold,
+                compress_jobs,
+                self.deploy,
+            )
+        elif compress_path.exists():
+            discard_siblings(compress_path, output_dir)
+
+    def load_previous(self):
+        # Incremental builds start from the outputs and links of the last.
+        self.link_graph.load()
+        self.previous_outputs = set(self.manifest.pages) | set(self.manifest.files)
+
+    @contextlib.contextmanager
+    def rendering(self):
+        # Pages render with the asset map and indexing flag as module state,
+        # which worker processes are initialised with.
+        previous = current_asset_map(), indexing_enabled()
+        set_asset_map(self.assets)
+        set_indexing(self.search_index is not None)
+        try:
+            yield
+        finally:
+            set_asset_map(previous[0])
+            set_indexing(previous[1])
+
+    def on_written(self, path, digest, size):
+        self.deploy.record(path, digest, size)
+        if self.compressor is not None:
+            self.compressor.submit(path)
+
+    def remove_output(self, dest_path):
+        # Removes the output at dest_path, or every output below it.
+        for removed in self.manifest.remove_output(dest_path):
+            self._removed(removed)
+
+    def _removed(self, key):
+        print(f"Removed stale output {key}")
+        self.deploy.forget(key, self._suffixes())
+        if self.compressor is not None:
+            self.compressor.discard(os.path.join(self.output_dir, *key.split("/")))
+
+    def _suffixes(self):
+        return () if self.compressor is None else SUFFIXES
+
+    def generate_pages(
+        self,
+        content_path,
+        template_path,
+        dest_dir,
+        basepath,
+        jobs=1,
+        pipeline=0,
+        io_jobs=4,
+    ):
+        generate_pages_recursive(
+            content_path,
+            template_path,
+            dest_dir,
+            basepath,
+            self.manifest,
+            jobs,
+            self.on_written,
+            self.file_index,
+            pipeline,
+            io_jobs,
+            link_graph=self.link_graph,
+            search_index=self.search_index,
+            metadata=self.metadata,
+        )
+
+    def generate_page(self, from_path, template_path, dest_path, basepath):
+        source_hash = self.file_index.hash(from_path)
+        meta = self.metadata.lookup(dest_path, from_path, source_hash)
+        if not self.metadata.is_published(meta):
+            self.remove_output(dest_path)
+            return
+        key = self.manifest.output_key(dest_path)
+        _, digest, size, links, indexed = generate_page(
+            from_path, template_path, dest_path, basepath, key
+        )
+        self.manifest.record_page(dest_path, from_path, source_hash)
+        self.link_graph.record(dest_path, links)
+        if self.search_index is not None:
+            self.search_index.record(dest_path, *indexed)
+        self.on_written(dest_path, digest, size)
+
+    def finish(
+        self, remove_stale=False, prune=False, strict_links=False, verbose_links=False
+    ):
+        # remove_stale drops the outputs the build did not see; prune also
+        # removes the files in output_dir that no output accounts for.
+        manifest = self.manifest
+        if self.search_index is not None:
+            pages = set(manifest.pages)
+            if remove_stale:
+                pages &= manifest.seen
+            self._update_search_index(pages)
+
+        if remove_stale:
+            for removed in manifest.remove_stale():
+                self._removed(removed)
+
+        outputs = set(manifest.pages) | set(manifest.files)
+        if self.compressor is not None:
+            self.compressor.submit_missing(outputs)
+            stats = self.compressor.collect()
+            print(
+                f"Compressed {stats.compressed_files} files "
+                f"({stats.bytes_in} -> {stats.bytes_out} bytes), "
+                f"{stats.skipped_files} unchanged"
+            )
+
+        if prune:
+            suffixes = ("",) + self._suffixes()
+            keep = {key + suffix for key in outputs for suffix in suffixes}
+            for removed in prune_unlisted(self.output_dir, keep):
+                print(f"Removed stale output {removed}")
+
+        broken = _check_links(
+            self.link_graph,
+            outputs,
+            self.previous_outputs,
+            strict_links,
+            verbose_links,
+        )
+        self.previous_outputs = outputs
+        self.report.update(
+            broken=sum(len(urls) for urls in broken.values()),
+            broken_pages=len(broken),
+        )
+
+    def carry_forward(self):
+        # Outputs that were not written keep their deploy manifest entries.
+        outputs = itertools.chain(self.manifest.pages, self.manifest.files)
+        self.deploy.carry_forward(outputs, self._suffixes())
+
+    def save_deploy(self):
+        changes = self.deploy.save()
+        self.report["deploy_changes"] = any(changes.values())
+        print(
+            f"Deploy manifest: {len(changes['added'])} added, "
+            f"{len(changes['changed'])} changed, {len(changes['removed'])} removed"
+        )
+
+    def _update_search_index(self, pages):
+        def write(key, data, digest):
+            path = os.path.join(self.output_dir, *key.split("/"))
+            _write_output(path, data)
+            self.on_written(path, digest, len(data))
+
+        search_index = self.search_index
+        removed, stats = search_index.update(pages, write)
+        for key, digest, _ in search_index.files():
+            path = os.path.join(self.output_dir, *key.split("/"))
+            self.manifest.record_file(path, search_index.path, digest)
+        for key in removed:
+            self.remove_output(os.path.join(self.output_dir, *key.split("/")))
+        print(
+            f"Search index: {stats.pages} pages, {stats.terms} terms in "
+            f"{stats.shards} shards ({stats.bytes} bytes), wrote "
+            f"{stats.written_files} files in {stats.seconds:.3f}s"
+        )
+
+    def save(self):
+        self.link_graph.save()
+        if self.search_index is not None:
+            self.search_index.save()
+        if self.compressor is not None:
+            self.compressor.save()
+        self.metadata.save()
+        self.file_index.save()
+
+    def close(self):
+        if self.compressor is not None:
+            self.compressor.close()
+
+
+def generate_listings(
+    metadata,
+    sections,
+    content_dir,
+    output_dir,
+    template,
+    manifest,
+    page_size,
+    on_written=None,
+):
+    # Listing pages are built from the metadata index alone. Each is
+    # recorded in the manifest under the hash of its title and content, so
+    # it is only written again when its entries change.
+    entries = metadata.published()
+    for section in sections:
+        section = section.strip("/")
+        source = os.path.join(content_dir, *section.split("/"))
+        rewrite = template.rewrite_url
+        for key, title, node, links in listing_pages(
+            section, entries, page_size, rewrite
+        ):
+            if key in entries:
+                raise Exception(f"Listing page {key} would replace a content page")
+            dest_path = os.path.join(output_dir, *key.split("/"))
+            content = node.to_html()
+            digest = hash_bytes(f"{title}\0{content}".encode("utf-8"))
+            if manifest.page_is_current(dest_path, digest):
+                continue
+
+            print(f"Generating listing {dest_path}")
+            data = template.render_to_string(Title=title, Content=content)
+            data = data.encode("utf-8")
+            _write_output(dest_path, data)
+            manifest.record_page(dest_path, source, digest)
+            if on_written is not None:
+                on_written(dest_path, hash_bytes(data), len(data), links)
+
+
+def _check_links(link_graph, outputs, previous_outputs, strict=False, verbose=False):
+    # Links are recorded as emitted, so they are checked against the
+    # outputs as written, fingerprinted names included. Only the links that
+    # broke or were fixed since the last check are listed, unless every
+    # broken link is asked for.
+    changed = None
+    if previous_outputs is not None:
+        changed = outputs ^ previous_outputs
+
+    broken = link_graph.check(outputs, changed)
+    if strict or verbose:
+        for page in sorted(broken):
+            for url in broken[page]:
+                print(f"Broken link in {page}: {url}")
     else:
+        for page in sorted(link_graph.changes):
+            added, fixed = link_graph.changes[page]
+            for url in added:
+                print(f"Broken link in {page}: {url}")
+            for url in fixed:
+                print(f"Fixed link in {page}: {url}")
+    count = sum(len(urls) for urls in broken.values())
+    print(f"Link check: {count} broken links in {len(broken)} pages")
+    if count and strict:
+        raise Exception(f"{count} broken internal links")
+    return broken
+
+
+def watch_site(
+    root_dir, basepath="/", port=8888, poll=False, debounce=0.05, **options
+):
+    root_dir = Path(root_dir)
+    cache = _open_block_cache(root_dir, **options)
+    file_index = _load_file_index(root_dir)
+    build_site(
+        root_dir, basepath, incremental=True, file_index=file_index, **options
+    )
+
+    server = start_server(root_dir / "docs", port)
+    watcher = create_watcher(
+        [root_dir / "content", root_dir / "static", root_dir / "template.html"],
+        poll=poll,
+    )
+    print(f"Serving {root_dir / 'docs'} at http://localhost:{port}/")
+
+    manifest_path = root_dir / ".cache" / "build-manifest.json"
+    manifest = BuildManifest(manifest_path, root_dir / "docs")
+    manifest.load()
+    rebuilder = _Rebuilder(root_dir, basepath, manifest, file_index, **options)
+    rebuilder.open()
+    try:
+        # The state is written back once nothing changed for a second, not
+        # after every rebuild, and the session reopened after a full build.
+        for changed in iter_changes(watcher, debounce, idle=1.0):
+            if not changed:
+                rebuilder.save()
+                rebuilder.open()
+                continue
+            start = time.perf_counter()
+            rebuilder.rebuild(changed)
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"Rebuilt {len(changed)} changed path(s) in {elapsed:.1f} ms")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        rebuilder.save()
+        rebuilder.close()
+        watcher.close()
+        server.shutdown()
+        if cache is not None:
+            set_block_cache(None)
+            cache.close()
+
+
+def serve_daemon(
+    root_dir, basepath="/", socket_path=None, idle_timeout=None, **options
+):
+    # Keeps the interpreter, imported modules, compiled templates and the
+    # block cache warm between builds requested through client.py.
+    root_dir = Path(root_dir)
+    socket_path = socket_path or default_socket_path(root_dir)
+    cache = _open_block_cache(root_dir, **options)
+    file_index = _load_file_index(root_dir)
+    resident = _ResidentState()
+    started = time.monotonic()
+    builds = 0
+
+    def build(request):
+        nonlocal builds
+        start = time.perf_counter()
+        build_site(
+            root_dir,
+            request.get("basepath", basepath),
+            request.get("incremental", True),
+            file_index=file_index,
+            resident=resident,
+            **options,
+        )
+        builds += 1
+        return {"elapsed_ms": round((time.perf_counter() - start) * 1000, 1)}
+
+    def status(request):
+        return {
+            "pid": os.getpid(),
+            "builds": builds,
+            "uptime_s": round(time.monotonic() - started, 1),
+            "block_cache": None if cache is None else cache.stats(),
+            "indexed_files": len(file_index.entries),
+        }
+
+    def invalidate(request):
+        clear_template_cache()
+        if cache is not None:
+            cache.clear()
+        file_index.entries.clear()
+        file_index.dirty = True
+        resident.close()
+        print("Dropped cached templates, blocks, file hashes and build state")
+
+    def shutdown(request):
+        server.stop()
+        print("Shutting down")
+
+    server = BuildDaemon(
+        socket_path,
+        {
+            "build": build,
+            "status": status,
+            "invalidate": invalidate,
+            "shutdown": shutdown,
+        },
+        idle_timeout,
+    )
+    print(f"Build daemon listening on {socket_path}")
+    try:
+        server.serve()
+    finally:
+        resident.close()
+        if cache is not None:
+            set_block_cache(None)
+            cache.close()
+
+
+def _open_block_cache(root_dir, **options):
+    size = options.get("block_cache_size", 0)
+    persistent = options.get("persistent_block_cache", False)
+    if not (size or persistent):
+        return None
+    cache_path = root_dir / ".cache" / "blocks.sqlite3"
+    cache = BlockCache(size, cache_path if persistent else None)
+    set_block_cache(cache)
+    return cache
+
+
+def rebuild_changed(
+    root_dir, basepath, changed, manifest, file_index=None, **options
+):
+    # Rebuilds only what the changed source paths affect, then saves the
+    # state. Watch mode keeps a _Rebuilder instead, and saves when idle.
+    rebuilder = _Rebuilder(root_dir, basepath, manifest, file_index, **options)
+    try:
+        rebuilder.rebuild(changed)
+        rebuilder.save()
+    finally:
+        rebuilder.close()
+    return rebuilder.manifest
+
+
+class _Rebuilder:
+    # Rebuilds what changed source paths affect through the same
+    # generate_page / copy_file_tree code and build stages as a full build.
+    # Its build session stays open between rebuilds: the state is loaded
+    # once, each rebuild only checks the links of the pages it touched or
+    # that link to outputs it added or removed, and save() writes the state
+    # back, which watch mode does once the tree has gone quiet.
+
+    def __init__(self, root_dir, basepath, manifest, file_index=None, **options):
+        self.root_dir = Path(root_dir)
+        self.basepath = basepath
+        self.manifest = manifest
+        if file_index is None:
+            file_index = _load_file_index(self.root_dir)
+        self.file_index = file_index
+        self.options = options
+        self.session = None
+        self.unsaved = False
+
+    def open(self):
+        # Returns the build session, or None when it needs the search index
+        # and that could not be loaded.
+        if self.session is not None:
+            return self.session
+        root_dir = self.root_dir
+        public_dir = root_dir / "docs"
+        options = self.options
+
+        # Pages link fingerprinted assets by the names of the last build, so
+        # a static change under --fingerprint renames assets and is a full
+        # build.
+        assets = None
+        if options.get("fingerprint", False):
+            assets = AssetMap.load(root_dir / ".cache" / "asset-map.json")
+
+        search_index = None
+        if options.get("search", False):
+            search_index = SearchIndex(
+                root_dir / ".cache" / "search-index.json", public_dir, self.basepath
+            )
+            if not search_index.load():
+                return None
+
+        build = _BuildSession(
+            root_dir,
+            public_dir,
+            self.manifest,
+            self.file_index,
+            assets,
+            search_index,
+            options.get("drafts", False),
+            options.get("compress", False),
+            options.get("compress_formats"),
+            options.get("compress_threshold", 1024),
+            options.get("compress_jobs", 4),
+        )
+        build.load_previous()
+        # Indexed now rather than on the first page added or removed.
+        build.link_graph.index_targets()
+        # Entries stay in memory from here on: outputs written replace
+        # theirs and removed ones are forgotten.
+        build.carry_forward()
+        self.session = build
+        return build
+
+    def rebuild(self, changed):
+        root_dir = self.root_dir
+        public_dir = root_dir / "docs"
+        static_dir = root_dir / "static"
+        content_dir = root_dir / "content"
+        template_path = root_dir / "template.html"
+        basepath = self.basepath
+        manifest = self.manifest
+        options = self.options
+        build = self.open()
+
+        # Listing pages are built from the metadata of every page, so with
+        # any, a content change goes through an incremental build.
+        fingerprint = options.get("fingerprint", False)
+        assets = None if build is None else build.assets
+        template = load_template(template_path, basepath, minify_enabled(), assets)
+        changed = sorted(map(os.fspath, changed))
+        rescan = {os.fspath(content_dir), os.fspath(static_dir)}
+        if (
+            build is None
+            or template.hash != manifest.template_hash
+            or rescan.intersection(changed)
+            or fingerprint
+            and (assets is None or any(_is_within(p, static_dir) for p in changed))
+            or options.get("listings")
+            and any(_is_within(p, content_dir) for p in changed)
+        ):
+            # The build reads the state from disk, and leaves its own there.
+            self.save()
+            self.close()
+            build_site(
+                root_dir,
+                basepath,
+                incremental=True,
+                file_index=self.file_index,
+                **options,
+            )
+            manifest.load()
+            return
+
+        self.unsaved = True
+        asset_mode = options.get("asset_mode", "copy")
+        asset_compare = options.get("asset_compare", "stat")
+        file_index = self.file_index
+        with build.rendering():
+            for path in changed:
+                if _is_within(path, content_dir):
+                    if os.path.isdir(path):
+                        relative_path = os.path.relpath(path, content_dir)
+                        dest_dir = os.path.join(public_dir, relative_path)
+                        build.generate_pages(path, template_path, dest_dir, basepath)
+                    elif os.path.isfile(path) and path.endswith(".md"):
+                        dest_path = page_dest_path(content_dir, path, public_dir)
+                        build.generate_page(path, template_path, dest_path, basepath)
+                    elif not os.path.exists(path):
+                        relative_path = os.path.relpath(path, content_dir)
+                        if path.endswith(".md"):
+                            dest_path = page_dest_path(content_dir, path, public_dir)
+                        else:
+                            dest_path = os.path.join(public_dir, relative_path)
+                        build.metadata.remove(dest_path)
+                        build.remove_output(dest_path)
+
+                elif _is_within(path, static_dir):
+                    relative_path = os.path.relpath(path, static_dir)
+                    dst_path = os.path.join(public_dir, relative_path)
+                    if os.path.isdir(path):
+                        stats = copy_file_tree(
+                            path,
+                            dst_path,
+                            manifest,
+                            asset_mode,
+                            asset_compare,
+                            index=file_index,
+                        )
+                        for copied in stats.copied_paths:
+                            size = os.path.getsize(copied)
+                            build.on_written(copied, hash_file(copied), size)
+                    elif os.path.isfile(path):
+                        copy_asset(path, dst_path, asset_mode)
+                        signature = asset_signature(
+                            path, asset_compare, index=file_index
+                        )
+                        manifest.record_file(dst_path, path, signature)
+                        size = os.path.getsize(dst_path)
+                        build.on_written(dst_path, file_index.hash(path), size)
+                    else:
+                        build.remove_output(dst_path)
+
+        build.finish(
+            strict_links=options.get("strict_links", False),
+            verbose_links=options.get("verbose_links", False),
+        )
+
+    def save(self):
+        if not self.unsaved:
+            return
+        if self.session is not None:
+            self.session.save_deploy()
+            self.session.save()
+        self.manifest.save()
+        self.unsaved = False
+
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
+
+def _is_within(path, directory):
+    directory = os.fspath(directory)
+    return path.startswith(directory + os.sep)
+
+
+def copy_file_tree(
+    src,
+    dst,
+    manifest=None,
+    mode="copy",
+    compare="stat",
+    jobs=8,
+    prune=False,
+    index=None,
+    names=None,
+):
+    return sync_assets(src, dst, manifest, mode, compare, jobs, prune, index, names)
+
+
+def extract_title(markdown):
+    title = heading_title(markdown.split("\n", 1)[0])
+    if title is None:
         raise Exception("No header provided")
+    return title
 
 
-def generate_pages_recursive(content_path, template_path, dest_dir_path, basepath):
-    for root, dirs, files in os.walk(content_path):
-        relative_path = os.path.relpath(root, content_path)
-        current_dest_dir = os.path.join(dest_dir_path, relative_path)
+def generate_pages_recursive(
+    content_path,
+    template_path,
+    dest_dir_path,
+    basepath,
+    manifest=None,
+    jobs=1,
+    on_written=None,
+    file_index=None,
+    pipeline=0,
+    io_jobs=4,
+    link_graph=None,
+    search_index=None,
+    metadata=None,
+):
+    pages = []
+    content_path = os.fspath(content_path).rstrip(os.sep) or os.sep
+    for root, files in scan_tree(content_path):
+        # scan_tree yields paths below content_path, so the relative part is
+        # a slice rather than a relpath call per file.
+        relative_path = root[len(content_path) + 1 :]
+        current_dest_dir = os.path.join(dest_dir_path, relative_path, "")
 
         os.makedirs(current_dest_dir, exist_ok=True)
+        if manifest is not None:
+            # One listing per directory answers "does the output exist" for
+            # all of its pages without a stat each, and its key prefixes
+            # theirs. Keys are relative to the manifest's output_dir, which
+            # is above dest_dir_path when a subdirectory is rebuilt.
+            outputs = set(os.listdir(current_dest_dir))
+            key_prefix = manifest.key_prefix(current_dest_dir)
+
+        for entry in files:
+            if entry.name.endswith(".md"):
+                from_path = entry.path
+                html_filename = page_filename(entry.name)
+                final_dest_path = current_dest_dir + html_filename
 
-        for file in files:
-            if file.endswith(".md"):
-                from_path = os.path.join(root, file)
-                html_filename = (
-                    "index.html"
-                    if file.lower() == "index.md"
-                    else f"{os.path.splitext(file)[0]}.html"
-                )
-                final_dest_path = os.path.join(current_dest_dir, html_filename)
-                generate_page(from_path, template_path, final_dest_path, basepath)
+                source_hash = None
+                key = None
+                if manifest is not None:
+                    key = key_prefix + html_filename
+                    if file_index is None:
+                        source_hash = hash_file(from_path)
+                    else:
+                        source_hash = file_index.hash(from_path, entry.stat())
 
+                # Drafts are known from the metadata index, which reads at
+                # most the header of a page, and are left out entirely.
+                if metadata is not None:
+                    meta = metadata.lookup(
+                        final_dest_path, from_path, source_hash, key
+                    )
+                    if not metadata.is_published(meta):
+                        continue
 
-def generate_page(from_path, template_path, dest_path, basepath):
+                if manifest is not None and manifest.page_is_current(
+                    final_dest_path, source_hash, html_filename in outputs, key
+                ):
+                    continue
+                pages.append((from_path, final_dest_path, source_hash, key))
+
+    def on_page(dest_path, digest, size, links, indexed):
+        if link_graph is not None:
+            link_graph.record(dest_path, links)
+        if search_index is not None and indexed is not None:
+            search_index.record(dest_path, *indexed)
+        if on_written is not None:
+            on_written(dest_path, digest, size)
+
+    if jobs > 1 and len(pages) > 1:
+        generate_pages_parallel(pages, template_path, basepath, jobs, on_page)
+    elif pipeline and len(pages) > 1:
+        generate_pages_pipelined(
+            pages, template_path, basepath, pipeline, io_jobs, on_page
+        )
+    else:
+        for from_path, dest_path, _, key in pages:
+            _, *written = generate_page(
+                from_path, template_path, dest_path, basepath, key
+            )
+            on_page(dest_path, *written)
+
+    if manifest is not None:
+        for from_path, dest_path, source_hash, _ in pages:
+            manifest.record_page(dest_path, from_path, source_hash)
+
+
+def page_dest_path(content_path, from_path, dest_dir_path):
+    relative_dir, file = os.path.split(os.path.relpath(from_path, content_path))
+    return os.path.join(dest_dir_path, relative_dir, page_filename(file))
+
+
+def page_filename(file):
+    if file.lower() == "index.md":
+        return "index.html"
+    if file.endswith(".md"):
+        # Every page found by a scan; splitext is the slow part of the loop.
+        return file[:-3] + ".html"
+    return f"{os.path.splitext(file)[0]}.html"
+
+
+def generate_pages_parallel(pages, template_path, basepath, jobs, on_written=None):
+    # Hand each worker a batch of pages so that tiny pages are not dominated
+    # by pickling overhead. map() yields results in submission order, so the
+    # log and the first raised error match a serial build.
+    chunksize = max(1, len(pages) // (jobs * 4))
+    tasks = [
+        (from_path, template_path, dest_path, basepath, key)
+        for from_path, dest_path, _, key in pages
+    ]
+    cache = current_block_cache()
+    cache_args = None
+    if cache is not None:
+        cache_args = (cache.max_entries, cache.path)
+
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=_init_worker,
+        initargs=(
+            current_inline_parser(),
+            minify_enabled(),
+            cache_args,
+            current_asset_map(),
+            indexing_enabled(),
+        ),
+    ) as executor:
+        results = executor.map(_write_page_task, tasks, chunksize=chunksize)
+        for (from_path, _, dest_path, _, _), (written, cache_counts) in zip(
+            tasks, results
+        ):
+            print(
+                f"Generating page from {from_path} to {dest_path} using {template_path}"
+            )
+            saved, *written = written
+            _report_minified(dest_path, saved)
+            if on_written is not None:
+                on_written(dest_path, *written)
+            if cache is not None:
+                cache.hits += cache_counts[0]
+                cache.disk_hits += cache_counts[1]
+                cache.misses += cache_counts[2]
+
+
+def generate_pages_pipelined(
+    pages, template_path, basepath, in_flight, io_jobs, on_written=None
+):
+    # Reads ahead and writes behind on io_jobs threads while pages render
+    # one at a time, with at most in_flight pages held in memory.
+    template = load_template(
+        template_path, basepath, minify_enabled(), current_asset_map()
+    )
+
+    def read(page):
+        with open(page[0], encoding="utf-8") as f:
+            return f.read()
+
+    def render(page, text):
+        chunks = []
+        rendered = render_page(io.StringIO(text), template, chunks.append, page[3])
+        return rendered, "".join(chunks).encode("utf-8")
+
+    def write(page, rendered):
+        (saved, links, indexed), data = rendered
+        _write_output(page[1], data)
+        return saved, hashlib.sha256(data).hexdigest(), len(data), links, indexed
+
+    def done(page, written):
+        saved, *written = written
+        print(f"Generating page from {page[0]} to {page[1]} using {template_path}")
+        _report_minified(page[1], saved)
+        if on_written is not None:
+            on_written(page[1], *written)
+
+    run_pipeline(pages, read, render, write, done, in_flight, io_jobs)
+
+
+def _init_worker(inline_parser, minify, cache_args, assets, indexing):
+    set_inline_parser(inline_parser)
+    set_minify(minify)
+    set_asset_map(assets)
+    set_indexing(indexing)
+    if cache_args is not None:
+        # Workers only read the persistent tier; SQLite is not shared for
+        # concurrent writes, so what they render stays in their memory tier.
+        max_entries, path = cache_args
+        set_block_cache(BlockCache(max_entries, path, read_only=True))
+
+
+def _write_page_task(task):
+    cache = current_block_cache()
+    if cache is None:
+        return write_page(*task), None
+
+    before = (cache.hits, cache.disk_hits, cache.misses)
+    written = write_page(*task)
+    after = (cache.hits, cache.disk_hits, cache.misses)
+    return written, tuple(b - a for a, b in zip(before, after))
+
+
+def generate_page(from_path, template_path, dest_path, basepath, key=None):
     print(f"Generating page from {from_path} to {dest_path} using {template_path}")
+    written = write_page(from_path, template_path, dest_path, basepath, key)
+    _report_minified(dest_path, written[0])
+    return written
 
-    with open(from_path, encoding="utf-8") as f:
-        markdown = f.read()
 
-    with open(template_path, encoding="utf-8") as f:
-        template = f.read()
+def _report_minified(dest_path, saved):
+    if minify_enabled():
+        print(f"Minified {dest_path}: saved {saved} bytes")
 
-    html_string = markdown_to_html_node(markdown).to_html()
-    title = extract_title(markdown)
 
-    html_string = template.replace("{{ Content }}", html_string)
-    html_string = html_string.replace("{{ Title }}", title)
+def write_page(from_path, template_path, dest_path, basepath, key=None):
+    # Returns the bytes saved by minification, the sha256 and size of the
+    # page, which are taken from the bytes as they are written, the page's
+    # link targets and, while indexing, its title and search terms. key is
+    # the page's path below the site root, which relative URLs resolve from.
+    template = load_template(
+        template_path, basepath, minify_enabled(), current_asset_map()
+    )
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    tmp_path = f"{dest_path}.tmp"
 
-    html_string = html_string.replace('href="/', f'href="{basepath}')
-    html_string = html_string.replace('src="/', f'src="{basepath}')
+    digest = hashlib.sha256()
+    size = 0
+    with open(from_path, encoding="utf-8") as src:
+        try:
+            with open(tmp_path, "wb") as f:
 
+                def write(text):
+                    nonlocal size
+                    data = text.encode("utf-8")
+                    digest.update(data)
+                    size += len(data)
+                    f.write(data)
+
+                # The markdown is read and the page written block by block;
+                # neither is ever held in memory as one string.
+                saved, links, indexed = render_page(src, template, write, key)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    replace_if_changed(tmp_path, dest_path)
+    return saved, digest.hexdigest(), size, links, indexed
+
+
+def _write_output(dest_path, data):
     os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    tmp_path = f"{dest_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    replace_if_changed(tmp_path, dest_path)
+
+
+def render_page(src, template, write, key=None):
+    # Renders the markdown read from src into the template through write(),
+    # returning the bytes saved by minification, the link and image targets
+    # found in the content and, while indexing, the page's title and terms
+    # as taken from the parsed text. Front matter is skipped; its title is
+    # used over the heading.
+    fields, first_line = read_front_matter(src.readline)
+    title = page_meta(fields, first_line)["title"] or extract_title(first_line)
+    body = itertools.chain((first_line,), src)
+
+    # Link and image URLs are rewritten on their nodes as the content is
+    # parsed, so the rendered HTML is written out as is.
+    links = []
+    texts = [] if indexing_enabled() else None
+    rewrite = template.rewrite_url
+    if rewrite is not None and key is not None:
+        rewrite = rewrite.for_page(key)
+    context = RenderContext(rewrite, links, texts)
+    saved = template.saved
+
+    def write_content(write):
+        nonlocal saved
+        saved += markdown_to_html_stream(body, write, context)
 
-    with open(dest_path, "w", encoding="utf-8") as f:
-        f.write(html_string)
+    template.render(write, Title=title, Content=write_content)
+    if texts is None:
+        return saved, links, None
+    return saved, links, (title, page_terms(title, texts))
 
 
 if __name__ == "__main__":
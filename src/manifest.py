@@ -0,0 +1,210 @@
+import hashlib
+import json
+import os
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_state(path, version):
+    # The data of a versioned JSON state file, or None when it is missing,
+    # unreadable or was written by another version.
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != version:
+        return None
+    return data
+
+
+def write_state(path, data):
+    # Written beside the file and renamed over it, so an interrupted build
+    # never leaves a truncated state file behind.
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        # dumps() uses the C encoder, which json.dump() never does.
+        f.write(json.dumps(data, sort_keys=True, separators=(",", ":")))
+    os.replace(tmp_path, path)
+
+
+class OutputState:
+    # State kept in a JSON file across builds about the outputs below
+    # output_dir, keyed by their "/"-separated path. Subclasses convert it
+    # with _load_state() and _state(); it is only written when dirty.
+
+    VERSION = 1
+
+    def __init__(self, path, output_dir):
+        self.path = path
+        self.output_dir = output_dir
+        self._prefix = os.path.join(os.fspath(output_dir), "")
+        self.dirty = True
+
+    def load(self):
+        data = read_state(self.path, self.VERSION)
+        if data is None:
+            return False
+        self._load_state(data)
+        self.dirty = False
+        return True
+
+    def save(self):
+        # A no-op build changes nothing, and rewriting state covering every
+        # output would then be most of its cost.
+        if not self.dirty and os.path.exists(self.path):
+            return
+        write_state(self.path, {"version": self.VERSION, **self._state()})
+        self.dirty = False
+
+    def _load_state(self, data):
+        raise NotImplementedError
+
+    def _state(self):
+        raise NotImplementedError
+
+    def output_key(self, dest_path):
+        # Plain prefix slicing for the usual already-normalised paths, which
+        # is much cheaper than relpath's absolute path resolution.
+        dest_path = os.fspath(dest_path)
+        if dest_path.startswith(self._prefix):
+            key = dest_path[len(self._prefix) :]
+            if not (key.startswith(".") or f"{os.sep}." in key):
+                return key.replace(os.sep, "/")
+        return os.path.relpath(dest_path, self.output_dir).replace(os.sep, "/")
+
+    def key_prefix(self, dest_dir):
+        # What the keys of the outputs directly inside dest_dir start with.
+        key = self.output_key(os.path.join(dest_dir, "")).rstrip("/")
+        return "" if key in ("", ".") else key + "/"
+
+
+class BuildManifest(OutputState):
+    def __init__(self, path, output_dir):
+        super().__init__(path, output_dir)
+        self.template_hash = None
+        self.basepath = None
+        self.pages = {}
+        self.files = {}
+        self.seen = set()
+
+    def _load_state(self, data):
+        self.template_hash = data.get("template")
+        self.basepath = data.get("basepath")
+        self.pages = data.get("pages", {})
+        self.files = data.get("files", {})
+
+    def _state(self):
+        return {
+            "template": self.template_hash,
+            "basepath": self.basepath,
+            "pages": self.pages,
+            "files": self.files,
+        }
+
+    def begin(self, template_hash, basepath):
+        # Every page embeds the template and basepath, so a change to either
+        # invalidates all pages but leaves the static file entries intact.
+        if template_hash != self.template_hash or basepath != self.basepath:
+            self.invalidate_pages()
+        self.template_hash = template_hash
+        self.basepath = basepath
+        self.seen = set()
+
+    def invalidate_pages(self):
+        # Renders every page again, keeping the static file entries. The
+        # page keys stay, so remove_stale() still removes the outputs of
+        # pages that went away in the same build.
+        for entry in self.pages.values():
+            entry["hash"] = None
+        self.dirty = True
+
+    def _is_current(self, entries, dest_path, source_hash, exists=None, key=None):
+        key = key or self.output_key(dest_path)
+        self.seen.add(key)
+        entry = entries.get(key)
+        if entry is None or entry["hash"] != source_hash:
+            return False
+        return os.path.exists(dest_path) if exists is None else exists
+
+    def page_is_current(self, dest_path, source_hash, exists=None, key=None):
+        return self._is_current(self.pages, dest_path, source_hash, exists, key)
+
+    def file_is_current(self, dest_path, source_hash):
+        return self._is_current(self.files, dest_path, source_hash)
+
+    def record_page(self, dest_path, source_path, source_hash):
+        key = self.output_key(dest_path)
+        self.seen.add(key)
+        entry = {"source": str(source_path), "hash": source_hash}
+        if self.pages.get(key) != entry:
+            self.pages[key] = entry
+            self.dirty = True
+
+    def record_file(self, dest_path, source_path, source_hash):
+        key = self.output_key(dest_path)
+        self.seen.add(key)
+        entry = {"source": str(source_path), "hash": source_hash}
+        if self.files.get(key) != entry:
+            self.files[key] = entry
+            self.dirty = True
+
+    def remove_output(self, dest_path):
+        # Drops the output at dest_path, or every tracked output below it when
+        # a whole source directory went away.
+        key = self.output_key(dest_path)
+        removed = []
+        for entries in (self.pages, self.files):
+            for entry_key in keys_below(entries, key):
+                del entries[entry_key]
+                self.dirty = True
+                removed.append(entry_key)
+                path = os.path.join(self.output_dir, *entry_key.split("/"))
+                if os.path.isfile(path):
+                    os.remove(path)
+                    prune_empty_dirs(os.path.dirname(path), self.output_dir)
+        return removed
+
+    def remove_stale(self):
+        removed = []
+        for entries in (self.pages, self.files):
+            for key in sorted(set(entries) - self.seen):
+                del entries[key]
+                self.dirty = True
+                dest_path = os.path.join(self.output_dir, *key.split("/"))
+                if os.path.isfile(dest_path):
+                    os.remove(dest_path)
+                    removed.append(key)
+                    prune_empty_dirs(os.path.dirname(dest_path), self.output_dir)
+        return removed
+
+
+def keys_below(entries, key):
+    # The keys in entries that are key itself or lie below it, sorted. A
+    # single output, the usual case, is found without a scan.
+    if key in entries:
+        return [key]
+    prefix = key + "/"
+    return sorted(entry_key for entry_key in entries if entry_key.startswith(prefix))
+
+
+def prune_empty_dirs(path, stop_dir):
+    stop_dir = os.path.abspath(stop_dir)
+    path = os.path.abspath(path)
+    while path != stop_dir and path.startswith(stop_dir):
+        try:
+            os.rmdir(path)
+        except OSError:
+            break
+        path = os.path.dirname(path)
@@ -0,0 +1,141 @@
+import os
+import re
+
+from manifest import OutputState, keys_below
+
+FENCE = "---"
+# Header lines are read through a buffer of this size, so a scan reads one
+# block of a file with short front matter rather than the whole body.
+HEADER_BYTES = 4096
+
+_HEADING_RE = re.compile(r"^#[^#]")
+_TRUE = {"true", "yes", "on"}
+_FALSE = {"false", "no", "off"}
+
+
+def heading_title(line):
+    # The title of a "# " heading line, or None for any other line.
+    if _HEADING_RE.match(line.strip()):
+        return line.strip(" #\t\n")
+    return None
+
+
+def _parse_value(value):
+    value = value.strip()
+    if value[:1] == "[" and value[-1:] == "]":
+        return [_unquote(item) for item in value[1:-1].split(",") if item.strip()]
+    if value.lower() in _TRUE:
+        return True
+    if value.lower() in _FALSE:
+        return False
+    return _unquote(value)
+
+
+def _unquote(value):
+    value = value.strip()
+    if len(value) > 1 and value[0] == value[-1] and value[0] in "\"'":
+        return value[1:-1]
+    return value
+
+
+def read_front_matter(readline):
+    # Reads the "key: value" lines between two "---" lines at the top of a
+    # page through readline. Returns the fields, keyed in lowercase, and
+    # the first line of the body, which is the first line of a page that
+    # has no front matter.
+    line = readline()
+    if line.rstrip() != FENCE:
+        return {}, line
+
+    fields = {}
+    while True:
+        line = readline()
+        if not line:
+            raise ValueError("Invalid front matter: missing closing ---")
+        if line.rstrip() == FENCE:
+            return fields, readline()
+        key, sep, value = line.partition(":")
+        if sep and key.strip():
+            fields[key.strip().lower()] = _parse_value(value)
+
+
+def page_meta(fields, first_line):
+    # Normalises the front matter of a page: its title falls back to the
+    # "# " heading on the first line of the body, tags are always a list.
+    tags = fields.get("tags", [])
+    if isinstance(tags, str):
+        tags = [tag.strip() for tag in tags.split(",") if tag.strip()]
+    date = fields.get("date")
+    return {
+        "title": fields.get("title") or heading_title(first_line),
+        "date": None if date is None else str(date),
+        "tags": tags,
+        "draft": fields.get("draft") is True,
+    }
+
+
+def read_page_meta(path):
+    with open(path, "rb", buffering=HEADER_BYTES) as f:
+
+        def readline():
+            return f.readline().decode("utf-8").replace("\r\n", "\n")
+
+        return page_meta(*read_front_matter(readline))
+
+
+class MetadataIndex(OutputState):
+    # Caches the front matter of every page by output, with the hash of the
+    # source it was read from. Sources whose hash is unchanged, which the
+    # file index answers from a stat, are never opened; others only have
+    # their header read. Drafts are left out of the build unless asked for.
+
+    def __init__(self, path, output_dir, drafts=False):
+        super().__init__(path, output_dir)
+        self.drafts = drafts
+        self.pages = {}
+        self.seen = set()
+
+    def _load_state(self, data):
+        self.pages = data.get("pages", {})
+
+    def _state(self):
+        return {"pages": self.pages}
+
+    def lookup(self, dest_path, source_path, source_hash=None, key=None):
+        # Returns the metadata of the page written to dest_path. Without a
+        # source hash the header is always read.
+        key = key or self.output_key(dest_path)
+        self.seen.add(key)
+        entry = self.pages.get(key)
+        if entry is not None and source_hash is not None:
+            if entry["hash"] == source_hash:
+                return entry
+
+        entry = read_page_meta(source_path)
+        entry["hash"] = source_hash
+        if self.pages.get(key) != entry:
+            self.pages[key] = entry
+            self.dirty = True
+        return entry
+
+    def is_published(self, entry):
+        return self.drafts or not entry["draft"]
+
+    def remove(self, dest_path):
+        # Drops the page at dest_path, or every page below it.
+        key = self.output_key(dest_path)
+        for entry_key in keys_below(self.pages, key):
+            del self.pages[entry_key]
+            self.dirty = True
+
+    def prune(self):
+        # Drops the pages that were not looked up since the last prune.
+        for key in set(self.pages) - self.seen:
+            del self.pages[key]
+            self.dirty = True
+        self.seen = set()
+
+    def published(self):
+        return {
+            key: entry for key, entry in self.pages.items() if self.is_published(entry)
+        }
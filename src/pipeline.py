@@ -0,0 +1,67 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+def run_pipeline(items, read, render, write, on_done=None, in_flight=16, io_jobs=4):
+    # Overlaps read(item) and write(item, rendered), which run on a thread
+    # pool, with render(item, data), which runs on the event loop thread:
+    # while one item renders, later ones are being read and earlier ones
+    # written. At most in_flight items are between the start of their read
+    # and the end of their write, which bounds memory. Items are rendered
+    # and reported to on_done(item, result) in order.
+    return asyncio.run(
+        _pipeline(items, read, render, write, on_done, in_flight, io_jobs)
+    )
+
+
+async def _pipeline(items, read, render, write, on_done, in_flight, io_jobs):
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(in_flight)
+    to_render = asyncio.Queue(in_flight)
+    to_write = asyncio.Queue(in_flight)
+    pending = set()
+
+    def submit(fn, *args):
+        future = loop.run_in_executor(pool, fn, *args)
+        pending.add(future)
+        future.add_done_callback(pending.discard)
+        return future
+
+    async def read_stage():
+        for item in items:
+            await slots.acquire()
+            await to_render.put((item, submit(read, item)))
+        await to_render.put(None)
+
+    async def render_stage():
+        # Rendering stays on this thread: it is CPU-bound, so other threads
+        # would only contend for the GIL, and module state such as the
+        # block cache's SQLite connection belongs to the building thread.
+        while (job := await to_render.get()) is not None:
+            item, reading = job
+            rendered = render(item, await reading)
+            await to_write.put((item, submit(write, item, rendered)))
+        await to_write.put(None)
+
+    async def write_stage():
+        while (job := await to_write.get()) is not None:
+            item, writing = job
+            result = await writing
+            slots.release()
+            if on_done is not None:
+                on_done(item, result)
+
+    with ThreadPoolExecutor(io_jobs) as pool:
+        stages = [
+            asyncio.ensure_future(stage())
+            for stage in (read_stage, render_stage, write_stage)
+        ]
+        try:
+            await asyncio.gather(*stages)
+        except BaseException:
+            # The first failure ends the build: nothing further is started,
+            # and I/O already running finishes before the error propagates.
+            for future in stages + list(pending):
+                future.cancel()
+            await asyncio.gather(*stages, *pending, return_exceptions=True)
+            raise
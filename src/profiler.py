@@ -0,0 +1,288 @@
+import builtins
+import functools
+import inspect
+import json
+import os
+import shutil
+import time
+from collections import defaultdict
+
+import assets
+import block_utils
+import file_index
+import htmlnode
+import template
+
+_MISSING = object()
+
+
+class Profiler:
+    # Instrumentation is installed by swapping module attributes for timed
+    # wrappers and undone by restore(), so a build without --profile runs the
+    # original functions untouched.
+
+    def __init__(self):
+        self.clock = time.perf_counter
+        self.origin = self.clock()
+        self.stack = []
+        self.self_time = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.events = []
+        self.pages = []
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self._patches = []
+
+    def enter(self, name):
+        self.stack.append([name, self.clock(), 0.0])
+
+    def exit(self, args=None, trace=False):
+        name, start, child_time = self.stack.pop()
+        elapsed = self.clock() - start
+        self.self_time[name] += elapsed - child_time
+        self.calls[name] += 1
+        if self.stack:
+            self.stack[-1][2] += elapsed
+        if trace:
+            event = {
+                "name": name,
+                "ph": "X",
+                "ts": (start - self.origin) * 1e6,
+                "dur": elapsed * 1e6,
+                "pid": os.getpid(),
+                "tid": 0,
+            }
+            if args:
+                event["args"] = args
+            self.events.append(event)
+        return elapsed
+
+    def stage(self, name, trace=False):
+        return _Stage(self, name, trace)
+
+    def wrap(self, func, name, trace=False, reentrant=True):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not reentrant and self.stack and self.stack[-1][0] == name:
+                return func(*args, **kwargs)
+            self.enter(name)
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                self.exit(trace=trace)
+            # Generators do their work lazily, so time each step instead.
+            if inspect.isgenerator(result):
+                return self._timed_iter(result, name, trace)
+            return result
+
+        return wrapper
+
+    def _timed_iter(self, iterator, name, trace):
+        while True:
+            self.enter(name)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.exit(trace=trace)
+            yield item
+
+    def patch(self, owner, attr, replacement):
+        self._patches.append((owner, attr, owner.__dict__.get(attr, _MISSING)))
+        setattr(owner, attr, replacement)
+
+    def patch_function(self, owner, attr, name, trace=False, reentrant=True):
+        func = getattr(owner, attr)
+        self.patch(owner, attr, self.wrap(func, name, trace, reentrant))
+
+    def restore(self):
+        while self._patches:
+            owner, attr, original = self._patches.pop()
+            if original is _MISSING:
+                delattr(owner, attr)
+            else:
+                setattr(owner, attr, original)
+
+    def instrument(self, main_module):
+        self.patch_function(os, "walk", "walk")
+        self.patch_function(main_module, "scan_tree", "walk")
+        self.patch_function(os, "makedirs", "mkdir", reentrant=False)
+        self.patch_function(shutil, "rmtree", "clean", reentrant=False)
+        self.patch(assets, "copy_asset", self._wrap_copy(assets.copy_asset))
+        self.patch_function(main_module, "hash_file", "hash")
+        self.patch_function(file_index, "hash_file", "hash")
+        self.patch(main_module, "open", self.open)
+        write_page = self._wrap_page(main_module.write_page)
+        self.patch(main_module, "write_page", write_page)
+        self.patch_function(block_utils, "iter_markdown_blocks", "blocks")
+        self.patch_function(block_utils, "classify_block", "classify")
+        self.patch_function(block_utils, "text_to_children", "inline")
+        self.patch_function(
+            htmlnode.ParentNode, "serialize", "to_html", reentrant=False
+        )
+        self.patch_function(template.Template, "render", "template")
+
+    def open(self, path, mode="r", *args, **kwargs):
+        self.enter("open")
+        try:
+            f = builtins.open(path, mode, *args, **kwargs)
+        finally:
+            self.exit()
+        writing = any(flag in mode for flag in "wax+")
+        if not writing:
+            self.bytes_read += os.fstat(f.fileno()).st_size
+        return _ProfiledFile(self, f, writing)
+
+    def _wrap_copy(self, copy):
+        @functools.wraps(copy)
+        def wrapper(src, dst, *args, **kwargs):
+            self.enter("copy")
+            try:
+                return copy(src, dst, *args, **kwargs)
+            finally:
+                size = os.path.getsize(src)
+                self.bytes_read += size
+                self.bytes_written += size
+                self.exit(args={"src": os.fspath(src), "bytes": size}, trace=True)
+
+        return wrapper
+
+    def _wrap_page(self, write_page):
+        @functools.wraps(write_page)
+        def wrapper(from_path, template_path, dest_path, basepath, key=None):
+            bytes_read, bytes_written = self.bytes_read, self.bytes_written
+            self.enter("page")
+            try:
+                return write_page(from_path, template_path, dest_path, basepath, key)
+            finally:
+                page = {
+                    "source": os.fspath(from_path),
+                    "bytes_read": self.bytes_read - bytes_read,
+                    "bytes_written": self.bytes_written - bytes_written,
+                }
+                page["seconds"] = self.exit(args=page, trace=True)
+                self.pages.append(page)
+
+        return wrapper
+
+    def summary(self, top=10):
+        total = sum(self.self_time.values()) or 1.0
+        lines = [f"{'stage':<12}{'calls':>10}{'self (s)':>12}{'share':>9}"]
+        for name, seconds in sorted(self.self_time.items(), key=lambda i: -i[1]):
+            share = seconds / total
+            lines.append(
+                f"{name:<12}{self.calls[name]:>10}{seconds:>12.4f}{share:>9.1%}"
+            )
+
+        lines.append("")
+        lines.append(f"pages: {len(self.pages)}")
+        lines.append(f"bytes read: {self.bytes_read}")
+        lines.append(f"bytes written: {self.bytes_written}")
+
+        if self.pages:
+            lines.append("")
+            lines.append(f"slowest {min(top, len(self.pages))} pages:")
+            for page in self.slowest_pages(top):
+                seconds, size = page["seconds"], page["bytes_read"]
+                lines.append(f"{seconds:>10.4f}s  {size:>10}B  {page['source']}")
+        return "\n".join(lines)
+
+    def slowest_pages(self, top=10):
+        return sorted(self.pages, key=lambda page: -page["seconds"])[:top]
+
+    def trace(self):
+        stages = {
+            name: {"calls": self.calls[name], "self_seconds": seconds}
+            for name, seconds in self.self_time.items()
+        }
+        return {
+            "traceEvents": self.events,
+            "displayTimeUnit": "ms",
+            "otherData": {
+                "stages": stages,
+                "bytes_read": self.bytes_read,
+                "bytes_written": self.bytes_written,
+            },
+        }
+
+    def write_trace(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with builtins.open(path, "w", encoding="utf-8") as f:
+            json.dump(self.trace(), f)
+
+
+class _Stage:
+    def __init__(self, profiler, name, trace):
+        self.profiler = profiler
+        self.name = name
+        self.trace = trace
+
+    def __enter__(self):
+        self.profiler.enter(self.name)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.exit(trace=self.trace)
+
+
+class _ProfiledFile:
+    def __init__(self, profiler, f, writing):
+        self._profiler = profiler
+        self._file = f
+        self._writing = writing
+
+    def __getattr__(self, attr):
+        return getattr(self._file, attr)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self):
+        profiler = self._profiler
+        while True:
+            profiler.enter("read")
+            try:
+                line = self._file.readline()
+            finally:
+                profiler.exit()
+            if not line:
+                return
+            yield line
+
+    def readline(self, *args):
+        self._profiler.enter("read")
+        try:
+            return self._file.readline(*args)
+        finally:
+            self._profiler.exit()
+
+    def read(self, *args):
+        self._profiler.enter("read")
+        try:
+            return self._file.read(*args)
+        finally:
+            self._profiler.exit()
+
+    def write(self, data):
+        self._profiler.enter("write")
+        try:
+            return self._file.write(data)
+        finally:
+            self._profiler.exit()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._profiler.enter("write" if self._writing else "read")
+        try:
+            if self._writing:
+                self._file.flush()
+                size = os.fstat(self._file.fileno()).st_size
+                self._profiler.bytes_written += size
+            self._file.close()
+        finally:
+            self._profiler.exit()
@@ -0,0 +1,203 @@
+import heapq
+import json
+import os
+import re
+import time
+from collections import Counter
+
+from links import page_url
+from manifest import OutputState, hash_bytes
+
+# Words of 2 to 32 characters; longer ones are not matched in part.
+_TERM_RE = re.compile(r"\b\w{2,32}\b")
+TITLE_WEIGHT = 10
+PREFIX_LENGTH = 2
+
+_indexing = False
+
+
+def set_indexing(enabled):
+    global _indexing
+    _indexing = bool(enabled)
+
+
+def indexing_enabled():
+    return _indexing
+
+
+def split_terms(text):
+    return _TERM_RE.findall(text.lower())
+
+
+def page_terms(title, texts):
+    # Weighs each term of a page by its number of occurrences, with the
+    # title's terms counting TITLE_WEIGHT times as much.
+    terms = Counter(split_terms(" ".join(texts)))
+    for term in split_terms(title):
+        terms[term] += TITLE_WEIGHT
+    return dict(terms)
+
+
+def shard_name(term):
+    # Terms are sharded by their first PREFIX_LENGTH characters, so a client
+    # fetches one small file per query term. Prefixes that are not plain
+    # ASCII letters and digits are named by their UTF-8 bytes in hex.
+    prefix = term[:PREFIX_LENGTH]
+    if prefix.isascii() and prefix.isalnum():
+        return prefix
+    return "x" + prefix.encode("utf-8").hex()
+
+
+class IndexStats:
+    def __init__(self):
+        self.pages = 0
+        self.terms = 0
+        self.shards = 0
+        self.bytes = 0
+        self.written_files = 0
+        self.seconds = 0.0
+
+
+class SearchIndex(OutputState):
+    # Maintains an inverted index of the site under search/ in the output:
+    # index.json lists every page as [url, title], by document id, and the
+    # shard files, and each <shard>.json maps its terms to a flat list of
+    # document ids and weights, heaviest first. The terms of every page are
+    # remembered, grouped by shard, so a build only rewrites the shards that
+    # hold a term of a page it rendered or removed.
+
+    DIRNAME = "search"
+
+    def __init__(self, path, output_dir, basepath="/"):
+        super().__init__(path, output_dir)
+        self.basepath = basepath
+        self.pages = {}
+        self.ids = {}
+        self.free_ids = []
+        self.outputs = {}
+        self.affected = set()
+        self.changed = True
+
+    def _load_state(self, data):
+        self.pages = data.get("pages", {})
+        self.ids = data.get("ids", {})
+        self.outputs = data.get("outputs", {})
+        used = set(self.ids.values())
+        self.free_ids = [i for i in range(max(used, default=-1) + 1) if i not in used]
+        self.changed = data.get("basepath") != self.basepath
+
+    def _state(self):
+        return {
+            "basepath": self.basepath,
+            "pages": self.pages,
+            "ids": self.ids,
+            "outputs": self.outputs,
+        }
+
+    def record(self, dest_path, title, terms):
+        key = self.output_key(dest_path)
+        shards = {}
+        for term, weight in terms.items():
+            shards.setdefault(shard_name(term), {})[term] = weight
+        entry = {"title": title, "shards": shards}
+        previous = self.pages.get(key)
+        if previous == entry:
+            return
+        if previous is None:
+            self.ids[key] = self._free_id()
+        else:
+            self.affected.update(previous["shards"])
+        self.affected.update(shards)
+        self.pages[key] = entry
+        self.changed = True
+        self.dirty = True
+
+    def _free_id(self):
+        # Ids never change while a page exists, since every shard it appears
+        # in refers to it by id; those of removed pages are handed out again.
+        if self.free_ids:
+            return heapq.heappop(self.free_ids)
+        return len(self.ids)
+
+    def update(self, pages, write):
+        # pages is the set of every page key in the output. Passes each file
+        # whose content changed to write(key, data, sha256), and returns the
+        # keys of the files no longer part of the index along with its stats.
+        started = time.perf_counter()
+        for key in [key for key in self.pages if key not in pages]:
+            self.affected.update(self.pages.pop(key)["shards"])
+            heapq.heappush(self.free_ids, self.ids.pop(key))
+            self.changed = True
+            self.dirty = True
+
+        postings = {name: {} for name in self.affected}
+        for key, page in self.pages.items():
+            doc = self.ids[key]
+            for name, terms in page["shards"].items():
+                shard = postings.get(name)
+                if shard is not None:
+                    for term, weight in terms.items():
+                        shard.setdefault(term, []).append((-weight, doc))
+
+        stats = IndexStats()
+        removed = []
+        for name in sorted(self.affected):
+            file_key = f"{name}.json"
+            if not postings[name]:
+                if self.outputs.pop(file_key, None) is not None:
+                    removed.append(f"{self.DIRNAME}/{file_key}")
+                    self.dirty = True
+                continue
+            # Each term lists its documents as id, weight pairs, flattened.
+            shard = {
+                term: [n for weight, doc in sorted(docs) for n in (doc, -weight)]
+                for term, docs in sorted(postings[name].items())
+            }
+            stats.written_files += self._write(file_key, shard, len(shard), write)
+        self.affected = set()
+
+        if self.changed:
+            docs = [None] * (max(self.ids.values(), default=-1) + 1)
+            for key, doc in self.ids.items():
+                docs[doc] = [self._url(key), self.pages[key]["title"]]
+            index = {
+                "version": self.VERSION,
+                "prefix": PREFIX_LENGTH,
+                "docs": docs,
+                "shards": sorted(
+                    key[:-5] for key in self.outputs if key != "index.json"
+                ),
+            }
+            stats.written_files += self._write("index.json", index, 0, write)
+            self.changed = False
+
+        stats.pages = len(self.pages)
+        stats.shards = len(self.outputs) - ("index.json" in self.outputs)
+        for _, size, terms in self.outputs.values():
+            stats.bytes += size
+            stats.terms += terms
+        stats.seconds = time.perf_counter() - started
+        return removed, stats
+
+    def _write(self, file_key, value, terms, write):
+        data = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        data = data.encode("utf-8")
+        entry = [hash_bytes(data), len(data), terms]
+        key = f"{self.DIRNAME}/{file_key}"
+        path = os.path.join(self.output_dir, *key.split("/"))
+        if self.outputs.get(file_key) == entry and os.path.exists(path):
+            return 0
+        self.outputs[file_key] = entry
+        self.dirty = True
+        write(key, data, entry[0])
+        return 1
+
+    def files(self):
+        # Every output of the index, as (key, sha256, size).
+        return [
+            (f"{self.DIRNAME}/{key}", digest, size)
+            for key, (digest, size, _) in sorted(self.outputs.items())
+        ]
+
+    def _url(self, key):
+        return self.basepath + page_url(key)[1:]
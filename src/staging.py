@@ -0,0 +1,110 @@
+import ctypes
+import errno
+import os
+import shutil
+
+from manifest import prune_empty_dirs
+
+# From linux/fs.h
+RENAME_EXCHANGE = 1 << 1
+AT_FDCWD = -100
+
+_LINK_FALLBACK_ERRNOS = {errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP}
+
+
+def _load_renameat2():
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        renameat2 = libc.renameat2
+    except (OSError, AttributeError):
+        return None
+    renameat2.argtypes = [
+        ctypes.c_int,
+        ctypes.c_char_p,
+        ctypes.c_int,
+        ctypes.c_char_p,
+        ctypes.c_uint,
+    ]
+    renameat2.restype = ctypes.c_int
+    return renameat2
+
+
+_renameat2 = _load_renameat2()
+
+
+def exchange_dirs(a, b):
+    # Swaps two directories in one step, so readers see either the old tree
+    # or the new one. Without renameat2 support it falls back to two renames,
+    # leaving a moment in which b does not exist.
+    a, b = os.fsencode(a), os.fsencode(b)
+    if _renameat2 is not None:
+        if _renameat2(AT_FDCWD, a, AT_FDCWD, b, RENAME_EXCHANGE) == 0:
+            return
+        err = ctypes.get_errno()
+        if err not in (errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+            raise OSError(err, os.strerror(err), os.fsdecode(a))
+
+    aside = b + b".old"
+    os.rename(b, aside)
+    os.rename(a, b)
+    os.rename(aside, a)
+
+
+def link_tree(src, dst):
+    # Seeds dst with hardlinks to every file in src. Outputs are always
+    # written to a temporary file and renamed into place, so a new version
+    # replaces the link in dst and never writes through to src.
+    for root, dirs, files in os.walk(src):
+        target = os.path.join(dst, os.path.relpath(root, src))
+        os.makedirs(target, exist_ok=True)
+        for file in files:
+            src_path = os.path.join(root, file)
+            dst_path = os.path.join(target, file)
+            try:
+                os.link(src_path, dst_path)
+            except OSError as e:
+                if e.errno not in _LINK_FALLBACK_ERRNOS:
+                    raise
+                shutil.copy2(src_path, dst_path)
+
+
+def replace_if_changed(tmp_path, dest_path):
+    # Moves tmp_path over dest_path unless dest_path already holds the same
+    # bytes, in which case the existing file keeps its inode and mtime.
+    if _same_content(tmp_path, dest_path):
+        os.remove(tmp_path)
+        return False
+    os.replace(tmp_path, dest_path)
+    return True
+
+
+def _same_content(a, b, chunk_size=1 << 16):
+    try:
+        if os.path.getsize(a) != os.path.getsize(b):
+            return False
+        with open(a, "rb") as fa, open(b, "rb") as fb:
+            while True:
+                chunk = fa.read(chunk_size)
+                if chunk != fb.read(chunk_size):
+                    return False
+                if not chunk:
+                    return True
+    except FileNotFoundError:
+        return False
+
+
+def prune_unlisted(root, keep):
+    # Removes every file below root whose "/"-separated relative path is
+    # not in keep, with any directories that become empty.
+    removed = []
+    root = os.fspath(root)
+    for dirpath, dirs, files in os.walk(root, topdown=False):
+        for file in files:
+            path = os.path.join(dirpath, file)
+            key = os.path.relpath(path, root).replace(os.sep, "/")
+            if key not in keep:
+                os.remove(path)
+                removed.append(key)
+        if dirpath != root:
+            prune_empty_dirs(dirpath, root)
+    return sorted(removed)
@@ -0,0 +1,205 @@
+import hashlib
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from htmlnode import WHITESPACE_SENSITIVE_TAGS
+from links import resolve_link
+
+_SLOT_RE = re.compile(r"\{\{ (\w+) \}\}")
+
+_PRESERVED_RE = re.compile(
+    r"<(%s)\b.*?</\1\s*>" % "|".join(sorted(WHITESPACE_SENSITIVE_TAGS)),
+    re.IGNORECASE | re.DOTALL,
+)
+_URL_ATTR_RE = re.compile(r'(href|src)="([^"]*)"')
+# HTML whitespace only, as in htmlnode: U+00A0 and friends are content.
+_WHITESPACE_RE = re.compile(r"[ \t\n\r\f]+")
+# Whitespace next to these tags never renders, so it is dropped entirely.
+_BLOCK_TAG_RE = re.compile(
+    r" ?(<!doctype[^>]*>|</?(?:html|head|body|meta|link|title|base|script|style"
+    r"|div|article|section|header|footer|main|nav|aside|p|ul|ol|li|h[1-6]"
+    r"|blockquote|pre|table|thead|tbody|tfoot|tr|td|th|hr)\b[^>]*>) ?",
+    re.IGNORECASE,
+)
+
+
+class UrlRewriter:
+    # Maps a URL to its published form: root-relative URLs get the basepath,
+    # and those naming a fingerprinted asset its current name. Relative URLs
+    # are only mapped for a page, from the rewriter for_page() returns,
+    # since they name different files on different pages. Other URLs,
+    # protocol-relative ones included, are left alone.
+
+    def __init__(self, basepath="/", assets=None, page=None):
+        self.basepath = basepath
+        self.assets = assets
+        self.urls = {} if assets is None else assets.urls
+        self.page = page
+        # Distinguishes HTML rendered with this rewriter in the block cache.
+        self.key = basepath
+        if assets is not None:
+            self.key = f"{basepath}:{assets.hash}"
+            if page is not None:
+                self.key += f":{posixpath.dirname(page)}"
+
+    def for_page(self, page):
+        # The rewriter for the content of the output at page, a "/"-separated
+        # path below the site root.
+        return UrlRewriter(self.basepath, self.assets, page)
+
+    def is_identity(self):
+        return self.basepath == "/" and not self.urls
+
+    def __call__(self, url):
+        return self.prefix(self.fingerprint(url))
+
+    def fingerprint(self, url):
+        # The URL with an asset's current name. Asset names are looked up
+        # decoded and resolved from the page; the fingerprint only changes
+        # the last segment, so the rest of the URL is kept as written.
+        if not self.urls or self.page is None and not url.startswith("/"):
+            return url
+        path = resolve_link(self.page or "", url)
+        name = path and self.urls.get(path)
+        if not name:
+            return url
+        end = len(url)
+        for mark in "?#":
+            index = url.find(mark)
+            if index != -1:
+                end = min(end, index)
+        start = url.rfind("/", 0, end) + 1
+        return url[:start] + quote(posixpath.basename(name)) + url[end:]
+
+    def prefix(self, url):
+        # The URL with the basepath, for root-relative URLs.
+        if not url.startswith("/") or url.startswith("//"):
+            return url
+        return self.basepath + url[1:]
+
+    def rewrite_html(self, html):
+        return _URL_ATTR_RE.sub(
+            lambda match: f'{match.group(1)}="{self(match.group(2))}"', html
+        )
+
+
+def rewrite_root_urls(html, basepath, assets=None):
+    # Rewrites the href and src attributes in markup, for the template's own
+    # links; page content is rewritten on its nodes as they are built.
+    rewriter = UrlRewriter(basepath, assets)
+    if rewriter.is_identity():
+        return html
+    return rewriter.rewrite_html(html)
+
+
+def minify_html(html):
+    # Collapses whitespace outside of elements that render it verbatim, whose
+    # content is copied through untouched.
+    pieces = []
+    pos = 0
+    block = False
+    for match in _PRESERVED_RE.finditer(html):
+        markup = _minify_markup(html[pos : match.start()])
+        if block:
+            markup = markup.lstrip(" ")
+        block = match.group(1).lower() in ("pre", "script", "style")
+        if block:
+            markup = markup.rstrip(" ")
+        pieces.append(markup)
+        pieces.append(match.group(0))
+        pos = match.end()
+    markup = _minify_markup(html[pos:])
+    pieces.append(markup.lstrip(" ") if block else markup)
+    return "".join(pieces)
+
+
+def _minify_markup(html):
+    return _BLOCK_TAG_RE.sub(r"\1", _WHITESPACE_RE.sub(" ", html))
+
+
+class Template:
+    def __init__(self, source, basepath="/", minify=False, assets=None):
+        self.source = source
+        self.basepath = basepath
+        self.minify = minify
+        # Pages rewrite the URLs in their content with the same rewriter;
+        # None when there is nothing to rewrite.
+        self.rewrite_url = UrlRewriter(basepath, assets)
+        if self.rewrite_url.is_identity():
+            self.rewrite_url = None
+        self.hash = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        self.saved = 0
+        self.parts = []
+
+        if minify:
+            # Minified once here rather than per page; the flag is part of
+            # the hash so toggling it invalidates pages built the other way.
+            self.hash = hashlib.sha256(f"minify:{self.hash}".encode()).hexdigest()
+            minified = minify_html(source)
+            self.saved = len(source.encode("utf-8")) - len(minified.encode("utf-8"))
+            source = minified
+
+        if assets is not None:
+            # Pages embed the fingerprinted names of the assets they link,
+            # so they are rebuilt whenever the asset map changes.
+            salted = f"assets:{assets.hash}:{self.hash}"
+            self.hash = hashlib.sha256(salted.encode()).hexdigest()
+
+        # Literal text alternates with slot names: even indexes are literals
+        # with the basepath already applied, odd indexes are slot names.
+        pos = 0
+        for match in _SLOT_RE.finditer(source):
+            self.parts.append(self._rewrite_literal(source[pos : match.start()]))
+            self.parts.append(match.group(1))
+            pos = match.end()
+        self.parts.append(self._rewrite_literal(source[pos:]))
+
+    def _rewrite_literal(self, html):
+        if self.rewrite_url is None:
+            return html
+        return self.rewrite_url.rewrite_html(html)
+
+    def slots(self):
+        return set(self.parts[1::2])
+
+    def render(self, write, **slots):
+        for i, part in enumerate(self.parts):
+            if i % 2 == 0:
+                write(part)
+            elif part not in slots:
+                write(f"{{{{ {part} }}}}")
+            elif callable(slots[part]):
+                slots[part](write)
+            else:
+                write(slots[part])
+
+    def render_to_string(self, **slots):
+        chunks = []
+        self.render(chunks.append, **slots)
+        return "".join(chunks)
+
+
+_template_cache = {}
+
+
+def load_template(path, basepath="/", minify=False, assets=None):
+    # Compiled templates are reused until the file changes on disk, so a
+    # build reads and parses the template once rather than once per page.
+    stat = os.stat(path)
+    key = (os.fspath(path), basepath, minify, assets and assets.hash)
+    signature = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    cached = _template_cache.get(key)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    with open(path, encoding="utf-8") as f:
+        template = Template(f.read(), basepath, minify, assets)
+    _template_cache[key] = (signature, template)
+    return template
+
+
+def clear_template_cache():
+    _template_cache.clear()
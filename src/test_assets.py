@@ -0,0 +1,151 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import assets
+from assets import (
+    AssetMap,
+    build_asset_map,
+    copy_asset,
+    fingerprint_name,
+    sync_assets,
+)
+from manifest import BuildManifest
+
+
+class AssetsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self.tmp.name, "static")
+        self.dst = os.path.join(self.tmp.name, "docs")
+        self.write(self.src, "index.css", text="body {}")
+        self.write(self.src, "images", "a.png", text="PNG" * 100)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, *parts, text="x"):
+        path = os.path.join(*parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def read(self, *parts):
+        with open(os.path.join(self.dst, *parts)) as f:
+            return f.read()
+
+
+class TestSyncAssets(AssetsTestCase):
+
+    def test_first_sync_copies_everything(self):
+        stats = sync_assets(self.src, self.dst)
+        self.assertEqual(stats.copied_files, 2)
+        self.assertEqual(stats.copied_bytes, 307)
+        self.assertEqual(self.read("images", "a.png"), "PNG" * 100)
+        src_stat = os.stat(os.path.join(self.src, "index.css"))
+        dst_stat = os.stat(os.path.join(self.dst, "index.css"))
+        self.assertEqual(src_stat.st_mtime_ns, dst_stat.st_mtime_ns)
+
+    def test_unchanged_files_are_skipped(self):
+        sync_assets(self.src, self.dst)
+        stats = sync_assets(self.src, self.dst)
+        self.assertEqual((stats.copied_files, stats.skipped_files), (0, 2))
+        self.assertEqual(stats.skipped_bytes, 307)
+
+    def test_changed_file_is_copied(self):
+        sync_assets(self.src, self.dst)
+        self.write(self.src, "index.css", text="body { margin: 0 }")
+        stats = sync_assets(self.src, self.dst, jobs=1)
+        self.assertEqual(stats.copied_files, 1)
+        self.assertEqual(self.read("index.css"), "body { margin: 0 }")
+
+    def test_touched_destination_is_recopied_in_stat_mode(self):
+        sync_assets(self.src, self.dst)
+        os.utime(os.path.join(self.dst, "index.css"), ns=(0, 0))
+        self.assertEqual(sync_assets(self.src, self.dst).copied_files, 1)
+
+    def test_hash_mode_uses_manifest(self):
+        manifest = BuildManifest(os.path.join(self.tmp.name, "m.json"), self.dst)
+        sync_assets(self.src, self.dst, manifest, compare="hash")
+        os.utime(os.path.join(self.dst, "index.css"), ns=(0, 0))
+        stats = sync_assets(self.src, self.dst, manifest, compare="hash")
+        self.assertEqual(stats.skipped_files, 2)
+        self.assertEqual(len(manifest.files), 2)
+
+    def test_prune_removes_files_missing_from_source(self):
+        sync_assets(self.src, self.dst)
+        os.remove(os.path.join(self.src, "images", "a.png"))
+        stats = sync_assets(self.src, self.dst, prune=True)
+        self.assertEqual(stats.pruned_files, 1)
+        self.assertFalse(os.path.exists(os.path.join(self.dst, "images")))
+
+    def test_hardlink_mode_shares_inode(self):
+        sync_assets(self.src, self.dst, mode="hardlink")
+        src_stat = os.stat(os.path.join(self.src, "index.css"))
+        dst_stat = os.stat(os.path.join(self.dst, "index.css"))
+        self.assertEqual(src_stat.st_ino, dst_stat.st_ino)
+
+    def test_copy_over_hardlink_leaves_source_intact(self):
+        sync_assets(self.src, self.dst, mode="hardlink")
+        other = self.write(self.tmp.name, "other.css", text="other")
+        copy_asset(other, os.path.join(self.dst, "index.css"))
+        with open(os.path.join(self.src, "index.css")) as f:
+            self.assertEqual(f.read(), "body {}")
+
+    def test_reflink_falls_back_to_copy(self):
+        sync_assets(self.src, self.dst, mode="reflink")
+        self.assertEqual(self.read("index.css"), "body {}")
+
+    def test_kernel_copy_falls_back_to_copyfile(self):
+        error = OSError(assets.errno.EXDEV, "cross-device")
+        with mock.patch.object(assets, "_copy_range", side_effect=error):
+            sync_assets(self.src, self.dst)
+        self.assertEqual(self.read("images", "a.png"), "PNG" * 100)
+
+
+class TestFingerprint(AssetsTestCase):
+
+    def test_fingerprint_name(self):
+        name = fingerprint_name("app.min.js", "3f9a1c0d77")
+        self.assertEqual(name, "app.min.3f9a1c0d.js")
+
+    def test_asset_map(self):
+        self.write(self.src, "page.html")
+        self.write(self.src, "CNAME")
+        self.write(self.src, "robots.txt")
+        self.write(self.src, "favicon.ico")
+        self.write(self.src, "frog.gif:Zone.Identifier")
+        urls = build_asset_map(self.src).urls
+        self.assertEqual(sorted(urls), ["images/a.png", "index.css"])
+        self.assertRegex(urls["images/a.png"], r"^images/a\.[0-9a-f]{8}\.png$")
+        self.assertEqual(build_asset_map(self.src).urls, urls)
+
+        self.write(self.src, "index.css", text="body { margin: 0 }")
+        changed = build_asset_map(self.src).urls
+        self.assertNotEqual(changed["index.css"], urls["index.css"])
+        self.assertEqual(changed["images/a.png"], urls["images/a.png"])
+
+    def test_sync_uses_fingerprinted_names(self):
+        urls = build_asset_map(self.src).urls
+        stats = sync_assets(self.src, self.dst, names=urls)
+        self.assertEqual(stats.copied_files, 4)
+        self.assertEqual(self.read(*urls["images/a.png"].split("/")), "PNG" * 100)
+        # Stylesheets still refer to the originals by name.
+        self.assertEqual(self.read("images", "a.png"), "PNG" * 100)
+        self.assertEqual(self.read(urls["index.css"]), "body {}")
+
+    def test_map_is_saved_only_when_changed(self):
+        path = os.path.join(self.tmp.name, "asset-map.json")
+        assets = build_asset_map(self.src)
+        assets.save(path)
+        os.utime(path, ns=(0, 0))
+        build_asset_map(self.src).save(path)
+        self.assertEqual(os.stat(path).st_mtime_ns, 0)
+        self.assertEqual(AssetMap.load(path).urls, assets.urls)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from bench import (
+    compare_results,
+    generate_corpus,
+    measure_node_memory,
+    run_benchmarks,
+)
+from main import build_site
+
+
+class TestCorpus(unittest.TestCase):
+
+    def read_tree(self, root):
+        result = {}
+        for dirpath, _, files in os.walk(root):
+            for file in files:
+                path = os.path.join(dirpath, file)
+                with open(path, encoding="utf-8") as f:
+                    result[os.path.relpath(path, root)] = f.read()
+        return result
+
+    def test_corpus_is_deterministic(self):
+        with tempfile.TemporaryDirectory() as a, tempfile.TemporaryDirectory() as b:
+            generate_corpus(a, pages=12, seed=7, huge_list=50, long_paragraph=100)
+            generate_corpus(b, pages=12, seed=7, huge_list=50, long_paragraph=100)
+            self.assertEqual(self.read_tree(a), self.read_tree(b))
+
+    def test_corpus_layout(self):
+        with tempfile.TemporaryDirectory() as root:
+            generate_corpus(root, pages=3, huge_list=10)
+            tree = self.read_tree(root)
+            self.assertIn("template.html", tree)
+            self.assertIn(os.path.join("static", "index.css"), tree)
+            self.assertIn(os.path.join("content", "section2", "page2.md"), tree)
+            huge = tree[os.path.join("content", "pathological", "huge-list.md")]
+            self.assertEqual(huge.count("\n- "), 10)
+
+    def test_mix_controls_block_kinds(self):
+        with tempfile.TemporaryDirectory() as root:
+            generate_corpus(root, pages=1, blocks=5, mix={"code": 1})
+            page = self.read_tree(root)[os.path.join("content", "section0", "page0.md")]
+            self.assertEqual(page.count("```"), 10)
+
+    def test_corpus_links_resolve(self):
+        with tempfile.TemporaryDirectory() as root:
+            generate_corpus(root, pages=30, huge_list=10, long_paragraph=50)
+            with contextlib.redirect_stdout(io.StringIO()) as out:
+                build_site(root)
+            self.assertIn("Link check: 0 broken links", out.getvalue())
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_run_selected_benchmarks(self):
+        result = run_benchmarks(pages=3, repeat=1, only=["to_html", "build"])
+        self.assertEqual(set(result["results"]), {"to_html", "build"})
+        self.assertGreater(result["results"]["build"]["median"], 0)
+
+    def test_node_memory(self):
+        sizes = measure_node_memory(1000)
+        self.assertEqual(set(sizes), {"TextNode", "LeafNode", "ParentNode"})
+        for size in sizes.values():
+            self.assertGreater(size, 0)
+
+    def test_compare_flags_regressions(self):
+        baseline = {"results": {"a": {"median": 1.0}, "b": {"median": 1.0}}}
+        current = {
+            "results": {"a": {"median": 1.05}, "b": {"median": 1.5}, "c": {"median": 1}}
+        }
+        rows = {row[0]: row for row in compare_results(baseline, current, 0.1)}
+        self.assertFalse(rows["a"][4])
+        self.assertTrue(rows["b"][4])
+        self.assertAlmostEqual(rows["b"][3], 0.5)
+        self.assertIsNone(rows["c"][1])
+
+
+if __name__ == "__main__":
+    unittest.main()
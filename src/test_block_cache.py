@@ -0,0 +1,176 @@
+import io
+import os
+import tempfile
+import unittest
+
+from block_cache import BlockCache
+from block_utils import (
+    markdown_to_html_node,
+    markdown_to_html_stream,
+    set_block_cache,
+    set_minify,
+)
+from htmlnode import MinifyStats
+from template import UrlRewriter
+from text_utils import RenderContext
+
+
+class TestBlockCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "blocks.sqlite3")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_hit_and_miss_counts(self):
+        cache = BlockCache(10)
+        self.assertIsNone(cache.get("a"))
+        cache.put("a", "<p>a</p>")
+        self.assertEqual(cache.get("a"), "<p>a</p>")
+        self.assertEqual(
+            cache.stats(), {"hits": 1, "disk_hits": 0, "misses": 1, "entries": 1}
+        )
+
+    def test_lru_eviction(self):
+        cache = BlockCache(2)
+        cache.put("a", "A")
+        cache.put("b", "B")
+        cache.get("a")
+        cache.put("c", "C")
+        self.assertEqual(cache.get("a"), "A")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(len(cache.memory), 2)
+
+    def test_salt_separates_entries(self):
+        cache = BlockCache(10, salt="one")
+        cache.put("a", "A")
+        self.assertNotEqual(cache.key("a"), BlockCache(10, salt="two").key("a"))
+
+    def test_persistent_tier_survives_instances(self):
+        cache = BlockCache(10, self.path)
+        cache.put("a", "A")
+        cache.close()
+
+        cache = BlockCache(10, self.path)
+        self.assertEqual(cache.get("a"), "A")
+        self.assertEqual(cache.disk_hits, 1)
+        self.assertEqual(cache.get("a"), "A")
+        self.assertEqual(cache.disk_hits, 1)
+        cache.close()
+
+    def test_read_only_tier_does_not_write(self):
+        cache = BlockCache(10, self.path)
+        cache.put("a", "A")
+        cache.close()
+
+        reader = BlockCache(10, self.path, read_only=True)
+        reader.put("b", "B")
+        reader.close()
+        self.assertIsNone(BlockCache(10, self.path).get("b"))
+
+    def test_read_only_missing_file(self):
+        cache = BlockCache(10, self.path, read_only=True)
+        self.assertIsNone(cache.get("a"))
+        self.assertFalse(os.path.exists(self.path))
+
+
+class TestCachedRendering(unittest.TestCase):
+
+    MARKDOWN = "# Title\n\nSame **paragraph**\n\n- a\n- b\n\nSame **paragraph**"
+
+    def setUp(self):
+        self.cache = BlockCache(10)
+        set_block_cache(self.cache)
+
+    def tearDown(self):
+        set_block_cache(None)
+
+    def render(self, markdown, context=None):
+        out = io.StringIO()
+        markdown_to_html_stream(io.StringIO(markdown), out.write, context)
+        return out.getvalue()
+
+    def test_output_matches_uncached(self):
+        cached = self.render(self.MARKDOWN)
+        set_block_cache(None)
+        self.assertEqual(cached, self.render(self.MARKDOWN))
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(self.cache.misses, 3)
+
+    def test_stream_uses_cache(self):
+        markdown_to_html_stream(io.StringIO(self.MARKDOWN), io.StringIO().write)
+        out = io.StringIO()
+        markdown_to_html_stream(io.StringIO(self.MARKDOWN), out.write)
+        self.assertEqual(self.cache.misses, 3)
+        self.assertEqual(self.cache.hits, 5)
+        self.assertIn("<li>a</li>", out.getvalue())
+
+    def test_tree_is_built_not_cached(self):
+        markdown = "```\na  b\n```"
+        set_minify(True)
+        try:
+            node = markdown_to_html_node(markdown)
+            chunks = []
+            stats = MinifyStats()
+            node.serialize(chunks.append, stats)
+        finally:
+            set_minify(False)
+        self.assertEqual("".join(chunks), "<div><pre><code>a  b</code></pre></div>")
+        self.assertEqual(self.cache.misses, 0)
+
+    def test_failed_blocks_are_not_cached(self):
+        with self.assertRaises(ValueError):
+            self.render("Unclosed **bold")
+        self.assertEqual(self.cache.memory, {})
+
+    def test_minified_entries_are_kept_apart(self):
+        markdown = "Same  **paragraph**\n\n```\nx  =  1\n```"
+        plain = self.render(markdown)
+        set_minify(True)
+        try:
+            out = io.StringIO()
+            saved = markdown_to_html_stream(io.StringIO(markdown), out.write)
+            again = markdown_to_html_stream(io.StringIO(markdown), io.StringIO().write)
+        finally:
+            set_minify(False)
+        self.assertEqual(
+            out.getvalue(),
+            "<div><p>Same <b>paragraph</b></p><pre><code>x  =  1</code></pre></div>",
+        )
+        self.assertEqual((saved, again), (1, 1))
+        self.assertEqual(self.render(markdown), plain)
+
+    def test_rewritten_entries_are_kept_apart(self):
+        markdown = "[home](/)"
+        plain = self.render(markdown)
+        context = RenderContext(UrlRewriter("/base/"))
+        rewritten = self.render(markdown, context)
+        self.assertEqual(rewritten, '<div><p><a href="/base/">home</a></p></div>')
+        self.assertEqual(self.render(markdown), plain)
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_hits_report_the_block_links(self):
+        markdown = "[a](/a) ![i](/i.png)\n\nplain"
+        found = []
+        for _ in range(2):
+            links = []
+            self.render(markdown, RenderContext(links=links))
+            found.append(links)
+        self.assertEqual(self.cache.hits, 2)
+        self.assertEqual(found, [["/a", "/i.png"], ["/a", "/i.png"]])
+
+    def test_hits_report_the_block_text(self):
+        markdown = "# Some **bold** title\n\n```\nx = 1\n```"
+        found = []
+        for _ in range(2):
+            texts = []
+            self.render(markdown, RenderContext(texts=texts))
+            found.append(" ".join(texts))
+        self.assertEqual(self.cache.hits, 2)
+        self.assertEqual(found, ["Some  bold  title x = 1"] * 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
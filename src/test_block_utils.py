@@ -1,3 +1,6 @@
+import io
+import mmap
+import tempfile
 import unittest
 from block_utils import *
 
@@ -194,5 +197,105 @@ This is _italic_ and **bold**.
         )
 
 
+class TestClassifyBlock(unittest.TestCase):
+
+    def test_heading_level(self):
+        self.assertEqual(classify_block("### Title"), (BlockType.HEADING, 3))
+
+    def test_code_has_no_info(self):
+        self.assertEqual(classify_block("```\nx\n```"), (BlockType.CODE, None))
+
+    def test_quote_lines(self):
+        self.assertEqual(
+            classify_block("> a\n>b"), (BlockType.QUOTE, ["> a", ">b"])
+        )
+
+    def test_unordered_items(self):
+        self.assertEqual(
+            classify_block("- a\n- - b"), (BlockType.UNORDERED_LIST, ["a", "- b"])
+        )
+
+    def test_ordered_items(self):
+        block = "\n".join(f"{i}. item {i}" for i in range(1, 12))
+        block_type, items = classify_block(block)
+        self.assertEqual(block_type, BlockType.ORDERED_LIST)
+        self.assertEqual(items[10], "item 11")
+
+    def test_ordered_wrong_number_is_paragraph(self):
+        self.assertEqual(classify_block("1. a\n3. b"), (BlockType.PARAGRAPH, None))
+
+    def test_seven_hashes_is_paragraph(self):
+        self.assertEqual(classify_block("####### x"), (BlockType.PARAGRAPH, None))
+
+    def test_agrees_with_block_type_to_tag(self):
+        for block in ["# a", "###### b", "p", "```c```", "> q", "- u", "1. o"]:
+            block_type, _ = classify_block(block)
+            node = block_to_html_node(block)
+            self.assertEqual(node.tag, block_type_to_tag(block_type, block))
+
+
+class TestStreamingBlocks(unittest.TestCase):
+
+    SAMPLES = [
+        "",
+        "   \n\n",
+        "one",
+        "\n\n# Title\n\npara line\nnext line\n\n\n- a\n- b\n",
+        "a  \n \t \nb\n\n\n\nc",
+        "```\ncode\n\nmore\n```",
+        "> q1\n> q2\n\n1. x\n2. y\n   \n",
+    ]
+
+    def test_matches_markdown_to_blocks(self):
+        for md in self.SAMPLES:
+            self.assertEqual(
+                list(iter_markdown_blocks(io.StringIO(md))), markdown_to_blocks(md), md
+            )
+
+    def test_accepts_string(self):
+        self.assertEqual(list(iter_markdown_blocks("a\n\nb")), ["a", "b"])
+
+    def test_is_lazy(self):
+        def lines():
+            yield "first\n"
+            yield "\n"
+            raise AssertionError("read past the first block")
+
+        self.assertEqual(next(iter_markdown_blocks(lines())), "first")
+
+    def test_accepts_mmap(self):
+        with tempfile.TemporaryFile() as f:
+            f.write(b"# T\r\n\r\nsome **text**\r\n")
+            f.flush()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                blocks = list(iter_markdown_blocks(mm))
+        self.assertEqual(blocks, ["# T", "some **text**"])
+
+    def test_stream_matches_tree(self):
+        for md in self.SAMPLES[2:5] + self.SAMPLES[6:]:
+            out = io.StringIO()
+            markdown_to_html_stream(io.StringIO(md), out.write)
+            self.assertEqual(out.getvalue(), markdown_to_html_node(md).to_html())
+
+    def test_stream_minified(self):
+        md = "# Title\n\nsome  **bold**\ntext\n\n```\na  b\n```"
+        set_minify(True)
+        try:
+            out = io.StringIO()
+            saved = markdown_to_html_stream(io.StringIO(md), out.write)
+        finally:
+            set_minify(False)
+        self.assertEqual(
+            out.getvalue(),
+            "<div><h1>Title</h1><p>some <b>bold</b> text</p>"
+            "<pre><code>a  b</code></pre></div>",
+        )
+        self.assertEqual(saved, 1)
+
+    def test_stream_empty_document_raises(self):
+        with self.assertRaises(ValueError):
+            markdown_to_html_stream(io.StringIO("\n\n"), io.StringIO().write)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,168 @@
+import contextlib
+import gzip
+import io
+import os
+import tempfile
+import unittest
+
+from compress import Compressor, available_formats
+from main import build_site
+
+
+class TestCompressor(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.out = os.path.join(self.tmp.name, "docs")
+        self.state = os.path.join(self.tmp.name, "state.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.out, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def run_compressor(self, *paths, threshold=100):
+        compressor = Compressor(self.state, self.out, ["gzip"], threshold, jobs=2)
+        for path in paths:
+            compressor.submit(path)
+        return compressor.finish()
+
+    def test_gzip_sibling_is_deterministic(self):
+        path = self.write("index.html", "<p>hello</p>" * 50)
+        stats = self.run_compressor(path)
+        self.assertEqual(stats.compressed_files, 1)
+        with open(path + ".gz", "rb") as f:
+            first = f.read()
+        self.assertEqual(gzip.decompress(first), b"<p>hello</p>" * 50)
+
+        os.remove(self.state)
+        self.run_compressor(path)
+        with open(path + ".gz", "rb") as f:
+            self.assertEqual(f.read(), first)
+
+    def test_small_and_binary_files_are_left_alone(self):
+        small = self.write("small.css", "body {}")
+        image = self.write("image.png", "PNG" * 100)
+        stats = self.run_compressor(small, image)
+        self.assertEqual(stats.compressed_files, 0)
+        self.assertFalse(os.path.exists(small + ".gz"))
+        self.assertFalse(os.path.exists(image + ".gz"))
+
+    def test_unchanged_content_is_not_recompressed(self):
+        path = self.write("app.js", "console.log(1);\n" * 20)
+        self.run_compressor(path)
+        stats = self.run_compressor(path)
+        self.assertEqual((stats.compressed_files, stats.skipped_files), (0, 1))
+
+        self.write("app.js", "console.log(2);\n" * 20)
+        stats = self.run_compressor(path)
+        self.assertEqual(stats.compressed_files, 1)
+
+    def test_missing_sibling_is_rewritten(self):
+        path = self.write("app.js", "console.log(1);\n" * 20)
+        self.run_compressor(path)
+        os.remove(path + ".gz")
+        self.assertEqual(self.run_compressor(path).compressed_files, 1)
+        self.assertTrue(os.path.exists(path + ".gz"))
+
+    def test_incompressible_output_is_not_recompressed(self):
+        path = os.path.join(self.out, "app.js")
+        os.makedirs(self.out)
+        with open(path, "wb") as f:
+            f.write(os.urandom(300))
+        self.assertEqual(self.run_compressor(path).compressed_files, 1)
+        self.assertFalse(os.path.exists(path + ".gz"))
+        stats = self.run_compressor(path)
+        self.assertEqual((stats.compressed_files, stats.skipped_files), (0, 1))
+
+    def test_discard_removes_siblings(self):
+        path = self.write("blog/index.html", "<p>hello</p>" * 50)
+        self.run_compressor(path)
+        os.remove(path)
+        compressor = Compressor(self.state, self.out, ["gzip"])
+        compressor.discard(path)
+        compressor.finish()
+        self.assertFalse(os.path.exists(os.path.dirname(path)))
+        self.assertEqual(compressor.state, {})
+
+    def test_unavailable_formats_are_ignored(self):
+        compressor = Compressor(self.state, self.out, ["gzip", "nope"])
+        self.assertEqual(compressor.formats, ["gzip"])
+        compressor.finish()
+        self.assertIn("gzip", available_formats())
+
+
+class TestCompressedBuild(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        os.makedirs(os.path.join(root, "static"))
+        os.makedirs(os.path.join(root, "content", "blog"))
+        with open(os.path.join(root, "template.html"), "w") as f:
+            f.write("<title>{{ Title }}</title><main>{{ Content }}</main>")
+        with open(os.path.join(root, "static", "index.css"), "w") as f:
+            f.write("p { color: red; }\n" * 100)
+        for name in ("index.md", os.path.join("blog", "index.md")):
+            with open(os.path.join(root, "content", name), "w") as f:
+                f.write("# Title\n\n" + "Some text.\n\n" * 100)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, **options):
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            build_site(self.tmp.name, incremental=True, **options)
+        return out.getvalue()
+
+    def test_build_writes_gzip_siblings(self):
+        log = self.build(compress=True, compress_formats=["gzip"])
+        self.assertIn("Compressed 3 files", log)
+        docs = os.path.join(self.tmp.name, "docs")
+        for name in ("index.html", "index.css", os.path.join("blog", "index.html")):
+            with open(os.path.join(docs, name), "rb") as f:
+                original = f.read()
+            with open(os.path.join(docs, name + ".gz"), "rb") as f:
+                self.assertEqual(gzip.decompress(f.read()), original)
+
+        log = self.build(compress=True, compress_formats=["gzip"])
+        self.assertIn("Nothing changed since the last build", log)
+        with open(os.path.join(self.tmp.name, "content", "index.md"), "a") as f:
+            f.write("More text.\n")
+        log = self.build(compress=True, compress_formats=["gzip"])
+        self.assertIn("Compressed 1 files", log)
+
+    def test_enabling_compression_covers_unchanged_outputs(self):
+        self.build()
+        log = self.build(compress=True, compress_formats=["gzip"])
+        self.assertIn("Compressed 3 files", log)
+
+    def test_removed_page_drops_siblings(self):
+        self.build(compress=True, compress_formats=["gzip"])
+        os.remove(os.path.join(self.tmp.name, "content", "blog", "index.md"))
+        self.build(compress=True, compress_formats=["gzip"])
+        blog = os.path.join(self.tmp.name, "docs", "blog")
+        self.assertFalse(os.path.exists(blog))
+
+    def test_build_without_compression_drops_siblings(self):
+        self.build(compress=True, compress_formats=["gzip"])
+        with open(os.path.join(self.tmp.name, "content", "index.md"), "w") as f:
+            f.write("# Changed\n\n" + "Other text.\n\n" * 100)
+        self.build()
+        docs = os.path.join(self.tmp.name, "docs")
+        self.assertFalse(os.path.exists(os.path.join(docs, "index.html.gz")))
+        self.assertFalse(os.path.exists(os.path.join(docs, "index.css.gz")))
+        state = os.path.join(self.tmp.name, ".cache", "compress-state.json")
+        self.assertFalse(os.path.exists(state))
+
+        log = self.build(compress=True, compress_formats=["gzip"])
+        self.assertIn("Compressed 3 files", log)
+
+
+if __name__ == "__main__":
+    unittest.main()
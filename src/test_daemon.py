@@ -0,0 +1,126 @@
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from bench import generate_corpus
+from client import default_socket_path, send_request
+from daemon import BuildDaemon
+from main import BuildManifest, build_site, serve_daemon
+
+
+class TestBuildDaemon(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.enterContext(contextlib.redirect_stdout(io.StringIO()))
+        generate_corpus(self.root, pages=3)
+        self.socket = default_socket_path(self.root)
+        self.thread = threading.Thread(
+            target=serve_daemon,
+            args=(self.root,),
+            kwargs={"block_cache_size": 64},
+            daemon=True,
+        )
+        self.thread.start()
+        deadline = time.monotonic() + 5
+        while not os.path.exists(self.socket):
+            self.assertLess(time.monotonic(), deadline, "daemon did not start")
+            time.sleep(0.01)
+
+    def tearDown(self):
+        if self.thread.is_alive():
+            send_request(self.socket, "shutdown")
+            self.thread.join(5)
+        self.tmp.cleanup()
+
+    def request(self, command, **params):
+        return send_request(self.socket, command, timeout=10, **params)
+
+    def test_builds_incrementally_on_request(self):
+        first = self.request("build")
+        self.assertTrue(first["ok"], first)
+        self.assertIn("Generating page", first["log"])
+        page = os.path.join(self.root, "docs", "section0", "page0.html")
+        self.assertTrue(os.path.exists(page))
+
+        second = self.request("build")
+        self.assertTrue(second["ok"])
+        self.assertNotIn("Generating page", second["log"])
+        self.assertEqual(self.request("status")["builds"], 2)
+
+    def test_build_error_keeps_daemon_alive(self):
+        with open(os.path.join(self.root, "content", "index.md"), "w") as f:
+            f.write("no title")
+        response = self.request("build")
+        self.assertFalse(response["ok"])
+        self.assertIn("No header provided", response["error"])
+        self.assertTrue(self.request("status")["ok"])
+
+    def test_invalidate_and_unknown_command(self):
+        self.request("build")
+        self.assertGreater(self.request("status")["block_cache"]["entries"], 0)
+        self.assertTrue(self.request("invalidate")["ok"])
+        self.assertEqual(self.request("status")["block_cache"]["entries"], 0)
+        self.assertFalse(self.request("bogus")["ok"])
+
+    def test_shutdown_removes_socket(self):
+        self.assertTrue(self.request("shutdown")["ok"])
+        self.thread.join(5)
+        self.assertFalse(self.thread.is_alive())
+        self.assertFalse(os.path.exists(self.socket))
+
+    def test_refuses_second_daemon(self):
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            with self.assertRaisesRegex(RuntimeError, "already listening"):
+                BuildDaemon(self.socket, {})
+            self.assertTrue(self.request("status")["ok"])
+        self.assertEqual(stderr.getvalue(), "")
+
+    def edit_page(self):
+        path = os.path.join(self.root, "content", "section0", "page0.md")
+        with open(path, "a") as f:
+            f.write("\nMore text.\n")
+
+    def test_state_stays_resident_between_builds(self):
+        self.assertTrue(self.request("build")["ok"])
+        self.edit_page()
+        with mock.patch.object(BuildManifest, "load", autospec=True) as load:
+            response = self.request("build")
+        self.assertTrue(response["ok"], response)
+        self.assertIn("Generating page", response["log"])
+        load.assert_not_called()
+
+    def test_reloads_state_after_outside_build(self):
+        self.assertTrue(self.request("build")["ok"])
+        self.edit_page()
+        build_site(self.root, incremental=True)
+        self.edit_page()
+        with mock.patch.object(
+            BuildManifest, "load", autospec=True, side_effect=BuildManifest.load
+        ) as load:
+            response = self.request("build")
+        self.assertTrue(response["ok"], response)
+        load.assert_called_once()
+
+
+class TestStaleSocket(unittest.TestCase):
+
+    def test_stale_socket_is_replaced(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "build.sock")
+            BuildDaemon(path, {}).socket.close()
+            self.assertTrue(os.path.exists(path))
+            server = BuildDaemon(path, {}, idle_timeout=0.01)
+            server.serve()
+            self.assertFalse(os.path.exists(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
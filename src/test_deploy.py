@@ -0,0 +1,168 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from bench import generate_corpus
+from deploy import DeployManifest
+from main import build_site
+from manifest import hash_file
+
+
+class TestDeployManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.out = os.path.join(self.tmp.name, "docs")
+        self.path = os.path.join(self.tmp.name, "deploy.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, key, text):
+        path = os.path.join(self.out, *key.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def manifest(self):
+        deploy = DeployManifest(self.path, self.out)
+        deploy.load()
+        return deploy
+
+    def test_record_types(self):
+        deploy = self.manifest()
+        deploy.record(os.path.join(self.out, "a", "index.html"), "h1", 10)
+        deploy.record(os.path.join(self.out, "a", "index.html.gz"), "h2", 5)
+        self.assertEqual(
+            deploy.files,
+            {
+                "a/index.html": {"hash": "h1", "size": 10, "type": "text/html"},
+                "a/index.html.gz": {
+                    "hash": "h2",
+                    "size": 5,
+                    "type": "text/html",
+                    "encoding": "gzip",
+                },
+            },
+        )
+
+    def test_changes_between_builds(self):
+        deploy = self.manifest()
+        deploy.record(os.path.join(self.out, "a.html"), "1", 1)
+        deploy.record(os.path.join(self.out, "b.html"), "1", 1)
+        deploy.record(os.path.join(self.out, "b.html.gz"), "1", 1)
+        self.assertEqual(deploy.save()["added"], ["a.html", "b.html", "b.html.gz"])
+
+        deploy = self.manifest()
+        deploy.record(os.path.join(self.out, "a.html"), "2", 1)
+        deploy.record(os.path.join(self.out, "c.html"), "1", 1)
+        deploy.carry_forward(["a.html", "b.html", "c.html"], (".gz",))
+        changes = deploy.save()
+        self.assertEqual(
+            changes, {"added": ["c.html"], "changed": ["a.html"], "removed": []}
+        )
+        self.assertIn("b.html.gz", deploy.files)
+
+    def test_unknown_outputs_are_hashed(self):
+        path = self.write("new.css", "body {}")
+        deploy = self.manifest()
+        deploy.carry_forward(["new.css"])
+        self.assertEqual(deploy.files["new.css"]["hash"], hash_file(path))
+        self.assertEqual(deploy.files["new.css"]["size"], 7)
+
+    def test_unchanged_build_does_not_rewrite(self):
+        deploy = self.manifest()
+        deploy.record(os.path.join(self.out, "a.html"), "1", 1)
+        deploy.save()
+        deploy = self.manifest()
+        deploy.carry_forward(["a.html"])
+        deploy.save()
+
+        os.utime(self.path, ns=(0, 0))
+        deploy = self.manifest()
+        deploy.carry_forward(["a.html"])
+        self.assertFalse(any(deploy.save().values()))
+        self.assertEqual(os.stat(self.path).st_mtime_ns, 0)
+
+    def test_clear_changes(self):
+        deploy = self.manifest()
+        deploy.record(os.path.join(self.out, "a.html"), "1", 1)
+        deploy.record(os.path.join(self.out, "removed"), "1", 1)
+        deploy.save()
+        with open(self.path) as f:
+            files = json.load(f)["files"]
+
+        self.manifest().clear_changes()
+        with open(self.path) as f:
+            cleared = f.read()
+        expected = {"added": [], "changed": [], "removed": [], "files": files}
+        self.assertEqual(json.loads(cleared), {"version": 1, **expected})
+
+        # Any other layout is read and written back.
+        with open(self.path, "w") as f:
+            json.dump({"version": 1, **expected, "added": ["a.html"]}, f, indent=1)
+        self.manifest().clear_changes()
+        with open(self.path) as f:
+            self.assertEqual(f.read(), cleared)
+
+
+class TestDeployBuild(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        generate_corpus(self.root, pages=3)
+        self.enterContext(contextlib.redirect_stdout(io.StringIO()))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, **options):
+        build_site(self.root, **options)
+        with open(os.path.join(self.root, ".cache", "deploy-manifest.json")) as f:
+            return json.load(f)
+
+    def test_tracks_outputs_across_builds(self):
+        first = self.build()
+        self.assertEqual(
+            [key for key in first["added"] if not key.startswith("images/")],
+            [
+                "index.css",
+                "section0/page0.html",
+                "section1/page1.html",
+                "section2/page2.html",
+            ],
+        )
+        page = os.path.join(self.root, "docs", "section0", "page0.html")
+        self.assertEqual(first["files"]["section0/page0.html"]["hash"], hash_file(page))
+        self.assertEqual(
+            first["files"]["section0/page0.html"]["size"], os.path.getsize(page)
+        )
+
+        with open(os.path.join(self.root, "content", "section1", "page1.md"), "w") as f:
+            f.write("# Changed\n\nText")
+        os.remove(os.path.join(self.root, "content", "section2", "page2.md"))
+        second = self.build(incremental=True)
+        self.assertEqual(second["added"], [])
+        self.assertEqual(second["changed"], ["section1/page1.html"])
+        self.assertEqual(second["removed"], ["section2/page2.html"])
+        self.assertIn("section0/page0.html", second["files"])
+
+        third = self.build()
+        changes = (third["added"], third["changed"], third["removed"])
+        self.assertEqual(changes, ([], [], []))
+
+    def test_compressed_siblings_are_listed(self):
+        first = self.build(compress=True, compress_threshold=1)
+        self.assertIn("section0/page0.html.gz", first["added"])
+        second = self.build(incremental=True, compress=True, compress_threshold=1)
+        self.assertIn("section0/page0.html.gz", second["files"])
+        self.assertEqual(second["changed"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
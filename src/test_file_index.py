@@ -0,0 +1,206 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import file_index
+from bench import generate_corpus
+from file_index import BuildStamp, FileIndex, input_digest, scan_tree
+from main import build_site
+
+
+class TestFileIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = self.write("a.md", text="hello")
+        self.index_path = os.path.join(self.tmp.name, ".cache", "index.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, *parts, text="x"):
+        path = os.path.join(self.tmp.name, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def test_unchanged_stat_is_trusted(self):
+        index = FileIndex()
+        first = index.hash(self.path)
+        with mock.patch.object(file_index, "hash_file") as hash_file:
+            self.assertEqual(index.hash(self.path), first)
+        hash_file.assert_not_called()
+        self.assertEqual(index.hashed, 1)
+
+    def test_changed_file_is_rehashed(self):
+        index = FileIndex()
+        first = index.hash(self.path)
+        self.write("a.md", text="changed")
+        self.assertNotEqual(index.hash(self.path), first)
+        self.assertEqual(index.hashed, 2)
+
+    def test_round_trip(self):
+        index = FileIndex(self.index_path)
+        digest = index.hash(self.path)
+        index.save()
+
+        loaded = FileIndex(self.index_path)
+        self.assertTrue(loaded.load())
+        with mock.patch.object(file_index, "hash_file") as hash_file:
+            self.assertEqual(loaded.hash(self.path), digest)
+        hash_file.assert_not_called()
+
+        mtime = os.stat(self.index_path).st_mtime_ns
+        os.utime(self.index_path, ns=(0, 0))
+        loaded.save()
+        self.assertEqual(os.stat(self.index_path).st_mtime_ns, 0)
+        self.assertNotEqual(mtime, 0)
+
+    def test_forget(self):
+        index = FileIndex()
+        index.hash(self.path)
+        index.forget(self.path)
+        self.assertEqual(index.entries, {})
+
+
+class TestScanTree(unittest.TestCase):
+
+    def test_matches_sorted_walk(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for parts in (
+                ("b.md",),
+                ("a.md",),
+                ("z", "c.md"),
+                ("a", "d.md"),
+                ("a", "sub", "e.md"),
+                ("a", "b", "f.md"),
+            ):
+                path = os.path.join(tmp, *parts)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                open(path, "w").close()
+
+            expected = []
+            for root, dirs, files in os.walk(tmp):
+                dirs.sort()
+                expected.append((root, sorted(files)))
+            scanned = [
+                (root, [entry.name for entry in entries])
+                for root, entries in scan_tree(tmp)
+            ]
+            self.assertEqual(scanned, expected)
+
+
+class TestBuildStamp(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.source = self.write("content", "a.md")
+        self.write("docs", "sub", "a.html")
+        self.write(".cache", "state.json", text="{}")
+        self.stamp = BuildStamp(os.path.join(self.root, ".cache", "stamp.json"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, *parts, text="x"):
+        path = os.path.join(self.root, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def inputs(self):
+        return input_digest([os.path.join(self.root, "content")], ("/",))
+
+    def record(self):
+        docs = os.path.join(self.root, "docs")
+        self.stamp.record(self.inputs(), docs, ["sub/a.html"], {})
+        loaded = BuildStamp(self.stamp.path)
+        self.assertTrue(loaded.load())
+        return loaded
+
+    def matches(self, stamp):
+        return stamp.matches(self.inputs(), os.path.join(self.root, "docs"))
+
+    def test_unchanged_build_matches(self):
+        self.assertTrue(self.matches(self.record()))
+
+    def test_changed_source_does_not_match(self):
+        stamp = self.record()
+        os.utime(self.source, ns=(0, 0))
+        self.assertFalse(self.matches(stamp))
+
+    def test_changed_settings_do_not_match(self):
+        stamp = self.record()
+        inputs = input_digest([os.path.join(self.root, "content")], ("/base/",))
+        self.assertFalse(stamp.matches(inputs, os.path.join(self.root, "docs")))
+
+    def test_rewritten_state_does_not_match(self):
+        stamp = self.record()
+        self.write(".cache", "state.json", text="{ }")
+        self.assertFalse(self.matches(stamp))
+
+    def test_removed_output_does_not_match(self):
+        stamp = self.record()
+        os.utime(os.path.join(self.root, "docs", "sub"), ns=(0, 0))
+        self.assertFalse(self.matches(stamp))
+
+    def test_cleared_stamp_does_not_match(self):
+        self.record()
+        self.stamp.clear()
+        self.assertFalse(os.path.exists(self.stamp.path))
+        self.assertFalse(self.matches(self.stamp))
+
+
+class TestUnchangedBuild(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        generate_corpus(self.root, pages=3)
+        self.build()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, **options):
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            build_site(self.root, incremental=True, **options)
+        return out.getvalue()
+
+    def test_no_op_build_reads_no_state(self):
+        self.build()
+        with mock.patch("main.BuildManifest.load") as load:
+            log = self.build()
+        load.assert_not_called()
+        self.assertIn("Nothing changed since the last build", log)
+
+    def test_no_op_build_clears_deploy_changes(self):
+        path = os.path.join(self.root, ".cache", "deploy-manifest.json")
+        self.assertIn("Nothing changed", self.build())
+        with open(path) as f:
+            deploy = json.load(f)
+        self.assertEqual(deploy["added"], [])
+        self.assertIn("section0/page0.html", deploy["files"])
+        self.assertIn("Nothing changed", self.build())
+
+    def test_removed_output_is_written_again(self):
+        page = os.path.join(self.root, "docs", "section1", "page1.html")
+        os.remove(page)
+        self.assertNotIn("Nothing changed", self.build())
+        self.assertTrue(os.path.exists(page))
+
+    def test_changed_options_build(self):
+        self.assertNotIn("Nothing changed", self.build(drafts=True))
+        self.assertIn("Nothing changed", self.build(drafts=True))
+        self.assertNotIn("Nothing changed", self.build(verbose_links=True))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,13 @@
+import io
 import unittest
 
-from htmlnode import HTMLNode, LeafNode, ParentNode, text_node_to_html_node
+from htmlnode import (
+    HTMLNode,
+    LeafNode,
+    MinifyStats,
+    ParentNode,
+    text_node_to_html_node,
+)
 from textnode import TextNode, TextType
 
 
@@ -54,6 +61,20 @@ class TestHTMLNode(unittest.TestCase):
         with self.assertRaises(NotImplementedError):
             node.to_html()
 
+    def test_subclasses_have_no_instance_dict(self):
+        """All node classes use __slots__."""
+        for node in (HTMLNode(), LeafNode("b", "x"), ParentNode("p", [])):
+            self.assertFalse(hasattr(node, "__dict__"))
+
+    def test_leaf_and_parent_defaults(self):
+        """Direct initialisation still fills every attribute."""
+        leaf = LeafNode("b", "x")
+        self.assertIsNone(leaf.children)
+        self.assertIsNone(leaf.props)
+        parent = ParentNode("p", [leaf])
+        self.assertIsNone(parent.value)
+        self.assertEqual(parent.children, [leaf])
+
 
 class TestLeafNode(unittest.TestCase):
     def test_leaf_to_html_p(self):
@@ -169,6 +190,82 @@ class TestParentNode(unittest.TestCase):
         p.props = {"href": "https://example.com"}
         self.assertIn('href="https://example.com"', p.to_html())
 
+    def test_to_html_chunks_join_to_html(self):
+        node = ParentNode(
+            "ul",
+            [ParentNode("li", [LeafNode("b", "x"), LeafNode(None, "y")])],
+            {"class": "list"},
+        )
+        chunks = node.to_html_chunks()
+        self.assertEqual(
+            chunks, ['<ul class="list">', "<li>", "<b>x</b>", "y", "</li>", "</ul>"]
+        )
+        self.assertEqual("".join(chunks), node.to_html())
+
+    def test_write_html_streams_to_file_object(self):
+        node = ParentNode("div", [LeafNode("p", "hello")])
+        out = io.StringIO()
+        node.write_html(out)
+        self.assertEqual(out.getvalue(), "<div><p>hello</p></div>")
+
+    def test_wide_node(self):
+        items = [ParentNode("li", [LeafNode(None, str(i))]) for i in range(5000)]
+        html = ParentNode("ul", items).to_html()
+        self.assertTrue(html.startswith("<ul><li>0</li><li>1</li>"))
+        self.assertTrue(html.endswith("<li>4999</li></ul>"))
+
+    def test_invalid_nested_child_raises(self):
+        node = ParentNode("div", [ParentNode("p", [])])
+        with self.assertRaises(ValueError):
+            node.to_html()
+
+
+class TestMinifiedSerialize(unittest.TestCase):
+
+    def serialize(self, node):
+        stats = MinifyStats()
+        chunks = []
+        node.serialize(chunks.append, stats)
+        return "".join(chunks), stats.saved
+
+    def test_collapses_text_whitespace(self):
+        node = ParentNode(
+            "p",
+            [
+                LeafNode(None, "one\n  two "),
+                LeafNode("a", "three\t four", {"href": "/x"}),
+            ],
+        )
+        html, saved = self.serialize(node)
+        self.assertEqual(html, '<p>one two <a href="/x">three four</a></p>')
+        self.assertEqual(saved, 3)
+
+    def test_preserves_pre_and_code(self):
+        node = ParentNode(
+            "div",
+            [
+                ParentNode("pre", [LeafNode(None, "a\n    b")]),
+                ParentNode("p", [LeafNode("code", "x  =  1"), LeafNode(None, "  y")]),
+            ],
+        )
+        html, saved = self.serialize(node)
+        self.assertEqual(
+            html, "<div><pre>a\n    b</pre><p><code>x  =  1</code> y</p></div>"
+        )
+        self.assertEqual(saved, 1)
+
+    def test_keeps_non_breaking_spaces(self):
+        node = ParentNode("p", [LeafNode(None, "10\xa0km  \u2003away")])
+        html, saved = self.serialize(node)
+        self.assertEqual(html, "<p>10\xa0km \u2003away</p>")
+        self.assertEqual(saved, 1)
+
+    def test_without_stats_matches_to_html(self):
+        node = ParentNode("p", [LeafNode(None, "a  b")])
+        chunks = []
+        node.serialize(chunks.append)
+        self.assertEqual("".join(chunks), node.to_html())
+
 
 class TestTextNodeToHtmlNode(unittest.TestCase):
     def test_plain_text(self):
@@ -0,0 +1,163 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from bench import generate_corpus
+from links import LinkGraph, link_candidates, resolve_link
+from main import build_site
+
+
+class TestResolveLink(unittest.TestCase):
+
+    def test_resolve_link(self):
+        page = "blog/post/index.html"
+        self.assertEqual(resolve_link(page, "/a/b/"), "a/b")
+        self.assertEqual(resolve_link(page, "/"), "")
+        self.assertEqual(resolve_link(page, "../other?x=1#top"), "blog/other")
+        self.assertEqual(
+            resolve_link(page, "img/my%20cat.png"), "blog/post/img/my cat.png"
+        )
+        self.assertIsNone(resolve_link(page, "https://example.com/"))
+        self.assertIsNone(resolve_link(page, "mailto:me@example.com"))
+        self.assertIsNone(resolve_link(page, "//cdn.example.com/a.js"))
+        self.assertIsNone(resolve_link(page, "#section"))
+
+    def test_link_candidates(self):
+        self.assertEqual(link_candidates(""), ("index.html",))
+        self.assertEqual(
+            link_candidates("a/b"), ("a/b", "a/b.html", "a/b/index.html")
+        )
+
+
+class TestLinkGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.out = os.path.join(self.tmp.name, "docs")
+        self.path = os.path.join(self.tmp.name, "links.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def graph(self):
+        graph = LinkGraph(self.path, self.out)
+        graph.load()
+        return graph
+
+    def record(self, graph, key, links):
+        graph.record(os.path.join(self.out, *key.split("/")), links)
+
+    def test_check(self):
+        graph = self.graph()
+        self.record(graph, "index.html", ["/a", "/b/", "b/img.png", "https://x.org"])
+        self.record(graph, "b/index.html", ["/", "../missing"])
+        outputs = {"index.html", "a.html", "b/index.html", "b/img.png"}
+        self.assertEqual(graph.check(outputs), {"b/index.html": ["../missing"]})
+
+    def test_incremental_check_only_revisits_affected_pages(self):
+        graph = self.graph()
+        self.record(graph, "index.html", ["/a"])
+        self.record(graph, "other.html", ["/a", "/gone"])
+        graph.check({"index.html", "other.html", "a.html"})
+        graph.save()
+
+        # Unchanged outputs: nothing is rechecked, the result is kept.
+        graph = self.graph()
+        outputs = {"index.html", "other.html", "a.html"}
+        self.assertEqual(graph.check(outputs, set()), {"other.html": ["/gone"]})
+
+        # Removing a.html revisits both pages linking to it, and no other.
+        graph.links["unrelated.html"] = ["/nowhere"]
+        outputs = {"index.html", "other.html", "unrelated.html"}
+        broken = graph.check(outputs, {"a.html"})
+        self.assertEqual(
+            broken, {"index.html": ["/a"], "other.html": ["/a", "/gone"]}
+        )
+
+    def test_removed_pages_are_dropped(self):
+        graph = self.graph()
+        self.record(graph, "old.html", ["/nowhere"])
+        self.assertEqual(graph.check({"old.html"}), {"old.html": ["/nowhere"]})
+        self.assertEqual(graph.check(set(), {"old.html"}), {})
+        self.assertEqual(graph.links, {})
+
+
+class TestLinkCheckBuild(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        generate_corpus(self.root, pages=3)
+        # The generated pages link each other; these only link what the
+        # tests expect.
+        for i in range(3):
+            self.write("content", f"section{i}", f"page{i}.md", f"# Page {i}\n\nText")
+        home = "# Home\n\n[one](/section1/page1) [css](/index.css)"
+        self.write("content", "index.md", home)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, *parts):
+        *parts, text = parts
+        path = os.path.join(self.root, *parts)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def build(self, **options):
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            build_site(self.root, **options)
+        return [line for line in out.getvalue().splitlines() if "Broken" in line]
+
+    def test_broken_links_are_reported(self):
+        self.assertEqual(self.build(), [])
+        os.remove(os.path.join(self.root, "content", "section1", "page1.md"))
+        self.assertEqual(
+            self.build(incremental=True),
+            ["Broken link in index.html: /section1/page1"],
+        )
+        self.write("content", "section1", "page1.md", "# Back\n\nText")
+        self.assertEqual(self.build(incremental=True), [])
+
+    def test_only_changed_links_are_reported(self):
+        self.write("content", "index.md", "# Home\n\n[gone](/nowhere)")
+        self.assertEqual(self.build(), ["Broken link in index.html: /nowhere"])
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            build_site(self.root)
+        self.assertNotIn("Broken link", out.getvalue())
+        self.assertIn("Link check: 1 broken links in 1 pages", out.getvalue())
+        self.assertEqual(
+            self.build(incremental=True, verbose_links=True),
+            ["Broken link in index.html: /nowhere"],
+        )
+
+        self.write("content", "index.md", "# Home\n\n[back](/section1/page1)")
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            build_site(self.root, incremental=True)
+        self.assertIn("Fixed link in index.html: /nowhere", out.getvalue())
+
+    def test_fingerprinted_assets_are_checked_as_emitted(self):
+        self.assertEqual(self.build(basepath="/base/", fingerprint=True, jobs=2), [])
+        graph = LinkGraph(
+            os.path.join(self.root, ".cache", "link-graph.json"),
+            os.path.join(self.root, "docs"),
+        )
+        graph.load()
+        page, stylesheet = graph.links["index.html"]
+        self.assertEqual(page, "/section1/page1")
+        self.assertRegex(stylesheet, r"^/index\.[0-9a-f]{8}\.css$")
+
+    def test_strict_links_fail_before_output_changes(self):
+        self.build()
+        self.write("content", "index.md", "# Home\n\n[gone](/nowhere)")
+        with self.assertRaisesRegex(Exception, "1 broken internal links"):
+            self.build(strict_links=True)
+        with open(os.path.join(self.root, "docs", "index.html")) as f:
+            self.assertIn("/section1/page1", f.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from bench import generate_corpus
+from listings import listing_pages, slugify
+from main import build_site, rebuild_changed
+from manifest import BuildManifest
+
+
+def entry(title, date=None, tags=()):
+    return {"title": title, "date": date, "tags": list(tags), "draft": False}
+
+
+class TestListingPages(unittest.TestCase):
+
+    def setUp(self):
+        self.entries = {
+            "index.html": entry("Home"),
+            "blog/a.html": entry("A", "2023-05-01", ["Python"]),
+            "blog/b/index.html": entry("B", "2024-01-02", ["python", "C++"]),
+            "blog/c.html": entry("C"),
+        }
+
+    def pages(self, page_size=10, rewrite=None):
+        pages = listing_pages("blog", self.entries, page_size, rewrite)
+        return {
+            key: (title, node.to_html(), links) for key, title, node, links in pages
+        }
+
+    def test_pages(self):
+        pages = self.pages()
+        self.assertEqual(
+            sorted(pages),
+            [
+                "blog/archive/index.html",
+                "blog/index.html",
+                "blog/tags/c/index.html",
+                "blog/tags/index.html",
+                "blog/tags/python/index.html",
+            ],
+        )
+        title, html, links = pages["blog/index.html"]
+        self.assertEqual(title, "Blog")
+        self.assertEqual(
+            html,
+            '<div><h1>Blog</h1><ul><li><a href="/blog/b/">B</a> '
+            '<time datetime="2024-01-02">2024-01-02</time></li>'
+            '<li><a href="/blog/a.html">A</a> '
+            '<time datetime="2023-05-01">2023-05-01</time></li>'
+            '<li><a href="/blog/c.html">C</a></li></ul></div>',
+        )
+        self.assertEqual(links, ["/blog/b/", "/blog/a.html", "/blog/c.html"])
+        self.assertIn("<h2>2024</h2>", pages["blog/archive/index.html"][1])
+        self.assertNotIn("C</a>", pages["blog/archive/index.html"][1])
+        # Tags are grouped by slug and shown as first spelled, newest first.
+        self.assertIn(">python</a> (2)", pages["blog/tags/index.html"][1])
+
+    def test_pagination(self):
+        pages = self.pages(page_size=2, rewrite=lambda url: "/base" + url)
+        self.assertIn("blog/page/2/index.html", pages)
+        self.assertNotIn("blog/page/3/index.html", pages)
+        title, html, links = pages["blog/page/2/index.html"]
+        self.assertEqual(title, "Blog, page 2")
+        self.assertIn('<nav><a href="/base/blog/">Newer</a></nav>', html)
+        self.assertEqual(links, ["/blog/c.html", "/blog/"])
+        self.assertIn(
+            '<a href="/base/blog/page/2/">Older</a>', pages["blog/index.html"][1]
+        )
+
+    def test_slugify(self):
+        self.assertEqual(slugify("C++"), "c")
+        self.assertEqual(slugify("Static Sites"), "static-sites")
+        self.assertEqual(slugify("+"), "tag")
+
+
+class TestListingBuild(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        generate_corpus(self.root, pages=3)
+        self.enterContext(contextlib.redirect_stdout(io.StringIO()))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, *parts, text):
+        path = os.path.join(self.root, "content", *parts)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def output(self, *parts):
+        return os.path.join(self.root, "docs", *parts)
+
+    def read(self, *parts):
+        with open(self.output(*parts), encoding="utf-8") as f:
+            return f.read()
+
+    def test_drafts_and_listings(self):
+        self.write("section1", "page1.md", text="---\ndraft: true\n---\n# Draft\n\nx")
+        self.write("section1", "new.md", text="---\ntags: [news]\n---\n# New\n\nx")
+        build_site(self.root, listings=["section1"])
+        self.assertFalse(os.path.exists(self.output("section1", "page1.html")))
+        listing = self.read("section1", "index.html")
+        self.assertIn(">New</a>", listing)
+        self.assertNotIn("Draft", listing)
+        self.assertIn(">New</a>", self.read("section1", "tags", "news", "index.html"))
+
+        # Unchanged listings are not written again.
+        os.utime(self.output("section1", "index.html"), ns=(0, 0))
+        build_site(self.root, incremental=True, listings=["section1"])
+        self.assertEqual(os.stat(self.output("section1", "index.html")).st_mtime_ns, 0)
+
+        build_site(self.root, incremental=True, listings=["section1"], drafts=True)
+        self.assertIn(">Draft</a>", self.read("section1", "index.html"))
+        self.assertTrue(os.path.exists(self.output("section1", "page1.html")))
+
+    def test_listing_cannot_replace_a_page(self):
+        self.write("section0", "index.md", text="# Section\n\nx")
+        with self.assertRaisesRegex(Exception, "would replace a content page"):
+            build_site(self.root, listings=["section0"])
+
+    def test_watch_rebuilds_listings_and_drops_drafts(self):
+        build_site(self.root, listings=["section2"])
+        manifest = BuildManifest(
+            os.path.join(self.root, ".cache", "build-manifest.json"),
+            os.path.join(self.root, "docs"),
+        )
+        manifest.load()
+        path = self.write("section2", "page2.md", text="---\ntitle: Renamed\n---\nx")
+        manifest = rebuild_changed(
+            self.root, "/", {path}, manifest, listings=["section2"]
+        )
+        self.assertIn(">Renamed</a>", self.read("section2", "index.html"))
+
+        path = self.write("section0", "page0.md", text="---\ndraft: true\n---\n# D")
+        rebuild_changed(self.root, "/", {path}, manifest)
+        self.assertFalse(os.path.exists(self.output("section0", "page0.html")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,7 @@
+import contextlib
+import io
+import os
+import tempfile
 import unittest
 
 from main import *
@@ -24,5 +28,89 @@ class TestExtractTitle(unittest.TestCase):
             extract_title("Text\n# Real Header")
 
 
+class TestParallelBuild(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.enterContext(contextlib.redirect_stdout(io.StringIO()))
+        self.content = os.path.join(self.tmp.name, "content")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        with open(self.template, "w", encoding="utf-8") as f:
+            f.write('<a href="/">{{ Title }}</a><main>{{ Content }}</main>')
+        for i in range(20):
+            page_dir = os.path.join(self.content, f"section{i % 3}")
+            os.makedirs(page_dir, exist_ok=True)
+            with open(os.path.join(page_dir, f"page{i}.md"), "w") as f:
+                f.write(f"# Page {i}\n\nSome **bold** text {i}\n\n- a\n- [b](/b{i})")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, name, jobs):
+        out = os.path.join(self.tmp.name, name)
+        generate_pages_recursive(self.content, self.template, out, "/base/", jobs=jobs)
+        result = {}
+        for root, _, files in os.walk(out):
+            for file in files:
+                path = os.path.join(root, file)
+                with open(path, "rb") as f:
+                    result[os.path.relpath(path, out)] = f.read()
+        return result
+
+    def test_parallel_matches_serial(self):
+        serial = self.build("serial", 1)
+        parallel = self.build("parallel", 4)
+        self.assertEqual(len(serial), 20)
+        self.assertEqual(serial, parallel)
+
+    def test_parallel_raises_first_error(self):
+        with open(os.path.join(self.content, "section0", "page3.md"), "w") as f:
+            f.write("no title")
+        with self.assertRaisesRegex(Exception, "No header provided"):
+            self.build("parallel", 4)
+
+
+class TestWritePage(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp.name, "page.md")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        self.dest = os.path.join(self.tmp.name, "out", "page.html")
+        with open(self.template, "w", encoding="utf-8") as f:
+            f.write('<a href="/">{{ Title }}</a>{{ Content }}')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def render(self, markdown, basepath):
+        with open(self.source, "w", encoding="utf-8") as f:
+            f.write(markdown)
+        write_page(self.source, self.template, self.dest, basepath)
+        with open(self.dest, encoding="utf-8") as f:
+            return f.read()
+
+    def test_only_link_and_image_urls_are_rewritten(self):
+        html = self.render(
+            '# T\n\n[a](/a) ![i](/i.png) `href="/x"`\n\n```\n<img src="/y">\n```',
+            "/base/",
+        )
+        self.assertEqual(
+            html,
+            '<a href="/base/">T</a><div><h1>T</h1><p><a href="/base/a">a</a> '
+            '<img src="/base/i.png" alt="i"></img> <code>href="/x"</code></p>'
+            '<pre><code><img src="/y"></code></pre></div>',
+        )
+        self.assertIn('<a href="/a">', self.render("# T\n\n[a](/a)", "/"))
+
+    def test_front_matter_is_skipped(self):
+        html = self.render("---\ntitle: Front\ntags: [a]\n---\n# Heading\n\nText", "/")
+        self.assertEqual(
+            html, '<a href="/">Front</a><div><h1>Heading</h1><p>Text</p></div>'
+        )
+        html = self.render("---\ndate: 2024-01-01\n---\n# Heading\n\nText", "/")
+        self.assertTrue(html.startswith('<a href="/">Heading</a><div><h1>'))
+
+
 if __name__ == "__main__":
     unittest.main()
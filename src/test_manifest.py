@@ -0,0 +1,150 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from main import copy_file_tree, generate_pages_recursive
+from manifest import BuildManifest
+from template import load_template
+
+
+class TestIncrementalBuild(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.enterContext(contextlib.redirect_stdout(io.StringIO()))
+        root = self.tmp.name
+        self.content = os.path.join(root, "content")
+        self.static = os.path.join(root, "static")
+        self.public = os.path.join(root, "docs")
+        self.template = os.path.join(root, "template.html")
+        self.manifest_path = os.path.join(root, ".cache", "manifest.json")
+
+        os.makedirs(os.path.join(self.content, "blog"))
+        os.makedirs(self.static)
+        self.write(self.template, "<title>{{ Title }}</title>{{ Content }}")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nHello")
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post\n\nText")
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def read(self, *parts):
+        with open(os.path.join(self.public, *parts), encoding="utf-8") as f:
+            return f.read()
+
+    def build(self, basepath="/"):
+        manifest = BuildManifest(self.manifest_path, self.public)
+        manifest.load()
+        manifest.begin(load_template(self.template, basepath).hash, basepath)
+        copy_file_tree(self.static, self.public, manifest, compare="hash")
+        generate_pages_recursive(
+            self.content, self.template, self.public, basepath, manifest
+        )
+        removed = manifest.remove_stale()
+        manifest.save()
+        return removed
+
+    def mtime(self, *parts):
+        return os.stat(os.path.join(self.public, *parts)).st_mtime_ns
+
+    def test_first_build_writes_everything(self):
+        self.build()
+        self.assertIn("<p>Hello</p>", self.read("index.html"))
+        self.assertIn("<p>Text</p>", self.read("blog", "post.html"))
+        self.assertEqual(self.read("index.css"), "body {}")
+
+    def test_unchanged_outputs_are_skipped(self):
+        self.build()
+        os.utime(os.path.join(self.public, "index.html"), ns=(0, 0))
+        os.utime(os.path.join(self.public, "index.css"), ns=(0, 0))
+        self.build()
+        self.assertEqual(self.mtime("index.html"), 0)
+        self.assertEqual(self.mtime("index.css"), 0)
+
+    def test_changed_source_is_rebuilt(self):
+        self.build()
+        os.utime(os.path.join(self.public, "index.html"), ns=(0, 0))
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post\n\nNew")
+        self.build()
+        self.assertIn("<p>New</p>", self.read("blog", "post.html"))
+        self.assertEqual(self.mtime("index.html"), 0)
+
+    def test_template_change_rebuilds_pages_only(self):
+        self.build()
+        os.utime(os.path.join(self.public, "index.css"), ns=(0, 0))
+        self.write(self.template, "<h1>{{ Title }}</h1>{{ Content }}")
+        self.build()
+        self.assertTrue(self.read("index.html").startswith("<h1>Home</h1>"))
+        self.assertEqual(self.mtime("index.css"), 0)
+
+    def test_template_change_still_removes_deleted_pages(self):
+        self.build()
+        self.write(self.template, "<h1>{{ Title }}</h1>{{ Content }}")
+        os.remove(os.path.join(self.content, "blog", "post.md"))
+        removed = self.build()
+        self.assertEqual(removed, ["blog/post.html"])
+        self.assertFalse(os.path.exists(os.path.join(self.public, "blog")))
+        self.assertTrue(self.read("index.html").startswith("<h1>Home</h1>"))
+
+    def test_basepath_change_rebuilds_pages(self):
+        self.write(self.template, '<a href="/">{{ Title }}</a>{{ Content }}')
+        self.build()
+        self.build("/site/")
+        self.assertIn('href="/site/"', self.read("index.html"))
+
+    def test_deleted_source_removes_output(self):
+        self.build()
+        os.remove(os.path.join(self.content, "blog", "post.md"))
+        os.remove(os.path.join(self.static, "index.css"))
+        removed = self.build()
+        self.assertEqual(removed, ["blog/post.html", "index.css"])
+        self.assertFalse(os.path.exists(os.path.join(self.public, "index.css")))
+        self.assertTrue(os.path.exists(os.path.join(self.public, "index.html")))
+
+    def test_missing_output_is_regenerated(self):
+        self.build()
+        os.remove(os.path.join(self.public, "index.html"))
+        self.build()
+        self.assertIn("<p>Hello</p>", self.read("index.html"))
+
+    def test_untracked_outputs_are_kept(self):
+        self.build()
+        self.write(os.path.join(self.public, "CNAME"), "example.com")
+        self.build()
+        self.assertEqual(self.read("CNAME"), "example.com")
+
+    def test_noop_build_leaves_manifest_alone(self):
+        self.build()
+        os.utime(self.manifest_path, ns=(0, 0))
+        self.build()
+        self.assertEqual(os.stat(self.manifest_path).st_mtime_ns, 0)
+
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nChanged")
+        self.build()
+        self.assertNotEqual(os.stat(self.manifest_path).st_mtime_ns, 0)
+
+    def test_corrupt_manifest_is_ignored(self):
+        os.makedirs(os.path.dirname(self.manifest_path))
+        self.write(self.manifest_path, "{not json")
+        manifest = BuildManifest(self.manifest_path, self.public)
+        self.assertFalse(manifest.load())
+
+    def test_output_keys(self):
+        manifest = BuildManifest(self.manifest_path, self.public)
+        for path, key in [
+            (os.path.join(self.public, "blog", "post.html"), "blog/post.html"),
+            (os.path.join(self.public, "..", "docs", "index.html"), "index.html"),
+            (os.path.join(self.public, "blog", ".", "post.html"), "blog/post.html"),
+        ]:
+            self.assertEqual(manifest.output_key(path), key)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import io
+import os
+import tempfile
+import unittest
+
+from metadata import MetadataIndex, read_front_matter, read_page_meta
+
+
+class TestFrontMatter(unittest.TestCase):
+
+    def read(self, text):
+        return read_front_matter(io.StringIO(text).readline)
+
+    def test_fields(self):
+        fields, first_line = self.read(
+            "---\n"
+            "Title: 'Hello: world'\n"
+            "date: 2024-03-01\n"
+            "tags: [a, \"b c\"]\n"
+            "draft: yes\n"
+            "not a field\n"
+            "---\n"
+            "# Heading\n"
+        )
+        self.assertEqual(
+            fields,
+            {
+                "title": "Hello: world",
+                "date": "2024-03-01",
+                "tags": ["a", "b c"],
+                "draft": True,
+            },
+        )
+        self.assertEqual(first_line, "# Heading\n")
+
+    def test_no_front_matter(self):
+        self.assertEqual(self.read("# Heading\n\nText"), ({}, "# Heading\n"))
+
+    def test_unterminated(self):
+        with self.assertRaisesRegex(ValueError, "missing closing"):
+            self.read("---\ntitle: x\n\n# Heading\n")
+
+
+class TestMetadataIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.out = os.path.join(self.tmp.name, "docs")
+        self.path = os.path.join(self.tmp.name, "metadata.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def dest(self, key):
+        return os.path.join(self.out, *key.split("/"))
+
+    def test_read_page_meta(self):
+        path = self.write("a.md", "---\ntags: x, y\n---\r\n# From heading\n\nBody")
+        self.assertEqual(
+            read_page_meta(path),
+            {"title": "From heading", "date": None, "tags": ["x", "y"], "draft": False},
+        )
+
+    def test_unchanged_sources_are_not_read(self):
+        path = self.write("a.md", "---\ndraft: true\n---\n# A")
+        index = MetadataIndex(self.path, self.out)
+        entry = index.lookup(self.dest("a.html"), path, "h1")
+        self.assertFalse(index.is_published(entry))
+        index.save()
+
+        os.remove(path)
+        index = MetadataIndex(self.path, self.out, drafts=True)
+        index.load()
+        entry = index.lookup(self.dest("a.html"), path, "h1")
+        self.assertTrue(index.is_published(entry))
+        self.assertEqual(entry["title"], "A")
+
+        self.write("a.md", "# Published")
+        entry = index.lookup(self.dest("a.html"), path, "h2")
+        self.assertEqual((entry["title"], entry["draft"]), ("Published", False))
+
+    def test_prune_and_remove(self):
+        index = MetadataIndex(self.path, self.out)
+        for key in ("a.html", "b/c.html", "b/d.html"):
+            index.lookup(self.dest(key), self.write("x.md", "# X"))
+        index.prune()
+        index.lookup(self.dest("a.html"), self.write("x.md", "# X"))
+        index.remove(self.dest("b"))
+        self.assertEqual(set(index.pages), {"a.html"})
+        index.prune()
+        self.assertEqual(set(index.pages), {"a.html"})
+        index.prune()
+        self.assertEqual(index.pages, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from bench import generate_corpus
+from main import build_site
+from pipeline import run_pipeline
+
+
+class TestRunPipeline(unittest.TestCase):
+
+    def test_results_arrive_in_order(self):
+        done = []
+
+        def read(item):
+            # Later items finish reading first.
+            time.sleep((10 - item) / 1000)
+            return item
+
+        run_pipeline(
+            range(10),
+            read,
+            lambda item, data: data * 2,
+            lambda item, rendered: rendered + 1,
+            lambda item, result: done.append((item, result)),
+            in_flight=4,
+        )
+        self.assertEqual(done, [(i, i * 2 + 1) for i in range(10)])
+
+    def test_in_flight_limit(self):
+        lock = threading.Lock()
+        active = 0
+        peak = 0
+
+        def read(item):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            return item
+
+        def write(item, rendered):
+            nonlocal active
+            time.sleep(0.001)
+            with lock:
+                active -= 1
+
+        run_pipeline(range(50), read, lambda item, data: data, write, in_flight=3)
+        self.assertEqual(active, 0)
+        self.assertLessEqual(peak, 3)
+
+    def test_first_error_propagates(self):
+        written = []
+
+        def render(item, data):
+            if item == 3:
+                raise ValueError("bad page")
+            return data
+
+        with self.assertRaisesRegex(ValueError, "bad page"):
+            run_pipeline(
+                range(10),
+                lambda item: item,
+                render,
+                lambda item, rendered: written.append(item),
+                in_flight=2,
+            )
+        self.assertNotIn(3, written)
+        self.assertLess(max(written), 3)
+
+
+class TestPipelinedBuild(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        generate_corpus(self.root, pages=12)
+        self.enterContext(contextlib.redirect_stdout(io.StringIO()))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_output(self):
+        pages = {}
+        docs = os.path.join(self.root, "docs")
+        for dirpath, _, files in os.walk(docs):
+            for file in files:
+                path = os.path.join(dirpath, file)
+                with open(path, "rb") as f:
+                    pages[os.path.relpath(path, docs)] = f.read()
+        return pages
+
+    def test_matches_serial_build(self):
+        build_site(self.root)
+        serial = self.read_output()
+        build_site(self.root, pipeline=3, io_jobs=2)
+        self.assertEqual(self.read_output(), serial)
+
+        with open(os.path.join(self.root, "content", "section1", "page1.md"), "w") as f:
+            f.write("# Changed\n\nText")
+        build_site(self.root, incremental=True, pipeline=3)
+        self.assertIn(b"<p>Text</p>", self.read_output()["section1/page1.html"])
+
+    def test_failed_page_stops_the_build(self):
+        with open(os.path.join(self.root, "content", "section0", "page0.md"), "w") as f:
+            f.write("no title")
+        with self.assertRaisesRegex(Exception, "No header provided"):
+            build_site(self.root, pipeline=3)
+        self.assertFalse(os.path.exists(os.path.join(self.root, "docs")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import assets
+import block_utils
+import main
+from bench import generate_corpus
+from profiler import Profiler
+
+
+class TestProfiler(unittest.TestCase):
+
+    def test_nested_stages_record_self_time(self):
+        profiler = Profiler()
+        with profiler.stage("outer"):
+            with profiler.stage("inner"):
+                pass
+        self.assertEqual(profiler.calls["outer"], 1)
+        self.assertEqual(profiler.calls["inner"], 1)
+        self.assertGreaterEqual(profiler.self_time["outer"], 0)
+        self.assertGreaterEqual(profiler.self_time["inner"], 0)
+        self.assertEqual(profiler.stack, [])
+
+    def test_wrap_generator_times_each_step(self):
+        profiler = Profiler()
+        wrapped = profiler.wrap(lambda: (i for i in range(3)), "gen")
+        self.assertEqual(list(wrapped()), [0, 1, 2])
+        self.assertEqual(profiler.calls["gen"], 5)
+
+    def test_restore_puts_originals_back(self):
+        originals = (
+            os.walk,
+            assets.copy_asset,
+            main.write_page,
+            block_utils.classify_block,
+        )
+        profiler = Profiler()
+        profiler.instrument(main)
+        self.assertIsNot(os.walk, originals[0])
+        profiler.restore()
+        self.assertEqual(
+            (os.walk, assets.copy_asset, main.write_page, block_utils.classify_block),
+            originals,
+        )
+        self.assertNotIn("open", vars(main))
+
+
+class TestProfiledBuild(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        generate_corpus(self.tmp.name, pages=5)
+        self.profiler = Profiler()
+        self.profiler.instrument(main)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                with self.profiler.stage("build", trace=True):
+                    main.build_site(self.tmp.name)
+        finally:
+            self.profiler.restore()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_stages_recorded(self):
+        for stage in ("walk", "read", "blocks", "classify", "inline", "to_html"):
+            self.assertGreater(self.profiler.calls[stage], 0, stage)
+        for stage in ("template", "write", "page", "copy", "build"):
+            self.assertGreater(self.profiler.calls[stage], 0, stage)
+
+    def test_pages_and_bytes(self):
+        self.assertEqual(len(self.profiler.pages), 5)
+        written = 0
+        for root, _, files in os.walk(os.path.join(self.tmp.name, "docs")):
+            written += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+        self.assertEqual(self.profiler.bytes_written, written)
+        self.assertGreater(self.profiler.bytes_read, 0)
+
+        slowest = self.profiler.slowest_pages(2)
+        self.assertEqual(len(slowest), 2)
+        self.assertGreaterEqual(slowest[0]["seconds"], slowest[1]["seconds"])
+
+    def test_summary_and_trace(self):
+        summary = self.profiler.summary(3)
+        self.assertIn("slowest 3 pages:", summary)
+        self.assertIn("classify", summary)
+
+        path = os.path.join(self.tmp.name, "trace.json")
+        self.profiler.write_trace(path)
+        with open(path) as f:
+            trace = json.load(f)
+        names = {event["name"] for event in trace["traceEvents"]}
+        self.assertTrue({"build", "page", "copy"} <= names)
+        for event in trace["traceEvents"]:
+            self.assertEqual(event["ph"], "X")
+            self.assertGreaterEqual(event["dur"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
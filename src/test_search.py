@@ -0,0 +1,181 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from bench import generate_corpus
+from main import build_site
+from search import SearchIndex, page_terms, shard_name, split_terms
+
+
+class TestTerms(unittest.TestCase):
+
+    def test_split_terms(self):
+        text = f"Hello, a Wörld! snake_case {'x' * 33} 42"
+        self.assertEqual(split_terms(text), ["hello", "wörld", "snake_case", "42"])
+
+    def test_page_terms(self):
+        terms = page_terms("Cats", ["cats and dogs", "more dogs"])
+        self.assertEqual(terms, {"cats": 11, "and": 1, "dogs": 2, "more": 1})
+
+    def test_shard_name(self):
+        self.assertEqual(shard_name("hello"), "he")
+        self.assertEqual(shard_name("42"), "42")
+        self.assertEqual(shard_name("é1"), "xc3a931")
+        self.assertEqual(shard_name("_x"), "x5f78")
+
+
+class TestSearchIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.out = os.path.join(self.tmp.name, "docs")
+        self.path = os.path.join(self.tmp.name, "search.json")
+        self.written = {}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def index(self):
+        index = SearchIndex(self.path, self.out, "/base/")
+        index.load()
+        return index
+
+    def record(self, index, key, title, text):
+        path = os.path.join(self.out, *key.split("/"))
+        index.record(path, title, page_terms(title, [text]))
+
+    def write(self, key, data, digest):
+        self.written[key] = json.loads(data)
+        path = os.path.join(self.out, *key.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def update(self, index, pages):
+        self.written = {}
+        removed, stats = index.update(pages, self.write)
+        index.save()
+        return removed, stats
+
+    def test_index_files(self):
+        index = self.index()
+        self.record(index, "index.html", "Home", "apples and pears")
+        self.record(index, "fruit/apples.html", "Apples", "apples apples")
+        _, stats = self.update(index, {"index.html", "fruit/apples.html"})
+
+        self.assertEqual(
+            self.written["search/index.json"],
+            {
+                "version": 1,
+                "prefix": 2,
+                "docs": [["/base/", "Home"], ["/base/fruit/apples.html", "Apples"]],
+                "shards": ["an", "ap", "ho", "pe"],
+            },
+        )
+        # Heaviest first, as document id, weight pairs.
+        self.assertEqual(self.written["search/ap.json"], {"apples": [1, 12, 0, 1]})
+        self.assertEqual((stats.pages, stats.terms, stats.shards), (2, 4, 4))
+        self.assertEqual(stats.written_files, 5)
+
+    def test_only_affected_shards_are_rewritten(self):
+        index = self.index()
+        self.record(index, "a.html", "Alpha", "shared words")
+        self.record(index, "b.html", "Beta", "shared other")
+        self.update(index, {"a.html", "b.html"})
+
+        index = self.index()
+        self.record(index, "a.html", "Alpha", "shared words")
+        self.assertEqual(self.update(index, {"a.html", "b.html"})[1].written_files, 0)
+
+        # "words" leaves its shard empty, and a new one lists "warmth".
+        index = self.index()
+        self.record(index, "a.html", "Alpha", "shared warmth")
+        removed, _ = self.update(index, {"a.html", "b.html"})
+        self.assertEqual(removed, ["search/wo.json"])
+        self.assertEqual(set(self.written), {"search/wa.json", "search/index.json"})
+        self.assertEqual(self.written["search/wa.json"], {"warmth": [0, 1]})
+
+    def test_removed_pages_free_their_id(self):
+        index = self.index()
+        self.record(index, "a.html", "Alpha", "")
+        self.record(index, "b.html", "Beta", "")
+        self.update(index, {"a.html", "b.html"})
+
+        index = self.index()
+        removed, _ = self.update(index, {"b.html"})
+        self.assertEqual(removed, ["search/al.json"])
+        self.assertEqual(
+            self.written["search/index.json"]["docs"], [None, ["/base/b.html", "Beta"]]
+        )
+
+        index = self.index()
+        self.record(index, "c.html", "Gamma", "")
+        self.update(index, {"b.html", "c.html"})
+        self.assertEqual(self.written["search/ga.json"], {"gamma": [0, 10]})
+
+
+class TestSearchBuild(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        generate_corpus(self.root, pages=6)
+        self.enterContext(contextlib.redirect_stdout(io.StringIO()))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_index(self):
+        files = {}
+        search_dir = os.path.join(self.root, "docs", "search")
+        for name in os.listdir(search_dir):
+            with open(os.path.join(search_dir, name), encoding="utf-8") as f:
+                files[name] = json.load(f)
+        return files
+
+    def test_engines_build_the_same_index(self):
+        build_site(self.root, search=True)
+        serial = self.read_index()
+        self.assertEqual(len(serial["index.json"]["docs"]), 6)
+        build_site(self.root, search=True, jobs=2)
+        self.assertEqual(self.read_index(), serial)
+        build_site(self.root, search=True, pipeline=3)
+        self.assertEqual(self.read_index(), serial)
+        build_site(self.root, search=True, block_cache_size=64)
+        self.assertEqual(self.read_index(), serial)
+
+    def test_incremental_builds(self):
+        build_site(self.root, search=True)
+        page = os.path.join(self.root, "content", "section1", "page1.md")
+        with open(page, "w") as f:
+            f.write("# Zebra crossing\n\nStripes")
+        build_site(self.root, incremental=True, search=True)
+        index = self.read_index()
+        # The title is also the page's heading.
+        self.assertEqual(index["ze.json"], {"zebra": [1, 11]})
+        self.assertEqual(index["index.json"]["docs"][1][1], "Zebra crossing")
+
+        # Without --search the index goes away, and the next indexing build
+        # renders every page again to rebuild it.
+        build_site(self.root, incremental=True)
+        self.assertFalse(os.path.exists(os.path.join(self.root, "docs", "search")))
+        build_site(self.root, incremental=True, search=True)
+        self.assertEqual(self.read_index(), index)
+
+    def test_lost_index_still_removes_deleted_pages(self):
+        build_site(self.root, search=True)
+        os.remove(os.path.join(self.root, ".cache", "search-index.json"))
+        os.remove(os.path.join(self.root, "content", "section2", "page2.md"))
+        build_site(self.root, incremental=True, search=True)
+        page = os.path.join(self.root, "docs", "section2", "page2.html")
+        self.assertFalse(os.path.exists(page))
+        docs = self.read_index()["index.json"]["docs"]
+        self.assertEqual(len(docs), 5)
+        self.assertNotIn("/section2/page2.html", [doc[0] for doc in docs])
+
+
+if __name__ == "__main__":
+    unittest.main()
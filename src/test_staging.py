@@ -0,0 +1,123 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from bench import generate_corpus
+from main import build_site
+from staging import exchange_dirs, link_tree, prune_unlisted, replace_if_changed
+
+
+class StagingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, *parts, text="x"):
+        path = os.path.join(self.root, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def read(self, *parts):
+        with open(os.path.join(self.root, *parts), encoding="utf-8") as f:
+            return f.read()
+
+
+class TestStagingHelpers(StagingTestCase):
+
+    def test_exchange_dirs(self):
+        self.write("a", "one.txt", text="a")
+        self.write("b", "two.txt", text="b")
+        exchange_dirs(os.path.join(self.root, "a"), os.path.join(self.root, "b"))
+        self.assertEqual(self.read("a", "two.txt"), "b")
+        self.assertEqual(self.read("b", "one.txt"), "a")
+
+    def test_link_tree_shares_inodes(self):
+        src = self.write("src", "sub", "file.txt")
+        link_tree(os.path.join(self.root, "src"), os.path.join(self.root, "dst"))
+        dst = os.path.join(self.root, "dst", "sub", "file.txt")
+        self.assertEqual(os.stat(src).st_ino, os.stat(dst).st_ino)
+
+    def test_replace_if_changed(self):
+        dest = self.write("page.html", text="same")
+        inode = os.stat(dest).st_ino
+        tmp = self.write("page.html.tmp", text="same")
+        self.assertFalse(replace_if_changed(tmp, dest))
+        self.assertFalse(os.path.exists(tmp))
+        self.assertEqual(os.stat(dest).st_ino, inode)
+
+        tmp = self.write("page.html.tmp", text="different")
+        self.assertTrue(replace_if_changed(tmp, dest))
+        self.assertEqual(self.read("page.html"), "different")
+
+        tmp = self.write("new.html.tmp", text="new")
+        self.assertTrue(replace_if_changed(tmp, os.path.join(self.root, "new.html")))
+
+    def test_prune_unlisted(self):
+        self.write("out", "keep.html")
+        self.write("out", "old", "gone.html")
+        removed = prune_unlisted(os.path.join(self.root, "out"), {"keep.html"})
+        self.assertEqual(removed, ["old/gone.html"])
+        self.assertFalse(os.path.exists(os.path.join(self.root, "out", "old")))
+
+
+class TestStagedBuild(StagingTestCase):
+
+    def setUp(self):
+        super().setUp()
+        generate_corpus(self.root, pages=4)
+        self.enterContext(contextlib.redirect_stdout(io.StringIO()))
+        build_site(self.root)
+
+    def output(self, *parts):
+        return os.path.join(self.root, "docs", *parts)
+
+    def test_unchanged_outputs_keep_inode_and_mtime(self):
+        before = os.stat(self.output("section0", "page0.html"))
+        self.write("content", "section1", "page1.md", text="# New\n\nText")
+        build_site(self.root)
+        after = os.stat(self.output("section0", "page0.html"))
+        self.assertEqual(
+            (before.st_ino, before.st_mtime_ns), (after.st_ino, after.st_mtime_ns)
+        )
+        self.assertIn("<p>Text</p>", self.read("docs", "section1", "page1.html"))
+        staging = os.path.join(self.root, ".cache", "docs-staging")
+        self.assertFalse(os.path.exists(staging))
+
+    def test_full_build_drops_outputs_it_did_not_produce(self):
+        self.write("docs", "stray.html")
+        os.remove(os.path.join(self.root, "content", "section2", "page2.md"))
+        build_site(self.root)
+        self.assertFalse(os.path.exists(self.output("stray.html")))
+        self.assertFalse(os.path.exists(self.output("section2")))
+
+    def test_full_build_skips_hash_compared_assets(self):
+        build_site(self.root, asset_compare="hash")
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            build_site(self.root, asset_compare="hash")
+        self.assertIn("Static files: copied 0 (0 bytes)", out.getvalue())
+
+    def test_failed_build_leaves_output_untouched(self):
+        before = self.read("docs", "section0", "page0.html")
+        self.write("content", "section0", "page0.md", text="no title")
+        with self.assertRaises(Exception):
+            build_site(self.root)
+        self.assertEqual(self.read("docs", "section0", "page0.html"), before)
+
+    def test_staged_incremental_build(self):
+        self.write("docs", "CNAME", text="example.com")
+        self.write("content", "section1", "page1.md", text="# New\n\nText")
+        build_site(self.root, incremental=True, staged=True)
+        self.assertIn("<p>Text</p>", self.read("docs", "section1", "page1.html"))
+        self.assertEqual(self.read("docs", "CNAME"), "example.com")
+
+
+if __name__ == "__main__":
+    unittest.main()
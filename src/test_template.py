@@ -0,0 +1,163 @@
+import os
+import tempfile
+import unittest
+
+from assets import AssetMap
+from template import (
+    Template,
+    UrlRewriter,
+    load_template,
+    minify_html,
+    rewrite_root_urls,
+)
+
+
+class TestTemplate(unittest.TestCase):
+
+    def test_parts_alternate_literals_and_slots(self):
+        template = Template("<h1>{{ Title }}</h1>{{ Content }}")
+        self.assertEqual(template.parts, ["<h1>", "Title", "</h1>", "Content", ""])
+        self.assertEqual(template.slots(), {"Title", "Content"})
+
+    def test_render_to_string(self):
+        template = Template("<title>{{ Title }}</title><main>{{ Content }}</main>")
+        html = template.render_to_string(Title="Home", Content="<p>hi</p>")
+        self.assertEqual(html, "<title>Home</title><main><p>hi</p></main>")
+
+    def test_callable_slot_streams(self):
+        template = Template("[{{ Content }}]")
+
+        def content(write):
+            write("a")
+            write("b")
+
+        self.assertEqual(template.render_to_string(Content=content), "[ab]")
+
+    def test_repeated_slot(self):
+        template = Template("{{ Title }} - {{ Title }}")
+        self.assertEqual(template.render_to_string(Title="x"), "x - x")
+
+    def test_unknown_slot_is_kept(self):
+        template = Template("{{ Author }} {{ Title }}")
+        self.assertEqual(template.render_to_string(Title="x"), "{{ Author }} x")
+
+    def test_basepath_applied_at_compile_time(self):
+        template = Template('<a href="/">x</a><img src="/a.png">{{ Content }}', "/b/")
+        html = template.render_to_string(Content='<a href="/raw">')
+        self.assertEqual(html, '<a href="/b/">x</a><img src="/b/a.png"><a href="/raw">')
+
+    def test_rewrite_root_urls(self):
+        self.assertEqual(
+            rewrite_root_urls('href="/x" src="/y"', "/b/"), 'href="/b/x" src="/b/y"'
+        )
+        self.assertEqual(rewrite_root_urls('href="/x"', "/"), 'href="/x"')
+
+    def test_rewrite_root_urls_through_asset_map(self):
+        assets = AssetMap(
+            {"a.css": "a.1234abcd.css", "img/b.png": "img/b.5678ef01.png"}
+        )
+        html = '<link href="/a.css?v=1"><img src="/img/b.png"><a href="/c">'
+        self.assertEqual(
+            rewrite_root_urls(html, "/base/", assets),
+            '<link href="/base/a.1234abcd.css?v=1">'
+            '<img src="/base/img/b.5678ef01.png"><a href="/base/c">',
+        )
+
+    def test_url_rewriter(self):
+        rewrite = UrlRewriter("/b/", AssetMap({"a.css": "a.1.css"}))
+        self.assertEqual(rewrite("/a.css#top"), "/b/a.1.css#top")
+        self.assertEqual(rewrite("/x"), "/b/x")
+        self.assertEqual(rewrite("//cdn.example/a.css"), "//cdn.example/a.css")
+        self.assertEqual(rewrite("https://example.com/"), "https://example.com/")
+        self.assertTrue(UrlRewriter().is_identity())
+        self.assertIsNone(Template("{{ Content }}").rewrite_url)
+
+    def test_url_rewriter_for_page(self):
+        assets = AssetMap(
+            {
+                "blog/images/a.png": "blog/images/a.1.png",
+                "images/my pic.png": "images/my pic.2.png",
+            }
+        )
+        rewrite = UrlRewriter("/b/", assets)
+        page = rewrite.for_page("blog/post.html")
+        self.assertEqual(page("images/a.png"), "images/a.1.png")
+        self.assertEqual(
+            page("../images/my%20pic.png?x#y"), "../images/my%20pic.2.png?x#y"
+        )
+        self.assertEqual(page("/images/my%20pic.png"), "/b/images/my%20pic.2.png")
+        self.assertEqual(page("other.html"), "other.html")
+        # Template markup is shared by every page, so relative URLs stay.
+        self.assertEqual(rewrite("images/my%20pic.png"), "images/my%20pic.png")
+        self.assertNotEqual(page.key, rewrite.for_page("post.html").key)
+
+    def test_fingerprinted_template(self):
+        source = '<link href="/index.css">{{ Content }}'
+        first = Template(source, assets=AssetMap({"index.css": "index.1.css"}))
+        second = Template(source, assets=AssetMap({"index.css": "index.2.css"}))
+        self.assertEqual(
+            first.render_to_string(Content=""), '<link href="/index.1.css">'
+        )
+        self.assertEqual(first.rewrite_url("/index.css"), "/index.1.css")
+        self.assertNotEqual(first.hash, Template(source).hash)
+        self.assertNotEqual(first.hash, second.hash)
+
+
+class TestLoadTemplate(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "template.html")
+        with open(self.path, "w") as f:
+            f.write("<p>{{ Content }}</p>")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_cached_until_changed(self):
+        first = load_template(self.path)
+        self.assertIs(load_template(self.path), first)
+
+        with open(self.path, "w") as f:
+            f.write("<div>{{ Content }}</div>")
+        second = load_template(self.path)
+        self.assertIsNot(second, first)
+        self.assertEqual(second.render_to_string(Content="x"), "<div>x</div>")
+
+    def test_cached_per_basepath(self):
+        first = load_template(self.path, "/a/")
+        self.assertIsNot(first, load_template(self.path, "/b/"))
+
+
+class TestMinifyHtml(unittest.TestCase):
+
+    def test_drops_whitespace_around_block_tags(self):
+        html = "<html>\n  <body>\n    <p>a  <b>b</b>\n c</p>\n  </body>\n</html>\n"
+        expected = "<html><body><p>a <b>b</b> c</p></body></html>"
+        self.assertEqual(minify_html(html), expected)
+
+    def test_preserves_pre_script_and_textarea(self):
+        html = "<div>\n  <pre>\n  x\n</pre>\n  <textarea> a  b </textarea>\n</div>"
+        self.assertEqual(
+            minify_html(html),
+            "<div><pre>\n  x\n</pre><textarea> a  b </textarea></div>",
+        )
+
+    def test_keeps_non_breaking_spaces(self):
+        html = "<p>10\xa0km\n  away</p>"
+        self.assertEqual(minify_html(html), "<p>10\xa0km away</p>")
+
+    def test_minified_template(self):
+        source = "<html>\n  <title>{{ Title }}</title>\n  <a href=\"/\">x</a>\n</html>"
+        template = Template(source, "/base/", minify=True)
+        self.assertEqual(
+            template.render_to_string(Title="T"),
+            '<html><title>T</title><a href="/base/">x</a></html>',
+        )
+        self.assertEqual(template.saved, 7)
+        self.assertNotEqual(template.hash, Template(source, "/base/").hash)
+        self.assertEqual(Template(source).saved, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
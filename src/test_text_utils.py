@@ -1,7 +1,11 @@
+import random
 import unittest
 from textnode import TextNode, TextType
 from text_utils import (
     text_to_textnodes,
+    text_to_textnodes_chain,
+    text_to_textnodes_scan,
+    set_inline_parser,
     split_nodes_delimiter,
     split_nodes_image,
     split_nodes_link,
@@ -345,5 +349,62 @@ class TestTextToTextNodes(unittest.TestCase):
         self.assertEqual(result, [])
 
 
+class TestTextToTextNodesChain(TestTextToTextNodes):
+
+    def setUp(self):
+        set_inline_parser("chain")
+
+    def tearDown(self):
+        set_inline_parser("scan")
+
+
+class TestInlineParserEquivalence(unittest.TestCase):
+
+    FRAGMENTS = [
+        "a", "b c", " ", "!", "*", "**", "_", "`", "[", "]", "(", ")",
+        "![alt](img.png)", "![](empty.png)", "[text](/url)", "[](/empty)",
+        "!![x](y)", "[a]", "(b)", "\n",
+    ]
+
+    def parse(self, parser, text):
+        try:
+            return parser(text)
+        except ValueError as e:
+            return str(e)
+
+    def test_unknown_parser_raises(self):
+        with self.assertRaises(ValueError):
+            set_inline_parser("regex")
+
+    def test_known_edge_cases(self):
+        cases = [
+            "a![](x)b",
+            "**a![](x)b**",
+            "_a_ **b** ![i](u) `c` [l](v) end",
+            "![a](b)[c](d)",
+            "`a_b`",
+            "**x** _y",
+            "_y **x",
+        ]
+        for text in cases:
+            self.assertEqual(
+                self.parse(text_to_textnodes_scan, text),
+                self.parse(text_to_textnodes_chain, text),
+                text,
+            )
+
+    def test_differential_fuzz(self):
+        rng = random.Random(1234)
+        for _ in range(3000):
+            text = "".join(
+                rng.choice(self.FRAGMENTS) for _ in range(rng.randint(0, 12))
+            )
+            self.assertEqual(
+                self.parse(text_to_textnodes_scan, text),
+                self.parse(text_to_textnodes_chain, text),
+                repr(text),
+            )
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -50,5 +50,13 @@ class TestTextNode(unittest.TestCase):
         )
 
 
+    def test_no_instance_dict(self):
+        """Nodes use __slots__ and reject unknown attributes."""
+        node = TextNode("spam", TextType.TEXT)
+        self.assertFalse(hasattr(node, "__dict__"))
+        with self.assertRaises(AttributeError):
+            node.extra = 1
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,365 @@
+import contextlib
+import gzip
+import io
+import json
+import os
+import re
+import tempfile
+import time
+import unittest
+import urllib.request
+from unittest import mock
+
+from bench import generate_corpus
+from main import _Rebuilder, build_site, rebuild_changed
+from manifest import BuildManifest
+from template import load_template
+from watch import InotifyWatcher, PollingWatcher, iter_changes, start_server
+
+
+class QuietTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.enterContext(contextlib.redirect_stdout(io.StringIO()))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, *parts, text="x"):
+        path = os.path.join(self.root, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+
+class WatcherTests:
+
+    def make_watcher(self, paths):
+        raise NotImplementedError
+
+    def test_detects_create_modify_delete(self):
+        existing = self.write("content", "a.md")
+        watcher = self.make_watcher([os.path.join(self.root, "content")])
+        try:
+            created = self.write("content", "sub", "b.md")
+            self.assertIn(created, self.collect(watcher))
+
+            time.sleep(0.01)
+            self.write("content", "a.md", text="changed")
+            self.assertIn(existing, self.collect(watcher))
+
+            os.remove(existing)
+            self.assertIn(existing, self.collect(watcher))
+        finally:
+            watcher.close()
+
+    def test_single_file_watch_ignores_siblings(self):
+        template = self.write("template.html")
+        watcher = self.make_watcher([template])
+        try:
+            self.write("other.txt")
+            self.write("template.html", text="new template")
+            changed = self.collect(watcher)
+            self.assertEqual(changed, {template})
+        finally:
+            watcher.close()
+
+    def collect(self, watcher):
+        changed = set()
+        deadline = time.monotonic() + 2
+        while time.monotonic() < deadline:
+            more = watcher.wait(0.2)
+            if not more and changed:
+                break
+            changed |= more
+        return changed
+
+
+class TestPollingWatcher(WatcherTests, QuietTestCase):
+
+    def make_watcher(self, paths):
+        return PollingWatcher(paths, interval=0.01)
+
+
+class TestInotifyWatcher(WatcherTests, QuietTestCase):
+
+    def make_watcher(self, paths):
+        try:
+            return InotifyWatcher(paths)
+        except OSError:
+            self.skipTest("inotify is not available")
+
+
+class FakeWatcher:
+
+    def __init__(self, batches):
+        self.batches = list(batches)
+
+    def wait(self, timeout=None):
+        if self.batches:
+            return self.batches.pop(0)
+        return set()
+
+
+class TestIterChanges(unittest.TestCase):
+
+    def test_bursts_are_coalesced(self):
+        watcher = FakeWatcher([{"a"}, {"b"}, {"a", "c"}])
+        changes = iter_changes(watcher, debounce=0)
+        self.assertEqual(next(changes), {"a", "b", "c"})
+
+    def test_idle_yields_nothing_changed(self):
+        watcher = FakeWatcher([{"a"}])
+        changes = iter_changes(watcher, debounce=0, idle=0)
+        self.assertEqual(next(changes), {"a"})
+        self.assertEqual(next(changes), set())
+
+
+class TestDevServer(QuietTestCase):
+
+    def test_serves_files_without_caching(self):
+        self.write("docs", "index.html", text="<p>hello</p>")
+        server = start_server(os.path.join(self.root, "docs"), port=0)
+        try:
+            port = server.server_address[1]
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/") as response:
+                self.assertEqual(response.read(), b"<p>hello</p>")
+                self.assertEqual(response.headers["Cache-Control"], "no-store")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class TestRebuildChanged(QuietTestCase):
+
+    def setUp(self):
+        super().setUp()
+        generate_corpus(self.root, pages=3)
+        build_site(self.root)
+        self.manifest = BuildManifest(
+            os.path.join(self.root, ".cache", "build-manifest.json"),
+            os.path.join(self.root, "docs"),
+        )
+        self.manifest.load()
+
+    def output(self, *parts):
+        return os.path.join(self.root, "docs", *parts)
+
+    def read(self, *parts):
+        with open(self.output(*parts), encoding="utf-8") as f:
+            return f.read()
+
+    def rebuild(self, *paths):
+        return rebuild_changed(self.root, "/", set(paths), self.manifest)
+
+    def test_only_changed_page_is_written(self):
+        other = self.output("section1", "page1.html")
+        os.utime(other, ns=(0, 0))
+        path = self.write("content", "section0", "page0.md", text="# New\n\nBody")
+        self.rebuild(path)
+        self.assertIn("<p>Body</p>", self.read("section0", "page0.html"))
+        self.assertEqual(os.stat(other).st_mtime_ns, 0)
+
+    def test_new_and_deleted_pages(self):
+        path = self.write("content", "extra", "post.md", text="# Post\n\nHi")
+        self.rebuild(path)
+        self.assertIn("<p>Hi</p>", self.read("extra", "post.html"))
+
+        os.remove(path)
+        self.rebuild(path)
+        self.assertFalse(os.path.exists(self.output("extra", "post.html")))
+        self.assertNotIn("extra/post.html", self.manifest.pages)
+
+    def test_unchanged_pages_in_subdirectory_are_skipped(self):
+        self.write("content", "section0", "sub", "a.md", text="# A\n\nText")
+        directory = os.path.join(self.root, "content", "section0")
+        self.rebuild(directory)
+        self.assertIn("section0/sub/a.html", self.manifest.pages)
+
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            manifest = self.rebuild(directory)
+        self.assertNotIn("Generating page", out.getvalue())
+        self.assertEqual(manifest.seen, {"section0/page0.html", "section0/sub/a.html"})
+
+    def test_search_index_follows_pages(self):
+        build_site(self.root, search=True)
+        self.manifest.load()
+        path = self.write("content", "extra", "post.md", text="# Post\n\nZzyzx")
+        self.manifest = rebuild_changed(
+            self.root, "/", {path}, self.manifest, search=True
+        )
+        self.assertIn('"zzyzx":[3,1]', self.read("search", "zz.json"))
+
+        os.remove(path)
+        self.manifest = rebuild_changed(
+            self.root, "/", {path}, self.manifest, search=True
+        )
+        self.assertFalse(os.path.exists(self.output("search", "zz.json")))
+        self.assertNotIn("search/zz.json", self.manifest.files)
+
+    def test_compressed_siblings_follow_pages(self):
+        options = {"compress": True, "compress_threshold": 1}
+        build_site(self.root, **options)
+        self.manifest.load()
+        path = self.write("content", "section0", "page0.md", text="# New\n\nBody")
+        self.manifest = rebuild_changed(
+            self.root, "/", {path}, self.manifest, **options
+        )
+        with gzip.open(self.output("section0", "page0.html.gz"), "rt") as f:
+            self.assertEqual(f.read(), self.read("section0", "page0.html"))
+
+        with open(os.path.join(self.root, ".cache", "deploy-manifest.json")) as f:
+            deploy = json.load(f)
+        self.assertEqual(deploy["removed"], [])
+        self.assertIn("section0/page0.html.gz", deploy["changed"])
+
+    def test_static_changes(self):
+        path = self.write("static", "app.js", text="console.log(1)")
+        self.rebuild(path)
+        self.assertEqual(self.read("app.js"), "console.log(1)")
+
+        os.remove(path)
+        self.rebuild(path)
+        self.assertFalse(os.path.exists(self.output("app.js")))
+
+    def test_template_change_rebuilds_all_pages(self):
+        path = self.write("template.html", text="<b>{{ Title }}</b>{{ Content }}")
+        manifest = self.rebuild(path)
+        html = self.read("section2", "page2.html")
+        self.assertTrue(html.startswith("<b>Page 2</b>"))
+        template = load_template(os.path.join(self.root, "template.html"))
+        self.assertEqual(manifest.template_hash, template.hash)
+
+
+class TestResidentRebuild(QuietTestCase):
+
+    def setUp(self):
+        super().setUp()
+        generate_corpus(self.root, pages=3)
+        self.write("content", "index.md", text="# Home\n\n[post](/extra/post)")
+        build_site(self.root)
+        manifest = BuildManifest(
+            os.path.join(self.root, ".cache", "build-manifest.json"),
+            os.path.join(self.root, "docs"),
+        )
+        manifest.load()
+        self.rebuilder = _Rebuilder(self.root, "/", manifest)
+        self.rebuilder.open()
+        self.addCleanup(self.rebuilder.close)
+
+    def rebuild(self, *paths):
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            self.rebuilder.rebuild(set(paths))
+        return out.getvalue()
+
+    def deploy(self):
+        with open(os.path.join(self.root, ".cache", "deploy-manifest.json")) as f:
+            return json.load(f)
+
+    def test_state_is_loaded_once_and_saved_when_asked(self):
+        before = self.deploy()
+        with mock.patch("main.LinkGraph.load") as load:
+            for text in ("# One\n\nA", "# Two\n\nB"):
+                path = self.write("content", "section0", "page0.md", text=text)
+                self.assertIn("Generating page", self.rebuild(path))
+        load.assert_not_called()
+        self.assertEqual(self.deploy(), before)
+
+        self.rebuilder.save()
+        deploy = self.deploy()
+        self.assertEqual(deploy["changed"], ["section0/page0.html"])
+        self.assertEqual(deploy["files"].keys(), before["files"].keys())
+
+    def test_links_follow_added_and_removed_outputs(self):
+        path = self.write("content", "extra", "post.md", text="# Post\n\nHi")
+        log = self.rebuild(path)
+        self.assertIn("Fixed link in index.html: /extra/post", log)
+        self.assertIn("Link check: 0 broken links", log)
+
+        os.remove(path)
+        log = self.rebuild(path)
+        self.assertIn("Broken link in index.html: /extra/post", log)
+        self.rebuilder.save()
+        self.assertNotIn("extra/post.html", self.deploy()["files"])
+        self.assertEqual(self.deploy()["removed"], [])
+
+    def test_template_change_reopens_the_session(self):
+        session = self.rebuilder.session
+        path = self.write("template.html", text="<b>{{ Title }}</b>{{ Content }}")
+        self.rebuild(path)
+        self.assertIsNone(self.rebuilder.session)
+        self.assertIsNot(self.rebuilder.open(), session)
+
+
+class TestFingerprintedRebuild(QuietTestCase):
+
+    def setUp(self):
+        super().setUp()
+        generate_corpus(self.root, pages=3)
+        build_site(self.root, fingerprint=True)
+        self.manifest = BuildManifest(
+            os.path.join(self.root, ".cache", "build-manifest.json"),
+            os.path.join(self.root, "docs"),
+        )
+        self.manifest.load()
+
+    def stylesheet(self):
+        (name,) = [
+            name
+            for name in self.manifest.files
+            if re.fullmatch(r"index\.[0-9a-f]{8}\.css", name)
+        ]
+        return name
+
+    def read(self, *parts):
+        with open(os.path.join(self.root, "docs", *parts), encoding="utf-8") as f:
+            return f.read()
+
+    def rebuild(self, *paths):
+        self.manifest = rebuild_changed(
+            self.root, "/", set(paths), self.manifest, fingerprint=True
+        )
+
+    def test_pages_link_current_fingerprints(self):
+        first = self.stylesheet()
+        self.assertRegex(first, r"^index\.[0-9a-f]{8}\.css$")
+        self.assertIn(f'href="/{first}"', self.read("section0", "page0.html"))
+
+        path = self.write("content", "section0", "page0.md", text="# New\n\nBody")
+        self.rebuild(path)
+        self.assertIn(f'href="/{first}"', self.read("section0", "page0.html"))
+
+        path = self.write("static", "index.css", text="body { color: red; }")
+        self.rebuild(path)
+        second = self.stylesheet()
+        self.assertNotEqual(second, first)
+        self.assertFalse(os.path.exists(os.path.join(self.root, "docs", first)))
+        self.assertIn(f'href="/{second}"', self.read("section1", "page1.html"))
+
+    def test_relative_urls_and_originals(self):
+        self.write("static", "images", "a.png", text="PNG")
+        markdown = "# P\n\n![a](../images/a.png)"
+        self.write("content", "section0", "page0.md", text=markdown)
+        build_site(self.root, fingerprint=True)
+        self.manifest.load()
+        (image,) = [
+            key
+            for key in self.manifest.files
+            if re.fullmatch(r"images/a\.[0-9a-f]{8}\.png", key)
+        ]
+        self.assertIn(f'src="../{image}"', self.read("section0", "page0.html"))
+        # Stylesheets refer to assets by their original names.
+        self.assertEqual(self.read("images", "a.png"), "PNG")
+        self.assertEqual(self.read("index.css"), self.read(self.stylesheet()))
+
+    def test_parallel_workers_use_the_map(self):
+        build_site(self.root, jobs=2, fingerprint=True)
+        page = self.read("section2", "page2.html")
+        self.assertIn(f'href="/{self.stylesheet()}"', page)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,5 @@
 from textnode import TextNode, TextType
 from htmlnode import text_node_to_html_node
-from pprint import pprint
 import re
 
 
@@ -92,7 +91,7 @@ def split_nodes_link(old_nodes):
     return new_nodes
 
 
-def text_to_textnodes(text):
+def text_to_textnodes_chain(text):
     nodes = [TextNode(text, TextType.TEXT)]
     nodes = split_nodes_image(nodes)
     nodes = split_nodes_link(nodes)
@@ -102,12 +101,127 @@ def text_to_textnodes(text):
     return nodes
 
 
-def text_to_children(text):
+_INLINE_LINK_RE = re.compile(
+    r"!\[([^\[\]]*)\]\(([^\(\)]*)\)|(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)"
+)
+_DELIMITERS = (("**", TextType.BOLD), ("_", TextType.ITALIC), ("`", TextType.CODE))
+
+
+def text_to_textnodes_scan(text):
+    # Single left-to-right scan producing the same nodes as the split chain.
+    # Images and links never overlap, so one alternation finds exactly what
+    # the image pass followed by the link pass would. Every match (even one
+    # dropped for empty alt/link text) ends a TEXT run, and each run is then
+    # split by the delimiters in the chain's order. Errors are collected and
+    # the one the chain would hit first (bold before italic before code) is
+    # raised, so failures match too.
+    nodes = []
+    errors = [None, None, None]
+    start = 0
+
+    for match in _INLINE_LINK_RE.finditer(text):
+        if match.start() > start:
+            _split_delimiters(text[start : match.start()], 0, nodes, errors)
+        alt_text, image_url, link_text, link_url = match.groups()
+        if image_url is not None:
+            if alt_text:
+                nodes.append(TextNode(alt_text, TextType.IMAGE, image_url))
+        elif link_text:
+            nodes.append(TextNode(link_text, TextType.LINK, link_url))
+        start = match.end()
+
+    if start < len(text):
+        _split_delimiters(text[start:], 0, nodes, errors)
+
+    for error in errors:
+        if error is not None:
+            raise ValueError(error)
+    return nodes
+
+
+def _split_delimiters(text, level, nodes, errors):
+    if level == len(_DELIMITERS):
+        nodes.append(TextNode(text, TextType.TEXT))
+        return
+
+    delimiter, text_type = _DELIMITERS[level]
+    parts = text.split(delimiter)
+    if len(parts) % 2 == 0 and errors[level] is None:
+        errors[level] = f"Invalid markdown syntax: unmatched delimiter {delimiter}"
+
+    for i, part in enumerate(parts):
+        if part == "":
+            continue
+        if i % 2 == 0:
+            _split_delimiters(part, level + 1, nodes, errors)
+        else:
+            nodes.append(TextNode(part, text_type))
+
+
+INLINE_PARSERS = {
+    "chain": text_to_textnodes_chain,
+    "scan": text_to_textnodes_scan,
+}
+_inline_parser = text_to_textnodes_scan
+
+
+def set_inline_parser(name):
+    global _inline_parser
+    if name not in INLINE_PARSERS:
+        raise ValueError(f"Unknown inline parser: {name}")
+    _inline_parser = INLINE_PARSERS[name]
+
+
+def current_inline_parser():
+    for name, parser in INLINE_PARSERS.items():
+        if parser is _inline_parser:
+            return name
+
+
+def text_to_textnodes(text):
+    return _inline_parser(text)
+
+
+_URL_PROPS = {TextType.LINK: "href", TextType.IMAGE: "src"}
+
+
+class RenderContext:
+    # What the render of one page threads through the parser: the rewriter
+    # applied to link and image URLs, and the lists that, where given,
+    # collect the target of every link and image as emitted, less the
+    # basepath, and the text of every node (plain and formatted text, code,
+    # link text and image alt text).
+
+    __slots__ = ("rewrite_url", "links", "texts")
+
+    def __init__(self, rewrite_url=None, links=None, texts=None):
+        self.rewrite_url = rewrite_url
+        self.links = links
+        self.texts = texts
+
+
+def text_to_children(text, context=None):
     text_nodes = text_to_textnodes(text)
+    if context is None:
+        return [text_node_to_html_node(text_node) for text_node in text_nodes]
 
     html_nodes = []
+    rewrite = context.rewrite_url
+    links = context.links
+    texts = context.texts
     for text_node in text_nodes:
         html_node = text_node_to_html_node(text_node)
+        if texts is not None:
+            texts.append(text_node.text)
+        if text_node.text_type in _URL_PROPS:
+            url = text_node.url
+            if rewrite is not None:
+                # Only the URL of a link or image is rewritten, never text
+                # that merely looks like one, such as an example in code.
+                url = rewrite.fingerprint(url)
+                html_node.props[_URL_PROPS[text_node.text_type]] = rewrite.prefix(url)
+            if links is not None:
+                links.append(url)
         html_nodes.append(html_node)
 
     return html_nodes
@@ -122,6 +236,8 @@ def extract_markdown_links(text):
 
 
 if __name__ == "__main__":
+    from pprint import pprint
+
     node = TextNode("This is text with a `code block` word", TextType.TEXT)
     new_nodes = split_nodes_delimiter([node], "`", TextType.CODE)
     pprint(new_nodes)